@@ -0,0 +1,133 @@
+"""
+HTML テキスト抽出のベンチマーク
+
+TextExtractor（html.parser）と FastTextExtractor（正規表現）を、保存済み HTML の
+コーパスで比較する。あわせて本文抽出（MainContentExtractor）で LLM に渡す
+テキストがどれだけ減るかも表示する。
+
+```bash
+poetry run python bench/html_extract.py path/to/saved_pages [--repeat 3]
+```
+
+コーパスは *.html / *.htm を再帰的に探す。指定が無い場合は合成ページを使う。
+"""
+
+from __future__ import annotations
+
+import argparse
+import random
+import time
+from pathlib import Path
+from typing import List
+
+from ai_tools.tools.web.html_text import make_text_extractor
+
+
+def load_corpus(directory: str | None, limit: int) -> List[str]:
+    if directory:
+        paths = sorted(
+            p for p in Path(directory).rglob("*") if p.suffix.lower() in (".html", ".htm")
+        )
+        return [p.read_text(encoding="utf-8", errors="replace") for p in paths[:limit]]
+    return [synthetic_page(i) for i in range(min(limit, 50))]
+
+
+def synthetic_page(seed: int) -> str:
+    """
+    ナビ・本文・フッター・スクリプトを含むそれらしいページを生成する。
+    実際のサイトと同じく、半分のページはメニュー・Cookie バナー・関連記事・コメント・
+    フッターを <nav> / <footer> ではなく class 付きの div で組み、<main> も使わない
+    """
+    rng = random.Random(seed)
+    words = "検索 結果 ページ 取得 テキスト 抽出 data model agent cache search result".split()
+
+    def sentence() -> str:
+        return " ".join(rng.choice(words) for _ in range(rng.randint(8, 20))) + "。"
+
+    def links(prefix: str, count: int) -> str:
+        return "".join(
+            f'<li><a href="/{prefix}/{i}">{sentence()[:rng.randint(8, 40)]}</a></li>'
+            for i in range(count)
+        )
+
+    body = "".join(
+        f"<p>{sentence()} <a href='/doc/{i}'>{sentence()}</a> <b>{sentence()}</b></p>"
+        + (f"<h2>{sentence()[:30]}</h2>" if i % 7 == 6 else "")
+        for i in range(rng.randint(10, 60))
+    )
+    script = "<script>var x = '" + "a<b>c" * 2000 + "';</script>"
+    if seed % 2:
+        chrome_top = f"<nav><ul>{links('menu', 40)}</ul></nav>"
+        chrome_bottom = "<footer>" + links("f", 30) + "</footer>"
+        article = f"<main><article>{body}</article></main>"
+    else:
+        chrome_top = (
+            f'<div class="site-header"><div class="logo">Example</div>'
+            f'<ul class="menu">{links("menu", 40)}</ul></div>'
+            f'<div id="cookie-consent"><p>{sentence()} {sentence()}</p>'
+            '<a href="/privacy">Privacy</a></div>'
+            f'<div class="breadcrumbs"><a href="/">Home</a> &gt; <a href="/docs">Docs</a></div>'
+        )
+        comments = "".join(
+            f'<div class="comment"><p>{sentence()} {sentence()}</p></div>' for _ in range(10)
+        )
+        chrome_bottom = (
+            f'<div class="share-buttons">{links("share", 5)}</div>'
+            f'<div class="related-posts"><h3>Related</h3><ul>{links("rel", 15)}</ul></div>'
+            f'<div class="newsletter-signup"><p>{sentence()} {sentence()}</p></div>'
+            f'<div id="comments">{comments}</div>'
+            f'<div class="site-footer"><p>{sentence()}</p><ul>{links("f", 30)}</ul></div>'
+        )
+        article = f'<div class="post-content">{body}</div>'
+    return (
+        "<!DOCTYPE html><html><head><title>t</title><style>p{color:red}</style>"
+        f"{script}</head><body>{chrome_top}{article}{chrome_bottom}{script}</body></html>"
+    )
+
+
+def run(backend: str, pages: List[str], repeat: int) -> dict:
+    best = float("inf")
+    chars = links = 0
+    for _ in range(repeat):
+        chars = links = 0
+        start = time.perf_counter()
+        for page in pages:
+            extractor = make_text_extractor(
+                body_only=True, backend=backend, main_content=backend == "main"
+            )
+            extractor.feed(page)
+            extractor.close()
+            chars += len(" ".join(" ".join(extractor.text).split()))
+            links += len(extractor.links)
+        best = min(best, time.perf_counter() - start)
+    return {"seconds": best, "chars": chars, "links": links}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("corpus", nargs="?", help="保存済み HTML のディレクトリ")
+    parser.add_argument("--limit", type=int, default=500, help="使用するページ数の上限")
+    parser.add_argument("--repeat", type=int, default=3, help="計測回数（最良値を採用）")
+    args = parser.parse_args()
+
+    pages = load_corpus(args.corpus, args.limit)
+    total_bytes = sum(len(p.encode("utf-8")) for p in pages)
+    print(f"pages: {len(pages)}, size: {total_bytes / 1024 / 1024:.2f} MB")
+
+    results = {b: run(b, pages, args.repeat) for b in ("parser", "fast", "main")}
+    for backend, r in results.items():
+        mb_per_sec = total_bytes / 1024 / 1024 / r["seconds"]
+        print(
+            f"{backend:>6}: {r['seconds'] * 1000:8.1f} ms  {mb_per_sec:7.1f} MB/s  "
+            f"text {r['chars']:>9} chars  links {r['links']:>6}"
+        )
+    speedup = results["parser"]["seconds"] / results["fast"]["seconds"]
+    ratio = results["fast"]["chars"] / max(1, results["parser"]["chars"])
+    print(f"speedup: x{speedup:.1f}, text size (fast / parser): {ratio:.2f}")
+    for base in ("parser", "fast"):
+        reduction = 1 - results["main"]["chars"] / max(1, results[base]["chars"])
+        print(f"main content: {reduction:.0%} less text than {base}")
+
+
+if __name__ == "__main__":
+    main()
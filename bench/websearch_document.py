@@ -0,0 +1,91 @@
+"""
+Web検索エージェントのドキュメント化の比較（single と map_reduce）
+
+同じ検索・取得の結果（チェックポイント）から、2 つの方式でドキュメントを作り、
+経過時間・プロンプト評価のトークン数・出力の大きさを比べる。
+auto がどちらを選ぶか（single のプロンプトがコンテキスト長に収まるか）も表示する。
+Ollama サーバーとネットワーク接続が必要。応答キャッシュは使わない。
+
+```bash
+poetry run python bench/websearch_document.py "Python asyncio の TaskGroup" --fan-out 2 4
+```
+"""
+
+from __future__ import annotations
+
+import argparse
+import copy
+import time
+from typing import Dict, List
+
+from ai_tools.lib.llm import recent_calls
+from ai_tools.st_agents.web_search.pipeline import MODEL, WebSearchPipeline, build_document_prompt
+
+
+def run(checkpoint: Dict, args, mode: str, fan_out: int) -> dict:
+    pipeline = WebSearchPipeline(
+        args.query,
+        model=args.model,
+        checkpoint=copy.deepcopy(checkpoint),
+        mode=mode,
+        fan_out=fan_out,
+        use_cache=False,
+    )
+    before = len(recent_calls())
+    start = time.perf_counter()
+    body = pipeline.write()
+    seconds = time.perf_counter() - start
+    calls = recent_calls()[before:]
+    return {
+        "mode": mode if mode == "single" else f"{mode} x{fan_out}",
+        "seconds": seconds,
+        "stages": ", ".join(f"{t.name} {t.seconds:.1f}s" for t in pipeline.timings),
+        "calls": len(calls),
+        "prompt_tokens": sum(c.prompt_tokens for c in calls),
+        # 最後の呼び出し（ドキュメント化）のプロンプト
+        "final_prompt_tokens": calls[-1].prompt_tokens if calls else 0,
+        "chars": len(body),
+        "sources": len(pipeline.document_sources()),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("query", help="検索内容")
+    parser.add_argument("--model", default=MODEL)
+    parser.add_argument(
+        "--fan-out", type=int, nargs="+", default=[4], help="map_reduce の同時実行数"
+    )
+    args = parser.parse_args()
+
+    # 検索と取得は 1 回だけ行い、両方の方式で同じ情報を使う
+    checkpoint: Dict = {}
+    collector = WebSearchPipeline(
+        args.query, model=args.model, checkpoint=checkpoint, mode="auto"
+    )
+    collector.collect()
+    for timing in collector.timings:
+        print(timing.summary())
+    print(f"sources: {len(collector.sources())}")
+    _, report = build_document_prompt(args.query, collector.sources(), args.model)
+    print(f"auto: {collector.resolved_mode()} (single {report.summary()})")
+
+    results: List[dict] = [run(checkpoint, args, "single", 1)]
+    results += [run(checkpoint, args, "map_reduce", n) for n in args.fan_out]
+    for r in results:
+        print(
+            f"{r['mode']:>14}: {r['seconds']:7.1f} s  calls {r['calls']:>2}"
+            f"  prompt {r['prompt_tokens']:>6} tok (final {r['final_prompt_tokens']:>5})"
+            f"  output {r['chars']:>6} chars  sources {r['sources']:>3}  [{r['stages']}]"
+        )
+    single = results[0]
+    for r in results[1:]:
+        print(
+            f"{r['mode']}: x{single['seconds'] / max(r['seconds'], 1e-9):.2f} speed,"
+            f" final prompt {r['final_prompt_tokens'] / max(single['final_prompt_tokens'], 1):.0%}"
+            f" of single, output {r['chars'] / max(single['chars'], 1):.0%} of single"
+        )
+
+
+if __name__ == "__main__":
+    main()
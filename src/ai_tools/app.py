@@ -1,3 +1,11 @@
+import os
 import streamlit as st
+from ai_tools.lib.llm import warmup
+from ai_tools.lib.st.llm_telemetry import llm_telemetry_panel
+
+# よく使うモデルを起動時に読み込んでおく（プロセスごとに 1 回、別スレッド）
+warmup(os.environ.get("AI_TOOLS_WARMUP_MODELS", "gpt-oss:20b").split(","))
 
 st.title("AI Tools")
+
+llm_telemetry_panel()
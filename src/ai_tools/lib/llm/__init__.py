@@ -1,83 +1,130 @@
-from typing import List, Any, Optional, Dict
-from langchain_ollama import ChatOllama
-from langchain.agents import create_agent
+import logging
+from typing import List, Any, Optional, Dict, Callable
 from langchain.agents.structured_output import ToolStrategy
 from pprint import pprint
-import json
-from textwrap import dedent
-from langchain_core.messages import messages_to_dict
-
-
-def simple_ask(model: str, message: str, reasoning="low", tools: List[Any] = []) -> str:
-    if "gpt-oss" not in model:
-        reasoning = None
-    llm = ChatOllama(
-        model=model,
-        reasoning=reasoning,
-        # 返答の固定度があがる。
-        temperature=0,
-        top_p=1.0,
-        top_k=0,
-    )
-    agent = create_agent(model=llm, tools=tools)
-    result = agent.invoke({"messages": [{"role": "user", "content": message}]})
-    _message = result["messages"][-1]
-    return _message.content
-
-
-def structured_ask(model: str, message: str, schema: Any, reasoning="low") -> Any:
-    if "gpt-oss" not in model:
-        reasoning = None
-    # agentだと構造化出力が使えない
-    llm = ChatOllama(
-        model=model, reasoning=reasoning, temperature=0, top_p=1.0, top_k=0
-    )
-    structured_llm = llm.with_structured_output(schema=schema)
-    result = structured_llm.invoke(message)
+from .registry import (
+    DEFAULT_PARAMS,
+    clear_registry,
+    get_agent,
+    get_llm,
+    get_structured_llm,
+    registry_info,
+    structured_result,
+    warmup,
+)
+from .timing import EvalTiming, eval_report, recent_timings, record_timings
+from .telemetry import LlmCall, llm_call, read_log, recent_calls
+from .tool_stream import ToolEvent, iter_tool_calls
+from .budget import (
+    FILE_SEPARATOR,
+    SOURCEMAP_SEPARATOR,
+    BudgetReport,
+    PromptBudget,
+    context_size,
+    estimate_tokens,
+    truncate,
+)
+from .history import ChatHistory, CompactionReport
+from .stream import TokenStream, stream_ask, stream_chat, to_role_messages
+from .aio import achat, asimple_ask, astructured_ask, default_parallel, gather, run_sync
+from .response_cache import (
+    ResponseCache,
+    cache_key,
+    cached_call,
+    configure_response_cache,
+    get_response_cache,
+)
+
+logger = logging.getLogger(__name__)
+
+
+def simple_ask(
+    model: str, message: str, reasoning="low", tools: List[Any] = [], use_cache: bool = True
+) -> str:
+    with llm_call("simple_ask", model, reasoning) as call:
+
+        def compute() -> str:
+            agent = get_agent(model, reasoning, tools)
+            result = agent.invoke({"messages": [{"role": "user", "content": message}]})
+            call.add_messages(result["messages"])
+            _message = result["messages"][-1]
+            return _message.content
+
+        # 同じ入力の応答はキャッシュから返す（ツールの結果は呼ぶたびに変わりうるので tools 付きは除く）
+        key = cache_key("simple_ask", model, reasoning, message, tools=tools)
+        result, call.cached = cached_call(
+            key, compute, kind="simple_ask", model=model, use_cache=use_cache and not tools
+        )
+    return result
+
+
+def structured_ask(
+    model: str, message: str, schema: Any, reasoning="low", use_cache: bool = True
+) -> Any:
+    with llm_call("structured_ask", model, reasoning) as call:
+
+        def compute() -> Any:
+            # agentだと構造化出力が使えない
+            structured_llm = get_structured_llm(model, schema, reasoning)
+            output = structured_llm.invoke(message)
+            call.add_messages([output["raw"]])
+            return structured_result(output)
+
+        key = cache_key("structured_ask", model, reasoning, message, schema=schema)
+        result, call.cached = cached_call(
+            key, compute, schema=schema, kind="structured_ask", model=model, use_cache=use_cache
+        )
     return result
 
 
 def tool_call(
-    model: str, message: str, reasoning="low", tools: List[Any] = []
+    model: str,
+    message: str,
+    reasoning="low",
+    tools: List[Any] = [],
+    max_results: Optional[int] = None,
+    on_event: Optional[Callable[[ToolEvent, List[dict]], None]] = None,
 ) -> List[dict]:
-    if "gpt-oss" not in model:
-        reasoning = None
-    # agentだと構造化出力が使えないのでレスポンスから抽出する。
-    llm = ChatOllama(
-        model=model, reasoning=reasoning, temperature=0, top_p=1.0, top_k=0
-    )
-    agent = create_agent(
-        model=llm,
-        tools=tools,
-    )
-    result = agent.invoke(
-        {
-            "messages": [
-                {
-                    "role": "user",
-                    "content": dedent(  # from textwrap import dedent
-                        f"""\
-                        {message}
-
-                        出力は必ず
-                        OK
-                        のみにすること
-                        """
-                    ),
-                }
-            ]
-        }
-    )
-    messages = messages_to_dict(result["messages"])
-    print("messages:" + str(messages))
+    """
+    エージェントにツールを使わせ、ツールが返した JSON のリストを連結して返す。
+    エラーになった呼び出しと、JSON 以外を返したツールの結果は含めない。
 
+    Parameters
+    ----------
+    model : str
+        使用する LLM モデル名
+    message : str
+        ユーザーメッセージ
+    reasoning : str, optional
+        推論レベル。gpt-oss 以外では無視される
+    tools : List[Any], optional
+        エージェントに渡すツール（JSON のリストを返すもの）
+    max_results : int, optional
+        結果がこの件数に達したらエージェントのループを打ち切る
+    on_event : Callable[[ToolEvent, List[dict]], None], optional
+        ツールの実行が終わるたびに (イベント, それまでの結果) で呼ぶ（進捗表示用）
+    """
+    # agentだと構造化出力が使えないので、ツールの結果を逐次取り出す。
     tool_results = []
-    for message in messages:
-        if message["type"] != "tool":
-            continue
-        content = message["data"]["content"]  # こいつはstr！
-        data = json.loads(content)
-        tool_results.extend(data)
+    for event in iter_tool_calls(model, message, reasoning, tools):
+        # エラーや JSON でない結果（fetch_webpage などの本文）は集めずに進める
+        if event.error:
+            logger.warning(
+                "tool_call: %s returned an error: %s", event.name, event.content[:200]
+            )
+        else:
+            try:
+                data = event.json()  # content は str！
+            except ValueError:
+                data = None
+            if isinstance(data, list):
+                tool_results.extend(data)
+            elif isinstance(data, dict):
+                tool_results.append(data)
+        if on_event is not None:
+            on_event(event, tool_results)
+        if max_results is not None and len(tool_results) >= max_results:
+            break
 
     return tool_results
 
@@ -87,6 +134,7 @@ def chat(
     messages: List[Dict[str, str]],
     reasoning: Optional[str] = "low",
     tools: List[Any] = [],
+    use_cache: bool = True,
 ) -> List[Dict[str, str]]:
     """
     複数メッセージを受け取り、LLM で応答を生成する関数。
@@ -103,6 +151,9 @@ def chat(
         None に設定され、推論は無効化される。
     tools : List[Any], optional
         エージェントに渡すツール。デフォルトは空リスト。
+    use_cache : bool, optional
+        同じ入力の応答を応答キャッシュから返す。デフォルトは True。
+        tools を渡した場合はツールの結果が変わりうるのでキャッシュしない。
 
     Returns
     -------
@@ -110,43 +161,21 @@ def chat(
         LLM が返したメッセージのリスト。各メッセージは
         {"role": "assistant" | "user" | "system", "content": str} で表現。
     """
-    # 推論設定は gpt-oss のみ有効
-    if "gpt-oss" not in model:
-        reasoning = None
-
-    llm = ChatOllama(
-        model=model,
-        reasoning=reasoning,
-        temperature=0,
-        top_p=1.0,
-        top_k=0,
-    )
-
-    # エージェントを作成
-    agent = create_agent(model=llm, tools=tools)
-
-    # 受け取ったメッセージをそのまま渡す
-    result = agent.invoke({"messages": messages})
-
-    # messages_to_dictの結果を {"role": ..., "content": ...} 形式に変換
-    converted_messages = []
-    for msg_dict in messages_to_dict(result["messages"]):
-        msg_type = msg_dict["type"]
-
-        # typeをroleに変換
-        if msg_type == "human":
-            role = "user"
-        elif msg_type == "ai":
-            role = "assistant"
-        elif msg_type == "system":
-            role = "system"
-        elif msg_type == "tool":
-            role = "tool"
-        else:
-            role = msg_type
+    with llm_call("chat", model, reasoning) as call:
 
-        converted_messages.append(
-            {"role": role, "content": msg_dict["data"]["content"]}
-        )
+        def compute() -> List[Dict[str, str]]:
+            # エージェントは (model, reasoning, tools) ごとに共有（推論設定は gpt-oss のみ有効）
+            agent = get_agent(model, reasoning, tools)
+
+            # 受け取ったメッセージをそのまま渡す
+            result = agent.invoke({"messages": messages})
+            call.add_messages(result["messages"])
+
+            # {"role": ..., "content": ...} 形式に変換
+            return to_role_messages(result["messages"])
 
-    return converted_messages
+        key = cache_key("chat", model, reasoning, messages, tools=tools)
+        result, call.cached = cached_call(
+            key, compute, kind="chat", model=model, use_cache=use_cache and not tools
+        )
+    return result
@@ -0,0 +1,226 @@
+"""
+非同期版の LLM 呼び出しと、同時実行数を制限した gather
+
+独立した LLM 呼び出し（タイトル生成とドキュメント生成、ファイルごとの編集計画など）を
+並行して投げる。
+
+```python
+title, doc = run_sync(lambda: gather(
+    asimple_ask(model, title_prompt),
+    asimple_ask(model, doc_prompt),
+))
+```
+
+ChatOllama の非同期クライアント（httpx.AsyncClient）の接続はイベントループに紐づくので、
+非同期版の ChatOllama・エージェントは registry とは別にイベントループごとに共有する。
+同時に投げる数は Ollama サーバーの並列スロット数（OLLAMA_NUM_PARALLEL）に合わせる。
+"""
+
+from __future__ import annotations
+
+import asyncio
+import os
+import threading
+import time
+import weakref
+from typing import Any, Awaitable, Dict, Hashable, List, Optional, Sequence, TypeVar
+
+from langchain.agents import create_agent
+from langchain_ollama import ChatOllama
+
+from ai_tools.utils.aio import run_sync
+
+from .registry import llm_key, llm_kwargs, structured_result, tools_key
+from .response_cache import MISS, cache_key, get_response_cache
+from .stream import to_role_messages
+from .telemetry import LlmCall, llm_call
+
+T = TypeVar("T")
+
+
+def default_parallel() -> int:
+    """Ollama サーバーの並列スロット数（環境変数 OLLAMA_NUM_PARALLEL、既定 4）"""
+    try:
+        return max(1, int(os.environ.get("OLLAMA_NUM_PARALLEL", "4")))
+    except ValueError:
+        return 4
+
+
+# イベントループ → そのループで使う ChatOllama・エージェント・セマフォ
+_scopes: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[Hashable, Any]]" = (
+    weakref.WeakKeyDictionary()
+)
+_lock = threading.Lock()
+
+
+def _scope() -> Dict[Hashable, Any]:
+    loop = asyncio.get_running_loop()
+    with _lock:
+        scope = _scopes.get(loop)
+        if scope is None:
+            scope = _scopes[loop] = {}
+        return scope
+
+
+def _get_llm(model: str, reasoning: Optional[str], params: Dict[str, Any]) -> ChatOllama:
+    scope = _scope()
+    key = ("llm", llm_key(model, reasoning, params))
+    if key not in scope:
+        scope[key] = ChatOllama(**llm_kwargs(model, reasoning, params))
+    return scope[key]
+
+
+def _get_agent(model: str, reasoning: Optional[str], tools: Sequence[Any], params):
+    scope = _scope()
+    tools = tuple(tools)
+    key = ("agent", llm_key(model, reasoning, params), tools_key(tools))
+    if key not in scope:
+        llm = _get_llm(model, reasoning, params)
+        scope[key] = (create_agent(model=llm, tools=list(tools)), tools)
+    return scope[key][0]
+
+
+def _semaphore(limit: Optional[int]) -> asyncio.Semaphore:
+    """ループ内で共有するセマフォ（同じ limit の gather 同士で枠を共有する）"""
+    scope = _scope()
+    limit = limit or default_parallel()
+    key = ("semaphore", limit)
+    if key not in scope:
+        scope[key] = asyncio.Semaphore(limit)
+    return scope[key]
+
+
+async def _cached(
+    key: str, compute, call: LlmCall, *, schema: Any, kind: str, model: str, use_cache: bool
+):
+    """同期版と同じ応答キャッシュを使う"""
+    cache = get_response_cache() if use_cache else None
+    if cache is not None:
+        value = cache.get(key, schema)
+        if value is not MISS:
+            call.cached = True
+            return value
+    start = time.perf_counter()
+    value = await compute()
+    if cache is not None:
+        cache.put(key, value, kind=kind, model=model, elapsed=time.perf_counter() - start)
+    return value
+
+
+async def asimple_ask(
+    model: str,
+    message: str,
+    reasoning: Optional[str] = "low",
+    tools: List[Any] = [],
+    use_cache: bool = True,
+    **params,
+) -> str:
+    """simple_ask の非同期版"""
+
+    async def compute() -> str:
+        agent = _get_agent(model, reasoning, tools, params)
+        result = await agent.ainvoke({"messages": [{"role": "user", "content": message}]})
+        call.add_messages(result["messages"])
+        return result["messages"][-1].content
+
+    key = cache_key("simple_ask", model, reasoning, message, tools=tools, params=params)
+    with llm_call("asimple_ask", model, reasoning) as call:
+        return await _cached(
+            key,
+            compute,
+            call,
+            schema=None,
+            kind="simple_ask",
+            model=model,
+            use_cache=use_cache and not tools,
+        )
+
+
+async def astructured_ask(
+    model: str,
+    message: str,
+    schema: Any,
+    reasoning: Optional[str] = "low",
+    use_cache: bool = True,
+    **params,
+) -> Any:
+    """structured_ask の非同期版"""
+
+    async def compute() -> Any:
+        scope = _scope()
+        key = ("structured", llm_key(model, reasoning, params), id(schema))
+        if key not in scope:
+            llm = _get_llm(model, reasoning, params)
+            scope[key] = (llm.with_structured_output(schema=schema, include_raw=True), schema)
+        output = await scope[key][0].ainvoke(message)
+        call.add_messages([output["raw"]])
+        return structured_result(output)
+
+    key = cache_key("structured_ask", model, reasoning, message, schema=schema, params=params)
+    with llm_call("astructured_ask", model, reasoning) as call:
+        return await _cached(
+            key,
+            compute,
+            call,
+            schema=schema,
+            kind="structured_ask",
+            model=model,
+            use_cache=use_cache,
+        )
+
+
+async def achat(
+    model: str,
+    messages: List[Dict[str, str]],
+    reasoning: Optional[str] = "low",
+    tools: List[Any] = [],
+    use_cache: bool = True,
+    **params,
+) -> List[Dict[str, str]]:
+    """chat の非同期版"""
+
+    async def compute() -> List[Dict[str, str]]:
+        agent = _get_agent(model, reasoning, tools, params)
+        result = await agent.ainvoke({"messages": messages})
+        call.add_messages(result["messages"])
+        return to_role_messages(result["messages"])
+
+    key = cache_key("chat", model, reasoning, messages, tools=tools, params=params)
+    with llm_call("achat", model, reasoning) as call:
+        return await _cached(
+            key,
+            compute,
+            call,
+            schema=None,
+            kind="chat",
+            model=model,
+            use_cache=use_cache and not tools,
+        )
+
+
+async def gather(
+    *aws: Awaitable[T], limit: Optional[int] = None, return_exceptions: bool = False
+) -> List[T]:
+    """
+    同時実行数を limit に制限して aws を実行し、結果を引数と同じ順で返す。
+
+    Parameters
+    ----------
+    *aws : Awaitable
+        asimple_ask などのコルーチン
+    limit : int, optional
+        同時実行数。省略時は default_parallel()。
+        同じイベントループ内の gather 同士で枠を共有する
+    return_exceptions : bool, default False
+        True なら例外を結果として返す（asyncio.gather と同じ）
+    """
+    semaphore = _semaphore(limit)
+
+    async def bounded(aw: Awaitable[T]) -> T:
+        async with semaphore:
+            return await aw
+
+    return await asyncio.gather(
+        *(bounded(aw) for aw in aws), return_exceptions=return_exceptions
+    )
+
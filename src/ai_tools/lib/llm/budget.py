@@ -0,0 +1,437 @@
+"""
+プロンプトのトークン予算
+
+ファイル・ソースマップ・検索結果・履歴などのセクションごとにトークン数を見積もり、
+モデルのコンテキスト長（num_ctx）から出力用の枠を引いた予算に収まるよう切り詰める。
+Ollama はコンテキストを超えたプロンプトを黙って切り捨てるうえ、長いプロンプトは
+評価（prefill）に時間がかかるので、送る前にここで削る。
+
+```python
+budget = PromptBudget("gpt-oss:20b")
+budget.add("request", user_text, policy="keep")
+budget.add("files", files_md, policy="head", split=FILE_SEPARATOR)
+budget.add("sourcemap", sourcemap, policy="head", priority=-1)
+parts = budget.fit()
+print(budget.report.summary())
+```
+
+切り詰めの方針（policy）
+
+- keep: 切り詰めない（指示やユーザーの要求）
+- head: 先頭を残す
+- tail: 末尾を残す（履歴など新しいものが後ろにあるもの）
+- head_tail: 先頭と末尾を残し、中央を省く
+- drop: 収まらなければセクションごと捨てる
+
+split を指定したセクションは項目（ファイル・検索結果 1 件など）に分け、
+予算を項目間で均等に配る（短い項目はそのまま、長い項目から削る）。
+summarizer を指定したセクションは、切り詰める代わりに要約を試みる。
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import re
+import threading
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Sequence, Union
+
+logger = logging.getLogger(__name__)
+
+# トークン数の見積もり: ASCII は 4 文字で 1 トークン、それ以外（日本語など）は 1 文字 1 トークン
+ASCII_CHARS_PER_TOKEN = 4
+# Ollama からコンテキスト長を取得できなかった場合の値
+DEFAULT_NUM_CTX = 8192
+# /api/show の問い合わせのタイムアウト（秒）
+SHOW_TIMEOUT = 10
+# 出力用に空けておくトークン数
+DEFAULT_RESERVE = 2048
+# 省略した箇所に入れる文字列
+OMITTED = "\n…（省略）…\n"
+
+# read_files_content の 1 ファイルごとの区切り
+FILE_SEPARATOR = r"\n\n(?=--- File: )"
+# generate_sourcemap の 1 ファイルごとの区切り
+SOURCEMAP_SEPARATOR = r"\n\n(?=--- Sourcemap for: )"
+
+POLICIES = ("keep", "head", "tail", "head_tail", "drop")
+
+_NON_ASCII = re.compile(r"[^\x00-\x7f]")
+
+
+def estimate_tokens(text: str) -> int:
+    """トークン数の概算（トークナイザーを使わない）"""
+    if not text:
+        return 0
+    non_ascii = len(_NON_ASCII.findall(text))
+    ascii_chars = len(text) - non_ascii
+    return -(-ascii_chars // ASCII_CHARS_PER_TOKEN) + non_ascii
+
+
+_context_sizes: Dict[str, int] = {}
+_context_lock = threading.Lock()
+
+
+def num_ctx_override() -> Optional[int]:
+    """環境変数 AI_TOOLS_NUM_CTX で明示されたコンテキスト長（未設定なら None）"""
+    value = os.environ.get("AI_TOOLS_NUM_CTX", "").strip()
+    if not value:
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        logger.warning("AI_TOOLS_NUM_CTX is not an integer: %r", value)
+        return None
+
+
+def _field(data: Any, name: str, alias: str) -> Any:
+    # ollama の ShowResponse（属性）と古いクライアントの dict の両方に対応する
+    value = getattr(data, name, None)
+    if value is None and isinstance(data, dict):
+        value = data.get(alias, data.get(name))
+    return value
+
+
+def _parameter(parameters: str, name: str) -> Optional[int]:
+    """Modelfile の PARAMETER（"num_ctx    8192" の行の並び）から整数の値を取り出す"""
+    for line in (parameters or "").splitlines():
+        parts = line.split()
+        if len(parts) == 2 and parts[0] == name:
+            try:
+                return int(parts[1])
+            except ValueError:
+                return None
+    return None
+
+
+def _show_context_size(model: str) -> Optional[int]:
+    """Ollama の /api/show からモデルのコンテキスト長を読む"""
+    # ChatOllama と同じく OLLAMA_HOST のサーバーに接続する
+    from ollama import Client
+
+    try:
+        info = Client(timeout=SHOW_TIMEOUT).show(model)
+    except Exception as e:
+        logger.warning("failed to read the context length of %s: %s", model, e)
+        return None
+    # Modelfile で num_ctx を指定したモデルは、リクエストで指定しなければその値で動く
+    configured = _parameter(_field(info, "parameters", "parameters"), "num_ctx")
+    if configured:
+        return configured
+    model_info = _field(info, "modelinfo", "model_info") or {}
+    for key, value in model_info.items():
+        if key.endswith(".context_length") and value:
+            return int(value)
+    logger.warning("no context length in the model info of %s", model)
+    return None
+
+
+def context_size(model: str) -> int:
+    """
+    モデルのコンテキスト長。
+
+    環境変数 AI_TOOLS_NUM_CTX があればその値（ChatOllama にも num_ctx として渡す）。
+    なければ Ollama の /api/show から Modelfile の num_ctx、またはモデルの
+    context_length を読み、モデルごとにキャッシュする。取得できない場合は DEFAULT_NUM_CTX。
+    サーバー側の既定（OLLAMA_CONTEXT_LENGTH）がこれより小さい場合は AI_TOOLS_NUM_CTX で揃える。
+    """
+    override = num_ctx_override()
+    if override:
+        return override
+    with _context_lock:
+        size = _context_sizes.get(model)
+    if size is None:
+        size = _show_context_size(model)
+        if size is None:
+            # サーバーが起動していないだけかもしれないので、失敗はキャッシュしない
+            return DEFAULT_NUM_CTX
+        with _context_lock:
+            _context_sizes[model] = size
+    return size
+
+
+def clear_context_sizes() -> None:
+    """キャッシュしたコンテキスト長を破棄する（モデルを入れ替えた後など）"""
+    with _context_lock:
+        _context_sizes.clear()
+
+
+def _char_cost(c: str) -> float:
+    return 1.0 if ord(c) > 0x7F else 1.0 / ASCII_CHARS_PER_TOKEN
+
+
+def _take(text: str, tokens: int, from_end: bool = False) -> str:
+    """先頭（from_end なら末尾）から tokens トークン分の文字列。行の途中で切らないようにする"""
+    if tokens <= 0:
+        return ""
+    cost = 0.0
+    chars = text[::-1] if from_end else text
+    n = 0
+    for n, c in enumerate(chars, 1):
+        cost += _char_cost(c)
+        if cost > tokens:
+            n -= 1
+            break
+    if n >= len(text):
+        return text
+    if from_end:
+        part = text[len(text) - n :]
+        newline = part.find("\n")
+        if 0 <= newline < len(part) // 5:
+            part = part[newline + 1 :]
+        return part
+    part = text[:n]
+    newline = part.rfind("\n")
+    if newline >= len(part) * 4 // 5:
+        part = part[:newline]
+    return part
+
+
+def truncate(text: str, tokens: int, policy: str = "head") -> str:
+    """text を policy に従って tokens トークン以内にする"""
+    if estimate_tokens(text) <= tokens:
+        return text
+    if policy == "drop" or tokens <= estimate_tokens(OMITTED):
+        return ""
+    tokens -= estimate_tokens(OMITTED)
+    if policy == "tail":
+        return OMITTED.lstrip("\n") + _take(text, tokens, from_end=True)
+    if policy == "head_tail":
+        head = _take(text, tokens // 2)
+        tail = _take(text, tokens - estimate_tokens(head), from_end=True)
+        return head + OMITTED + tail
+    return _take(text, tokens) + OMITTED.rstrip("\n")
+
+
+def fair_shares(sizes: Sequence[int], total: int) -> List[int]:
+    """
+    total を sizes に均等に配る（size より多くは配らず、余りは他に回す）。
+    """
+    shares = [0] * len(sizes)
+    remaining = total
+    pending = sorted(range(len(sizes)), key=lambda i: sizes[i])
+    while pending and remaining > 0:
+        share = remaining // len(pending)
+        i = pending[0]
+        if sizes[i] <= share:
+            shares[i] = sizes[i]
+            remaining -= sizes[i]
+            pending.pop(0)
+            continue
+        for i in pending:
+            shares[i] = share
+        break
+    return shares
+
+
+@dataclass
+class Section:
+    name: str
+    items: List[str]
+    policy: str = "head"
+    priority: int = 0
+    # 項目を連結するときの区切り
+    joiner: str = "\n\n"
+    summarizer: Optional[Callable[[str, int], str]] = None
+
+    @property
+    def tokens(self) -> int:
+        return sum(estimate_tokens(item) for item in self.items)
+
+
+@dataclass
+class SectionReport:
+    name: str
+    policy: str
+    tokens: int
+    kept_tokens: int
+    items: int = 1
+    # 丸ごと落とした項目数
+    dropped_items: int = 0
+    # 一部を切り詰めた項目数
+    truncated_items: int = 0
+    summarized: bool = False
+
+    @property
+    def dropped_tokens(self) -> int:
+        return self.tokens - self.kept_tokens
+
+
+@dataclass
+class BudgetReport:
+    model: str
+    budget: int
+    sections: List[SectionReport] = field(default_factory=list)
+
+    @property
+    def tokens(self) -> int:
+        return sum(s.tokens for s in self.sections)
+
+    @property
+    def kept_tokens(self) -> int:
+        return sum(s.kept_tokens for s in self.sections)
+
+    @property
+    def trimmed(self) -> bool:
+        return any(s.dropped_tokens > 0 for s in self.sections)
+
+    def summary(self) -> str:
+        text = f"prompt ~{self.kept_tokens}/{self.budget} tokens"
+        cut = [
+            f"{s.name} -{s.dropped_tokens}"
+            + (f" ({s.dropped_items}/{s.items} items dropped)" if s.dropped_items else "")
+            + (" (summarized)" if s.summarized else "")
+            for s in self.sections
+            if s.dropped_tokens > 0
+        ]
+        if cut:
+            text += f", trimmed {self.tokens - self.kept_tokens}: " + ", ".join(cut)
+        return text
+
+    def markdown(self) -> str:
+        lines = [
+            "| section | policy | tokens | kept | dropped items | truncated items |",
+            "|---|---|---:|---:|---:|---:|",
+        ]
+        for s in self.sections:
+            lines.append(
+                f"| {s.name} | {s.policy} | {s.tokens} | {s.kept_tokens}"
+                f" | {s.dropped_items}/{s.items} | {s.truncated_items} |"
+            )
+        return "\n".join(lines)
+
+
+class PromptBudget:
+    """
+    セクションごとのトークン予算。
+
+    Parameters
+    ----------
+    model : str
+        モデル名（コンテキスト長を決める）
+    reserve : int, default DEFAULT_RESERVE
+        出力（と推論）用に空けておくトークン数
+    budget : int, optional
+        プロンプト全体の予算。省略時は context_size(model) - reserve
+    """
+
+    def __init__(
+        self, model: str, *, reserve: int = DEFAULT_RESERVE, budget: Optional[int] = None
+    ):
+        self.model = model
+        self.budget = budget if budget is not None else context_size(model) - reserve
+        self.sections: List[Section] = []
+        self.report = BudgetReport(model=model, budget=self.budget)
+
+    def add(
+        self,
+        name: str,
+        content: Union[str, Sequence[str]],
+        *,
+        policy: str = "head",
+        priority: int = 0,
+        split: Optional[str] = None,
+        joiner: str = "\n\n",
+        summarizer: Optional[Callable[[str, int], str]] = None,
+    ) -> "PromptBudget":
+        """
+        セクションを追加する。
+
+        Parameters
+        ----------
+        name : str
+            セクション名（fit() の戻り値のキー）
+        content : str or Sequence[str]
+            本文、または項目のリスト
+        policy : str, default "head"
+            切り詰めの方針（POLICIES）
+        priority : int, default 0
+            大きいほど先に予算を割り当てる
+        split : str, optional
+            本文を項目に分ける正規表現（FILE_SEPARATOR など）
+        joiner : str, default "\\n\\n"
+            項目を連結する区切り。split を指定した場合は split で区切った文字列
+        summarizer : Callable[[str, int], str], optional
+            (本文, 目標トークン数) を受け取り要約を返す関数。予算を超えたときに使う
+        """
+        if policy not in POLICIES:
+            raise ValueError(f"unknown policy: {policy}")
+        if isinstance(content, str):
+            items = re.split(split, content) if split else [content]
+        else:
+            items = list(content)
+        if split and isinstance(content, str):
+            joiner = ""
+            # 区切りの改行は次の項目の先頭に付け直す
+            items = [items[0]] + ["\n\n" + item for item in items[1:]]
+        self.sections.append(
+            Section(name, [i for i in items if i], policy, priority, joiner, summarizer)
+        )
+        return self
+
+    def fit(self) -> Dict[str, str]:
+        """
+        予算に収まるよう切り詰めた各セクションの本文を返し、self.report を更新する。
+        """
+        remaining = self.budget
+        keep = [s for s in self.sections if s.policy == "keep"]
+        remaining -= sum(s.tokens for s in keep)
+        allocation: Dict[str, int] = {s.name: s.tokens for s in keep}
+
+        # 優先度の高いグループから、グループ内では均等に割り当てる
+        flexible = [s for s in self.sections if s.policy != "keep"]
+        for priority in sorted({s.priority for s in flexible}, reverse=True):
+            group = [s for s in flexible if s.priority == priority]
+            shares = fair_shares([s.tokens for s in group], max(remaining, 0))
+            for section, share in zip(group, shares):
+                allocation[section.name] = share
+                remaining -= share
+
+        result: Dict[str, str] = {}
+        self.report = BudgetReport(model=self.model, budget=self.budget)
+        for section in self.sections:
+            text, entry = self._fit_section(section, allocation[section.name])
+            result[section.name] = text
+            self.report.sections.append(entry)
+        return result
+
+    @staticmethod
+    def _fit_section(section: Section, tokens: int):
+        entry = SectionReport(
+            name=section.name,
+            policy=section.policy,
+            tokens=section.tokens,
+            kept_tokens=section.tokens,
+            items=len(section.items),
+        )
+        if section.tokens <= tokens or section.policy == "keep":
+            return section.joiner.join(section.items), entry
+        if section.policy == "drop":
+            entry.kept_tokens = 0
+            entry.dropped_items = len(section.items)
+            return "", entry
+
+        if section.summarizer is not None and tokens > 0:
+            summary = section.summarizer(section.joiner.join(section.items), tokens)
+            if estimate_tokens(summary) <= tokens:
+                entry.kept_tokens = estimate_tokens(summary)
+                entry.summarized = True
+                return summary, entry
+
+        sizes = [estimate_tokens(item) for item in section.items]
+        shares = fair_shares(sizes, tokens)
+        kept = []
+        for item, size, share in zip(section.items, sizes, shares):
+            if share >= size:
+                kept.append(item)
+                continue
+            part = truncate(item, share, section.policy)
+            if part:
+                kept.append(part)
+                entry.truncated_items += 1
+            else:
+                entry.dropped_items += 1
+        text = section.joiner.join(kept)
+        entry.kept_tokens = estimate_tokens(text)
+        return text, entry
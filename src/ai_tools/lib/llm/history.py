@@ -0,0 +1,243 @@
+"""
+チャット履歴の圧縮
+
+chat() に毎回履歴をすべて送ると、会話が長くなるほどプロンプトの評価（prefill）が遅くなる。
+ChatHistory は送信する履歴を次のように絞る。
+
+1. 過去のターンのツール結果（role "tool"）と、ツールを呼ぶだけの空の AI メッセージを除く
+   （その内容は直後の AI の回答にまとまっている）
+2. 予算（トークン数）を超えたら、古いメッセージから要約に畳み込む。
+   一度に予算の半分まで畳み込むので、要約（＝プロンプトの先頭）は数ターンの間変わらず、
+   Ollama の KV キャッシュが再利用される
+3. 要約しない設定、または要約に失敗した場合は古いメッセージを捨てる
+
+画面に表示する履歴（st.session_state.messages など）はそのまま残し、
+送信する直前に prepare() を通す。
+
+```python
+history = ChatHistory(model)
+sent = history.prepare(messages)
+result = chat(model=model, messages=sent)
+messages += result[len(sent):]
+```
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+from dataclasses import dataclass
+from textwrap import dedent
+from typing import Callable, Dict, List, Optional
+
+from .budget import DEFAULT_RESERVE, context_size, estimate_tokens, truncate
+
+logger = logging.getLogger(__name__)
+
+SUMMARY_PREFIX = "これまでの会話の要約：\n"
+# 要約の長さの目安（トークン）
+SUMMARY_TOKENS = 600
+
+SUMMARY_INSTRUCTION = dedent(
+    """\
+    以下の会話を、後続の会話に必要な事実・決定事項・ユーザーの要望・未解決の質問が
+    分かるように要約せよ。既存の要約があればその内容も含めて 1 つにまとめること。
+    要約のみを出力すること。
+
+    """
+)
+
+Message = Dict[str, str]
+
+
+def message_tokens(message: Message) -> int:
+    # role などのオーバーヘッドとして数トークン足す
+    return estimate_tokens(message.get("content") or "") + 4
+
+
+def is_stale(message: Message) -> bool:
+    """過去のターンの中間メッセージ（ツール結果、ツール呼び出しだけの AI メッセージ）か"""
+    role = message.get("role")
+    return role == "tool" or (role == "assistant" and not message.get("content"))
+
+
+def _fingerprint(messages: List[Message]) -> str:
+    data = json.dumps(messages, ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(data.encode("utf-8")).hexdigest()
+
+
+@dataclass
+class CompactionReport:
+    tokens_before: int = 0
+    tokens_after: int = 0
+    stripped_tool_messages: int = 0
+    # 要約に含まれているメッセージ数
+    summarized_messages: int = 0
+    # 今回新たに要約したメッセージ数
+    newly_summarized: int = 0
+    # 要約せずに捨てたメッセージ数
+    dropped_messages: int = 0
+
+    def summary(self) -> str:
+        return (
+            f"history ~{self.tokens_after} tokens (from {self.tokens_before}),"
+            f" summarized {self.summarized_messages} (+{self.newly_summarized}),"
+            f" dropped {self.dropped_messages}, stripped tool {self.stripped_tool_messages}"
+        )
+
+
+def default_summarizer(model: str) -> Callable[[str, List[Message]], str]:
+    """simple_ask で要約する関数（応答キャッシュが効くので同じ要約は再計算しない）"""
+
+    def summarize(previous: str, messages: List[Message]) -> str:
+        from . import simple_ask
+
+        conversation = "\n\n".join(f"{m['role']}: {m['content']}" for m in messages)
+        prompt = SUMMARY_INSTRUCTION
+        if previous:
+            prompt += f"既存の要約：\n{previous}\n\n"
+        prompt += f"会話：\n{conversation}\n"
+        return simple_ask(model=model, message=prompt)
+
+    return summarize
+
+
+class ChatHistory:
+    """
+    chat() に送る履歴を予算内に収める。状態（要約）を持つので、
+    st.session_state などに保存して会話の間使い続ける。
+
+    Parameters
+    ----------
+    model : str
+        会話に使うモデル（予算の計算に使う）
+    max_tokens : int, optional
+        送信する履歴の上限。省略時は context_size(model) - DEFAULT_RESERVE
+    keep_recent : int, default 4
+        要約せずに必ず残す直近のメッセージ数
+    summarizer : Callable[[str, List[Message]], str], optional
+        (既存の要約, 畳み込むメッセージ) から新しい要約を返す関数。
+        省略時は default_summarizer(model)。False なら要約せずに捨てる
+    """
+
+    def __init__(
+        self,
+        model: str,
+        *,
+        max_tokens: Optional[int] = None,
+        keep_recent: int = 4,
+        summarizer=None,
+    ):
+        self.model = model
+        self.max_tokens = max_tokens or context_size(model) - DEFAULT_RESERVE
+        self.keep_recent = keep_recent
+        if summarizer is None:
+            summarizer = default_summarizer(model)
+        self.summarizer = summarizer or None
+        self.summary = ""
+        # 要約（または破棄）済みのメッセージ数と、その内容の指紋
+        self.folded = 0
+        self._folded_fingerprint = _fingerprint([])
+        self.report = CompactionReport()
+
+    def reset(self) -> None:
+        self.summary = ""
+        self.folded = 0
+        self._folded_fingerprint = _fingerprint([])
+
+    def prepare(self, messages: List[Message]) -> List[Message]:
+        """
+        送信する履歴を返す。
+
+        Parameters
+        ----------
+        messages : List[Message]
+            画面に表示している全履歴（最後が今回のユーザーメッセージ）
+
+        Returns
+        -------
+        List[Message]
+            システムメッセージ、要約、直近のメッセージ
+        """
+        report = CompactionReport(tokens_before=sum(message_tokens(m) for m in messages))
+        system = [m for m in messages if m.get("role") == "system"]
+        body = [m for m in messages if m.get("role") != "system"]
+        # 最後のメッセージ（今回の入力）以外の中間メッセージを除く
+        cleaned = [m for m in body[:-1] if not is_stale(m)] + body[-1:]
+        report.stripped_tool_messages = len(body) - len(cleaned)
+
+        # 編集・削除で要約済みの部分が変わっていたら要約をやり直す
+        if self.folded > len(cleaned) or (
+            _fingerprint(cleaned[: self.folded]) != self._folded_fingerprint
+        ):
+            self.reset()
+
+        window = cleaned[self.folded :]
+        fixed = sum(message_tokens(m) for m in system) + self._summary_tokens()
+        window_tokens = sum(message_tokens(m) for m in window)
+        if fixed + window_tokens > self.max_tokens:
+            # 予算の半分まで古いメッセージを畳み込む（要約が毎ターン変わらないように）
+            target = max(self.max_tokens // 2 - fixed - SUMMARY_TOKENS, 0)
+            fold = 0
+            while (
+                len(window) - fold > self.keep_recent
+                and window_tokens > target
+            ):
+                window_tokens -= message_tokens(window[fold])
+                fold += 1
+            if fold:
+                self._fold(window[:fold], report)
+                window = window[fold:]
+        self._folded_fingerprint = _fingerprint(cleaned[: self.folded])
+
+        result = list(system)
+        if self.summary:
+            result.append({"role": "system", "content": SUMMARY_PREFIX + self.summary})
+        result += window
+        # 直近のメッセージだけで予算を超える場合は、古いものを末尾を残して切り詰める
+        overflow = sum(message_tokens(m) for m in result) - self.max_tokens
+        for i, message in enumerate(result[:-1]):
+            if overflow <= 0:
+                break
+            if message.get("role") == "system":
+                continue
+            tokens = message_tokens(message)
+            kept = max(tokens - overflow, 0)
+            result[i] = {**message, "content": truncate(message["content"], kept, "tail")}
+            overflow -= tokens - message_tokens(result[i])
+
+        report.summarized_messages = self.folded if self.summary else 0
+        report.tokens_after = sum(message_tokens(m) for m in result)
+        self.report = report
+        return result
+
+    def _summary_tokens(self) -> int:
+        return estimate_tokens(SUMMARY_PREFIX + self.summary) + 4 if self.summary else 0
+
+    def _fold(self, messages: List[Message], report: CompactionReport) -> None:
+        self.folded += len(messages)
+        if self.summarizer is not None:
+            try:
+                # 要約のプロンプトも予算に収まるよう、まとめて畳み込む量を区切る
+                for chunk in _chunks(messages, self.max_tokens // 2):
+                    summary = self.summarizer(self.summary, chunk)
+                    self.summary = truncate(summary, SUMMARY_TOKENS * 2, "head")
+                report.newly_summarized = len(messages)
+                return
+            except Exception as e:
+                logger.warning("summarize failed: %s", e)
+        report.dropped_messages = len(messages)
+
+
+def _chunks(messages: List[Message], tokens: int) -> List[List[Message]]:
+    chunks: List[List[Message]] = [[]]
+    size = 0
+    for message in messages:
+        cost = message_tokens(message)
+        if chunks[-1] and size + cost > tokens:
+            chunks.append([])
+            size = 0
+        chunks[-1].append(message)
+        size += cost
+    return chunks
@@ -0,0 +1,247 @@
+"""
+ChatOllama とエージェントのプロセス共有レジストリ
+
+Streamlit は操作のたびにスクリプトを再実行するので、呼び出しごとに ChatOllama と
+create_agent のグラフを作り直すとその分だけ毎回の準備が重くなる。
+ここでは (model, reasoning, params) ごとに ChatOllama を、
+(model, reasoning, tools, params) ごとにエージェントを初回利用時に 1 つだけ作り、
+以降は使い回す。ChatOllama は内部の ollama.Client（httpx）を保持しているので、
+同じインスタンスを使う呼び出しは Ollama サーバーへの接続も共有する。
+
+モデルは keep_alive（環境変数 AI_TOOLS_OLLAMA_KEEP_ALIVE、既定 30 分）の間サーバーに常駐させ、
+warmup() でアプリ起動時に読み込んでおく。モデルが常駐していれば、
+直前と先頭が同じプロンプトは Ollama の KV キャッシュが再利用され、先頭部分の評価が省かれる。
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import threading
+from typing import Any, Dict, Hashable, Iterable, List, Optional, Sequence, Set, Tuple
+
+from langchain.agents import create_agent
+from langchain_ollama import ChatOllama
+
+from .budget import clear_context_sizes, num_ctx_override
+
+logger = logging.getLogger(__name__)
+
+# 返答の固定度があがる。
+DEFAULT_PARAMS: Dict[str, Any] = dict(temperature=0, top_p=1.0, top_k=0)
+# 最後の呼び出しからモデルをサーバーに常駐させる時間
+KEEP_ALIVE = os.environ.get("AI_TOOLS_OLLAMA_KEEP_ALIVE", "30m")
+
+_lock = threading.RLock()
+_llms: Dict[Hashable, ChatOllama] = {}
+# 値にツール自体も持たせて、キーに使った id が使い回されないようにする
+_agents: Dict[Hashable, Tuple[Any, Tuple[Any, ...]]] = {}
+_structured: Dict[Hashable, Tuple[Any, Any]] = {}
+
+
+def resolve_reasoning(model: str, reasoning: Optional[str]) -> Optional[str]:
+    """推論設定は gpt-oss のみ有効"""
+    return reasoning if "gpt-oss" in model else None
+
+
+def _freeze(value: Any) -> Hashable:
+    """パラメータをキーに使える形にする"""
+    if isinstance(value, dict):
+        return tuple(sorted((k, _freeze(v)) for k, v in value.items()))
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(v) for v in value)
+    try:
+        hash(value)
+    except TypeError:
+        return ("id", id(value))
+    return value
+
+
+def llm_key(model: str, reasoning: Optional[str], params: Dict[str, Any]) -> Hashable:
+    """ChatOllama を共有するキー (model, reasoning, params)"""
+    merged = {**DEFAULT_PARAMS, **params}
+    return (model, resolve_reasoning(model, reasoning), _freeze(merged))
+
+
+def tools_key(tools: Sequence[Any]) -> Tuple[Hashable, ...]:
+    """ツールの組を区別するキー（名前とオブジェクトの id）"""
+    return tuple((getattr(t, "name", getattr(t, "__name__", "")), id(t)) for t in tools)
+
+
+def num_ctx_params() -> Dict[str, Any]:
+    """
+    明示されたコンテキスト長（AI_TOOLS_NUM_CTX）の {"num_ctx": ...}。
+    未設定なら空で、サーバーとモデルの設定のまま動かす
+    """
+    num_ctx = num_ctx_override()
+    return {"num_ctx": num_ctx} if num_ctx else {}
+
+
+def llm_kwargs(model: str, reasoning: Optional[str], params: Dict[str, Any]) -> Dict[str, Any]:
+    """ChatOllama のコンストラクタ引数"""
+    return {
+        "model": model,
+        "reasoning": resolve_reasoning(model, reasoning),
+        "keep_alive": KEEP_ALIVE,
+        **num_ctx_params(),
+        **DEFAULT_PARAMS,
+        **params,
+    }
+
+
+def get_llm(model: str, reasoning: Optional[str] = "low", **params) -> ChatOllama:
+    """
+    共有の ChatOllama を返す（初回に生成）。
+
+    Parameters
+    ----------
+    model : str
+        モデル名
+    reasoning : str, optional
+        推論レベル。gpt-oss 以外では無視される
+    **params
+        ChatOllama の追加引数。DEFAULT_PARAMS を上書きする
+    """
+    key = llm_key(model, reasoning, params)
+    with _lock:
+        llm = _llms.get(key)
+        if llm is None:
+            llm = ChatOllama(**llm_kwargs(model, reasoning, params))
+            _llms[key] = llm
+        return llm
+
+
+def get_agent(
+    model: str,
+    reasoning: Optional[str] = "low",
+    tools: Sequence[Any] = (),
+    **params,
+):
+    """
+    共有のエージェント（create_agent のグラフ）を返す（初回に生成）。
+    ツールは同じオブジェクトかどうかで区別する。
+
+    Parameters
+    ----------
+    model : str
+        モデル名
+    reasoning : str, optional
+        推論レベル。gpt-oss 以外では無視される
+    tools : Sequence[Any]
+        エージェントに渡すツール
+    **params
+        ChatOllama の追加引数
+    """
+    tools = tuple(tools)
+    key = (llm_key(model, reasoning, params), tools_key(tools))
+    with _lock:
+        entry = _agents.get(key)
+        if entry is None:
+            llm = get_llm(model, reasoning, **params)
+            entry = (create_agent(model=llm, tools=list(tools)), tools)
+            _agents[key] = entry
+        return entry[0]
+
+
+def get_structured_llm(model: str, schema: Any, reasoning: Optional[str] = "low", **params):
+    """
+    共有の ChatOllama に with_structured_output(schema, include_raw=True) を適用したものを返す。
+    戻り値の invoke は {"raw", "parsed", "parsing_error"} を返す（raw は計測に使う）。
+    スキーマは同じオブジェクトかどうかで区別する。
+    """
+    key = (llm_key(model, reasoning, params), id(schema))
+    with _lock:
+        entry = _structured.get(key)
+        if entry is None:
+            llm = get_llm(model, reasoning, **params)
+            entry = (llm.with_structured_output(schema=schema, include_raw=True), schema)
+            _structured[key] = entry
+        return entry[0]
+
+
+def structured_result(output: Dict[str, Any]) -> Any:
+    """get_structured_llm の invoke 結果から解析済みの値を取り出す（解析に失敗したら送出）"""
+    if output.get("parsing_error") is not None:
+        raise output["parsing_error"]
+    return output["parsed"]
+
+
+def registry_info() -> Dict[str, List[str]]:
+    """登録済みのモデル・エージェントの一覧（確認用）"""
+    with _lock:
+        return {
+            "llms": [f"{k[0]} (reasoning={k[1]})" for k in _llms],
+            "agents": [
+                f"{k[0][0]} (reasoning={k[0][1]}, tools={[name for name, _ in k[1]]})"
+                for k in _agents
+            ],
+            "structured": [
+                f"{k[0][0]} (schema={getattr(schema, '__name__', type(schema).__name__)})"
+                for k, (_, schema) in _structured.items()
+            ],
+        }
+
+
+def clear_registry() -> None:
+    """共有インスタンスをすべて破棄する（モデル設定を変えた後など）"""
+    with _lock:
+        _llms.clear()
+        _agents.clear()
+        _structured.clear()
+    clear_context_sizes()
+
+
+# ----------------------------------------------------------------------
+# モデルの事前読み込み
+# ----------------------------------------------------------------------
+_warmed: Set[str] = set()
+
+
+def warmup(models: Iterable[str], *, background: bool = True) -> Optional[threading.Thread]:
+    """
+    モデルを Ollama サーバーに読み込み、KEEP_ALIVE の間常駐させる（プロセスごとに 1 回）。
+    最初の問い合わせでモデルの読み込み待ちが発生しないよう、アプリ起動時に呼ぶ。
+
+    Parameters
+    ----------
+    models : Iterable[str]
+        読み込むモデル名
+    background : bool, default True
+        別スレッドで読み込む（呼び出し元を待たせない）
+
+    Returns
+    -------
+    threading.Thread, optional
+        background=True の場合の読み込みスレッド
+    """
+    with _lock:
+        targets = list(dict.fromkeys(m.strip() for m in models if m.strip()))
+        targets = [m for m in targets if m not in _warmed]
+        _warmed.update(targets)
+    if not targets:
+        return None
+
+    def run() -> None:
+        # ChatOllama と同じく OLLAMA_HOST のサーバーに接続する
+        from ollama import Client
+
+        client = Client()
+        for model in targets:
+            try:
+                # プロンプトなしの generate はモデルの読み込みだけを行う。
+                # num_ctx が違うと次の呼び出しで読み込み直されるので ChatOllama と揃える
+                client.generate(
+                    model=model, prompt="", keep_alive=KEEP_ALIVE, options=num_ctx_params()
+                )
+                logger.info("warmup: loaded %s (keep_alive=%s)", model, KEEP_ALIVE)
+            except Exception as e:
+                logger.warning("warmup: failed to load %s: %s", model, e)
+                with _lock:
+                    _warmed.discard(model)
+
+    if not background:
+        run()
+        return None
+    thread = threading.Thread(target=run, name="ollama-warmup", daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,296 @@
+"""
+LLM の応答キャッシュ
+
+simple_ask / structured_ask / chat は temperature=0, top_p=1.0, top_k=0 で呼ぶので、
+同じ入力には実質的に同じ応答が返る。Streamlit の再実行などで同じ問い合わせを繰り返さないよう、
+(種別, model, reasoning, params, schema, tools, messages) のハッシュをキーに
+応答を SQLite に保存する。
+
+- 件数（max_entries）と合計サイズ（max_bytes）を超えたら、最後に使われた時刻が古い順に捨てる
+- ヒット・ミス・保存・破棄の回数と、ヒットで省けた LLM の時間を stats() で確認できる
+- 環境変数 AI_TOOLS_LLM_CACHE=0 で無効になる
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Any, Dict, Iterator, Optional, Sequence, Tuple
+
+from ai_tools.utils.cache_dir import default_cache_dir
+
+from .registry import DEFAULT_PARAMS, num_ctx_params, resolve_reasoning
+
+LLM_CACHE = os.environ.get("AI_TOOLS_LLM_CACHE", "1") != "0"
+
+# 見つからなかった場合の戻り値（None も応答としてありうるので区別する）
+MISS = object()
+
+
+@dataclass
+class CacheStats:
+    hits: int = 0
+    misses: int = 0
+    stores: int = 0
+    evictions: int = 0
+    # ヒットで省けた LLM 呼び出しの時間（保存時に計測した時間の合計）
+    saved_seconds: float = 0.0
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+
+def _schema_id(schema: Any) -> Any:
+    if schema is None:
+        return None
+    if hasattr(schema, "model_json_schema"):
+        return schema.model_json_schema()
+    if isinstance(schema, dict):
+        return schema
+    return repr(schema)
+
+
+def _tool_id(tool: Any) -> Dict[str, str]:
+    return {
+        "name": getattr(tool, "name", getattr(tool, "__name__", "")),
+        "description": getattr(tool, "description", getattr(tool, "__doc__", "")) or "",
+    }
+
+
+def cache_key(
+    kind: str,
+    model: str,
+    reasoning: Optional[str],
+    messages: Any,
+    *,
+    schema: Any = None,
+    tools: Sequence[Any] = (),
+    params: Optional[Dict[str, Any]] = None,
+) -> str:
+    """
+    応答キャッシュのキー。
+
+    Parameters
+    ----------
+    kind : str
+        "simple_ask" / "structured_ask" / "chat" など
+    model : str
+        モデル名
+    reasoning : str, optional
+        推論レベル（gpt-oss 以外では None として扱う）
+    messages
+        プロンプト、またはメッセージのリスト
+    schema : optional
+        構造化出力のスキーマ（pydantic モデルなら JSON スキーマで区別する）
+    tools : Sequence[Any]
+        エージェントに渡すツール（名前と説明で区別する）
+    params : Dict[str, Any], optional
+        ChatOllama の追加引数（明示された num_ctx は llm_kwargs と同じく含める）
+    """
+    source = {
+        "kind": kind,
+        "model": model,
+        "reasoning": resolve_reasoning(model, reasoning),
+        "params": {**num_ctx_params(), **DEFAULT_PARAMS, **(params or {})},
+        "schema": _schema_id(schema),
+        "tools": [_tool_id(t) for t in tools],
+        "messages": messages,
+    }
+    data = json.dumps(source, ensure_ascii=False, sort_keys=True, default=repr)
+    return hashlib.sha256(data.encode("utf-8")).hexdigest()
+
+
+def _dump(value: Any) -> str:
+    if hasattr(value, "model_dump"):
+        value = value.model_dump(mode="json")
+    return json.dumps(value, ensure_ascii=False)
+
+
+class ResponseCache:
+    """
+    LLM の応答を保存する SQLite キャッシュ。
+
+    Parameters
+    ----------
+    path : Path, optional
+        保存先。省略時は default_cache_dir() / "llm_cache.sqlite3"
+    max_entries : int, default 2000
+        保存する件数の上限
+    max_bytes : int, default 64MB
+        保存する応答の合計サイズの上限
+    ttl : float, optional
+        応答を使う秒数。None なら期限なし
+    """
+
+    def __init__(
+        self,
+        path: Optional[Path] = None,
+        *,
+        max_entries: int = 2000,
+        max_bytes: int = 64 * 1024 * 1024,
+        ttl: Optional[float] = None,
+    ):
+        self.path = Path(path) if path else default_cache_dir() / "llm_cache.sqlite3"
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.metrics = CacheStats()
+        self._lock = threading.Lock()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS responses"
+                " (key TEXT PRIMARY KEY, kind TEXT, model TEXT, value TEXT,"
+                " size INTEGER, elapsed REAL, created_at REAL, used_at REAL)"
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS responses_used_at ON responses (used_at)"
+            )
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        conn = sqlite3.connect(self.path, timeout=10)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def get(self, key: str, schema: Any = None) -> Any:
+        """
+        保存された応答を返す。無ければ MISS。
+        schema が pydantic モデルなら、保存した dict から作り直して返す。
+        """
+        now = time.time()
+        with self._lock, self._connect() as conn:
+            row = conn.execute(
+                "SELECT value, elapsed, created_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or (self.ttl is not None and now - row[2] >= self.ttl):
+                self.metrics.misses += 1
+                return MISS
+            conn.execute("UPDATE responses SET used_at = ? WHERE key = ?", (now, key))
+            self.metrics.hits += 1
+            self.metrics.saved_seconds += row[1] or 0.0
+        value = json.loads(row[0])
+        if schema is not None and hasattr(schema, "model_validate"):
+            return schema.model_validate(value)
+        return value
+
+    def put(
+        self, key: str, value: Any, *, kind: str = "", model: str = "", elapsed: float = 0.0
+    ) -> None:
+        """応答を保存し、上限を超えた分を古い順に捨てる"""
+        data = _dump(value)
+        now = time.time()
+        with self._lock, self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, kind, model, data, len(data.encode("utf-8")), elapsed, now, now),
+            )
+            self.metrics.stores += 1
+            self.metrics.evictions += self._evict(conn)
+
+    def _evict(self, conn: sqlite3.Connection) -> int:
+        count, size = conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses"
+        ).fetchone()
+        evicted = 0
+        if count <= self.max_entries and size <= self.max_bytes:
+            return evicted
+        for key, entry_size in conn.execute(
+            "SELECT key, size FROM responses ORDER BY used_at"
+        ).fetchall():
+            if count <= self.max_entries and size <= self.max_bytes:
+                break
+            conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+            count -= 1
+            size -= entry_size
+            evicted += 1
+        return evicted
+
+    def clear(self) -> None:
+        with self._lock, self._connect() as conn:
+            conn.execute("DELETE FROM responses")
+
+    def stats(self) -> Dict[str, Any]:
+        """このプロセスでのヒット・ミスなどと、保存中の件数・サイズ"""
+        with self._connect() as conn:
+            count, size = conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses"
+            ).fetchone()
+        return {
+            **asdict(self.metrics),
+            "hit_rate": self.metrics.hit_rate,
+            "entries": count,
+            "bytes": size,
+        }
+
+
+_cache: Optional[ResponseCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_response_cache() -> Optional[ResponseCache]:
+    """プロセス共有の ResponseCache を返す（初回に生成）。無効なら None"""
+    global _cache
+    if not LLM_CACHE:
+        return None
+    with _cache_lock:
+        if _cache is None:
+            _cache = ResponseCache()
+        return _cache
+
+
+def configure_response_cache(**kwargs) -> ResponseCache:
+    """
+    共有キャッシュを指定の設定で作り直す（AI_TOOLS_LLM_CACHE=0 でも有効にする）。
+
+    Parameters
+    ----------
+    **kwargs
+        ResponseCache のコンストラクタ引数（path, max_entries, max_bytes, ttl）
+    """
+    global _cache, LLM_CACHE
+    with _cache_lock:
+        LLM_CACHE = True
+        _cache = ResponseCache(**kwargs)
+        return _cache
+
+
+def cached_call(
+    key: str,
+    compute,
+    *,
+    schema: Any = None,
+    kind: str = "",
+    model: str = "",
+    use_cache: bool = True,
+) -> Tuple[Any, bool]:
+    """
+    キャッシュにあればそれを、無ければ compute() の結果を保存して返す。
+
+    Returns
+    -------
+    Tuple[Any, bool]
+        (応答, キャッシュから返したか)
+    """
+    cache = get_response_cache() if use_cache else None
+    if cache is not None:
+        value = cache.get(key, schema)
+        if value is not MISS:
+            return value, True
+    start = time.perf_counter()
+    value = compute()
+    if cache is not None:
+        cache.put(key, value, kind=kind, model=model, elapsed=time.perf_counter() - start)
+    return value, False
@@ -0,0 +1,266 @@
+"""
+トークン単位のストリーミング
+
+エージェントを stream_mode=["messages", "values"] で実行し、
+モデルが生成したテキストを届いた順に返す。最後の状態（ツールのメッセージを含む全履歴）は
+反復が終わった後に TokenStream.messages で取得できる。
+
+```python
+stream = stream_chat(model="gpt-oss:20b", messages=history)
+for token in stream:
+    print(token, end="")
+history = stream.messages
+```
+"""
+
+from __future__ import annotations
+
+import time
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+from langchain_core.messages import AIMessageChunk, messages_to_dict
+
+from .registry import get_agent
+from .response_cache import MISS, cache_key, get_response_cache
+from .telemetry import finish_call, start_call
+
+
+def to_role_messages(messages: List[Any]) -> List[Dict[str, str]]:
+    """LangChain のメッセージを {"role": ..., "content": ...} 形式に変換"""
+    roles = {"human": "user", "ai": "assistant", "system": "system", "tool": "tool"}
+    return [
+        {"role": roles.get(m["type"], m["type"]), "content": m["data"]["content"]}
+        for m in messages_to_dict(messages)
+    ]
+
+
+def _chunk_text(chunk: Any) -> str:
+    content = chunk.content
+    if isinstance(content, str):
+        return content
+    # content がブロックのリストで返るプロバイダー向け
+    return "".join(
+        b.get("text", "") if isinstance(b, dict) else str(b) for b in content or []
+    )
+
+
+class TokenStream:
+    """
+    エージェントの出力トークンを返すイテレーター（1 回だけ反復できる）。
+
+    Attributes
+    ----------
+    text : str
+        これまでに返したテキスト
+    messages : List[Dict[str, str]]
+        反復完了後の全履歴（{"role": ..., "content": ...}）
+    first_token_time : float, optional
+        最初のトークンまでの秒数
+    elapsed : float
+        反復完了までの秒数
+    cached : bool
+        応答キャッシュから返したか
+
+    Parameters
+    ----------
+    agent
+        実行するエージェント
+    payload : Dict[str, Any]
+        agent.stream に渡す入力
+    on_complete : Callable[[TokenStream], None], optional
+        最後まで反復したときに呼ぶ関数（途中で止めた場合は呼ばない）
+    kind, model, reasoning
+        計測ログ（telemetry）に記録する呼び出し元・モデル・推論レベル
+    """
+
+    def __init__(
+        self,
+        agent,
+        payload: Dict[str, Any],
+        on_complete: Optional[Callable[["TokenStream"], None]] = None,
+        *,
+        kind: str = "stream",
+        model: str = "",
+        reasoning: Optional[str] = None,
+    ):
+        self.kind = kind
+        self.model = model
+        self.reasoning = reasoning
+        self._agent = agent
+        self._payload = payload
+        self._on_complete = on_complete
+        self._started = False
+        self.text = ""
+        self.messages: List[Dict[str, str]] = []
+        self.raw_messages: List[Any] = []
+        self.first_token_time: Optional[float] = None
+        self.elapsed = 0.0
+        self.cached = False
+
+    @classmethod
+    def from_cache(
+        cls, text: str, messages: List[Dict[str, str]], **kwargs
+    ) -> "TokenStream":
+        """キャッシュした応答を 1 トークンとして返す TokenStream"""
+        stream = cls(None, {}, **kwargs)
+        stream.cached = True
+        stream.messages = messages
+        stream._cached_text = text
+        return stream
+
+    def __iter__(self) -> Iterator[str]:
+        if self._started:
+            raise RuntimeError("TokenStream can only be iterated once")
+        self._started = True
+        call = start_call(self.kind, self.model, self.reasoning)
+        if self.cached:
+            self.text = self._cached_text
+            self.first_token_time = 0.0
+            call.cached = True
+            call.first_token_seconds = 0.0
+            finish_call(call)
+            yield self.text
+            return
+        start = time.perf_counter()
+        completed = False
+        error: Optional[BaseException] = None
+        try:
+            for mode, data in self._agent.stream(
+                self._payload, stream_mode=["messages", "values"]
+            ):
+                if mode == "values":
+                    self.raw_messages = data.get("messages", self.raw_messages)
+                    continue
+                chunk, _metadata = data
+                # ツールの結果や、ツール呼び出しだけの AI メッセージは返さない
+                if not isinstance(chunk, AIMessageChunk):
+                    continue
+                token = _chunk_text(chunk)
+                if not token:
+                    continue
+                if self.first_token_time is None:
+                    self.first_token_time = time.perf_counter() - start
+                self.text += token
+                yield token
+            completed = True
+        except GeneratorExit:
+            # 呼び出し元が途中で反復をやめた
+            raise
+        except BaseException as e:
+            error = e
+            raise
+        finally:
+            self.elapsed = time.perf_counter() - start
+            self.messages = to_role_messages(self.raw_messages)
+            call.first_token_seconds = self.first_token_time
+            call.add_messages(self.raw_messages)
+            finish_call(call, error)
+        if completed and self._on_complete is not None:
+            self._on_complete(self)
+
+    @property
+    def answer(self) -> str:
+        """最後の AI メッセージ（反復完了後）。途中で止めた場合は返したテキスト"""
+        for message in reversed(self.messages):
+            if message["role"] == "assistant" and message["content"]:
+                return message["content"]
+        return self.text
+
+
+def stream_ask(
+    model: str,
+    message: str,
+    reasoning: Optional[str] = "low",
+    tools: List[Any] = [],
+    use_cache: bool = True,
+) -> TokenStream:
+    """
+    simple_ask のストリーミング版。
+
+    Parameters
+    ----------
+    model : str
+        使用する LLM モデル名
+    message : str
+        ユーザーメッセージ
+    reasoning : str, optional
+        推論レベル。gpt-oss 以外では無視される
+    tools : List[Any], optional
+        エージェントに渡すツール
+    use_cache : bool, default True
+        同じ入力の応答を応答キャッシュから返す（tools を渡した場合は使わない）
+
+    Returns
+    -------
+    TokenStream
+        反復すると生成されたテキストを順に返す
+    """
+    labels = dict(kind="stream_ask", model=model, reasoning=reasoning)
+    # simple_ask と同じキーで応答キャッシュを共有する
+    key = cache_key("simple_ask", model, reasoning, message, tools=tools)
+    cache = get_response_cache() if use_cache and not tools else None
+    if cache is not None:
+        text = cache.get(key)
+        if text is not MISS:
+            return TokenStream.from_cache(
+                text,
+                [{"role": "user", "content": message}, {"role": "assistant", "content": text}],
+                **labels,
+            )
+
+    def store(stream: TokenStream) -> None:
+        if cache is not None:
+            cache.put(key, stream.answer, kind="simple_ask", model=model, elapsed=stream.elapsed)
+
+    agent = get_agent(model, reasoning, tools)
+    return TokenStream(
+        agent, {"messages": [{"role": "user", "content": message}]}, on_complete=store, **labels
+    )
+
+
+def stream_chat(
+    model: str,
+    messages: List[Dict[str, str]],
+    reasoning: Optional[str] = "low",
+    tools: List[Any] = [],
+    use_cache: bool = True,
+) -> TokenStream:
+    """
+    chat のストリーミング版。反復完了後の TokenStream.messages が chat の戻り値と同じ形式になる。
+
+    Parameters
+    ----------
+    model : str
+        使用する LLM モデル名
+    messages : List[Dict[str, str]]
+        {"role": ..., "content": ...} 形式の履歴
+    reasoning : str, optional
+        推論レベル。gpt-oss 以外では無視される
+    tools : List[Any], optional
+        エージェントに渡すツール
+    use_cache : bool, default True
+        同じ入力の応答を応答キャッシュから返す（tools を渡した場合は使わない）
+
+    Returns
+    -------
+    TokenStream
+        反復すると生成されたテキストを順に返す
+    """
+    labels = dict(kind="stream_chat", model=model, reasoning=reasoning)
+    # chat と同じキーで応答キャッシュを共有する
+    key = cache_key("chat", model, reasoning, messages, tools=tools)
+    cache = get_response_cache() if use_cache and not tools else None
+    if cache is not None:
+        history = cache.get(key)
+        if history is not MISS:
+            answer = next(
+                (m["content"] for m in reversed(history) if m["role"] == "assistant"), ""
+            )
+            return TokenStream.from_cache(answer, history, **labels)
+
+    def store(stream: TokenStream) -> None:
+        if cache is not None:
+            cache.put(key, stream.messages, kind="chat", model=model, elapsed=stream.elapsed)
+
+    agent = get_agent(model, reasoning, tools)
+    return TokenStream(agent, {"messages": messages}, on_complete=store, **labels)
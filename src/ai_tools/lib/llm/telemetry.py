@@ -0,0 +1,201 @@
+"""
+LLM 呼び出しごとの計測ログ
+
+呼び出し 1 回につき 1 行の JSON を、ローテーションするログファイル
+（default_cache_dir() / "logs" / "llm_calls.jsonl"、5MB × 3 世代）に書く。
+記録する内容は経過時間、Ollama の応答に含まれるプロンプト評価・生成のトークン数と時間、
+生成速度、モデル、ツール呼び出し回数、キャッシュから返したかどうか。
+
+```python
+with llm_call("simple_ask", model, reasoning) as call:
+    result = agent.invoke(...)
+    call.add_messages(result["messages"])
+```
+
+環境変数 AI_TOOLS_LLM_TELEMETRY=0 でファイルへの書き込みを止める（直近の記録はメモリに残る）。
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import logging.handlers
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Any, Deque, Dict, Iterable, Iterator, List, Optional
+
+from ai_tools.utils.cache_dir import default_cache_dir
+
+from .registry import resolve_reasoning
+from .timing import record_timings
+
+TELEMETRY = os.environ.get("AI_TOOLS_LLM_TELEMETRY", "1") != "0"
+# ログファイルのローテーション
+MAX_LOG_BYTES = 5 * 1024 * 1024
+LOG_BACKUPS = 3
+# recent_calls() で保持する件数
+MAX_RECENT = 200
+
+
+def default_log_path() -> Path:
+    return default_cache_dir() / "logs" / "llm_calls.jsonl"
+
+
+@dataclass
+class LlmCall:
+    kind: str
+    model: str
+    reasoning: Optional[str] = None
+    started_at: float = 0.0
+    # 呼び出し全体の経過時間（キャッシュ・ツール実行を含む）
+    wall_seconds: float = 0.0
+    # ストリーミングで最初のトークンが届くまでの秒数
+    first_token_seconds: Optional[float] = None
+    # エージェントのループ内で LLM を呼んだ回数
+    llm_steps: int = 0
+    prompt_tokens: int = 0
+    prompt_seconds: float = 0.0
+    eval_tokens: int = 0
+    eval_seconds: float = 0.0
+    load_seconds: float = 0.0
+    tool_calls: int = 0
+    tools: List[str] = field(default_factory=list)
+    cached: bool = False
+    error: str = ""
+
+    @property
+    def eval_tps(self) -> float:
+        return self.eval_tokens / self.eval_seconds if self.eval_seconds else 0.0
+
+    def add_messages(self, messages: Iterable[Any]) -> None:
+        """エージェントの応答メッセージから、トークン数・時間・ツール呼び出しを集計する"""
+        messages = list(messages)
+        for timing in record_timings(self.kind, messages):
+            self.llm_steps += 1
+            self.prompt_tokens += timing.prompt_tokens
+            self.prompt_seconds += timing.prompt_seconds
+            self.eval_tokens += timing.eval_tokens
+            self.eval_seconds += timing.eval_seconds
+            self.load_seconds += timing.load_seconds
+        for message in messages:
+            for tool_call in getattr(message, "tool_calls", None) or []:
+                self.tool_calls += 1
+                self.tools.append(tool_call.get("name", ""))
+
+    def to_dict(self) -> Dict[str, Any]:
+        data = asdict(self)
+        data["eval_tps"] = round(self.eval_tps, 2)
+        return data
+
+    def summary(self) -> str:
+        source = "cache" if self.cached else f"{self.llm_steps} step(s)"
+        return (
+            f"{self.model} {self.wall_seconds:.2f}s ({source}), prompt {self.prompt_tokens} tok"
+            f" / {self.prompt_seconds:.2f}s, eval {self.eval_tokens} tok"
+            f" ({self.eval_tps:.1f} tok/s), tools {self.tool_calls}"
+        )
+
+
+_logger: Optional[logging.Logger] = None
+_lock = threading.Lock()
+_recent: Deque[LlmCall] = deque(maxlen=MAX_RECENT)
+
+
+def _get_logger() -> logging.Logger:
+    global _logger
+    with _lock:
+        if _logger is None:
+            logger = logging.getLogger("ai_tools.llm.telemetry")
+            logger.setLevel(logging.INFO)
+            logger.propagate = False
+            if TELEMETRY and not logger.handlers:
+                path = default_log_path()
+                path.parent.mkdir(parents=True, exist_ok=True)
+                handler = logging.handlers.RotatingFileHandler(
+                    path, maxBytes=MAX_LOG_BYTES, backupCount=LOG_BACKUPS, encoding="utf-8"
+                )
+                handler.setFormatter(logging.Formatter("%(message)s"))
+                logger.addHandler(handler)
+            _logger = logger
+        return _logger
+
+
+def start_call(kind: str, model: str, reasoning: Optional[str] = None) -> LlmCall:
+    """記録を開始する。終わったら finish_call に渡す"""
+    return LlmCall(
+        kind=kind,
+        model=model,
+        reasoning=resolve_reasoning(model, reasoning),
+        started_at=time.time(),
+    )
+
+
+def finish_call(call: LlmCall, error: Optional[BaseException] = None) -> LlmCall:
+    """経過時間を確定してログに書く"""
+    call.wall_seconds = time.time() - call.started_at
+    if error is not None:
+        call.error = f"{type(error).__name__}: {error}"
+    with _lock:
+        _recent.append(call)
+    _get_logger().info(json.dumps(call.to_dict(), ensure_ascii=False))
+    return call
+
+
+@contextmanager
+def llm_call(kind: str, model: str, reasoning: Optional[str] = None) -> Iterator[LlmCall]:
+    """
+    with ブロックを 1 回の LLM 呼び出しとして記録する。
+
+    Parameters
+    ----------
+    kind : str
+        呼び出し元（"simple_ask" など）
+    model : str
+        モデル名
+    reasoning : str, optional
+        推論レベル
+    """
+    call = start_call(kind, model, reasoning)
+    try:
+        yield call
+    except BaseException as e:
+        finish_call(call, e)
+        raise
+    finish_call(call)
+
+
+def recent_calls() -> List[LlmCall]:
+    """このプロセスの直近 MAX_RECENT 件（古い順）"""
+    with _lock:
+        return list(_recent)
+
+
+def read_log(limit: int = 200, path: Optional[Path] = None) -> List[Dict[str, Any]]:
+    """
+    ログファイルの末尾 limit 件を読む（他のプロセスの記録も含む、古い順）。
+
+    Parameters
+    ----------
+    limit : int, default 200
+        読む件数
+    path : Path, optional
+        ログファイル。省略時は default_log_path()
+    """
+    path = path or default_log_path()
+    try:
+        with open(path, encoding="utf-8") as f:
+            lines = deque(f, maxlen=limit)
+    except OSError:
+        return []
+    records = []
+    for line in lines:
+        try:
+            records.append(json.loads(line))
+        except ValueError:
+            continue
+    return records
@@ -0,0 +1,130 @@
+"""
+Ollama の評価時間の記録
+
+Ollama の応答（AIMessage.response_metadata）には、プロンプトの評価（prefill）と
+生成（eval）それぞれのトークン数・時間が入っている。
+KV キャッシュで先頭部分が再利用されると prompt_eval_count がその分だけ減るので、
+プロンプトの並べ方を変えた効果は prompt_tokens / prompt_seconds で確認できる。
+
+```python
+print(eval_report())
+```
+"""
+
+from __future__ import annotations
+
+import threading
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, Deque, Iterable, List, Optional
+
+# recent_timings() で保持する件数
+MAX_RECENT = 200
+
+_NS = 1e9
+
+
+@dataclass
+class EvalTiming:
+    kind: str
+    model: str = ""
+    # 評価したプロンプトのトークン数（KV キャッシュで再利用した分は含まない）
+    prompt_tokens: int = 0
+    prompt_seconds: float = 0.0
+    # 生成したトークン数
+    eval_tokens: int = 0
+    eval_seconds: float = 0.0
+    # モデルの読み込み時間（常駐していれば 0 に近い）
+    load_seconds: float = 0.0
+    total_seconds: float = 0.0
+
+    @property
+    def prompt_tps(self) -> float:
+        return self.prompt_tokens / self.prompt_seconds if self.prompt_seconds else 0.0
+
+    @property
+    def eval_tps(self) -> float:
+        return self.eval_tokens / self.eval_seconds if self.eval_seconds else 0.0
+
+    def summary(self) -> str:
+        return (
+            f"{self.model} prompt {self.prompt_tokens} tok / {self.prompt_seconds:.2f}s,"
+            f" eval {self.eval_tokens} tok / {self.eval_seconds:.2f}s"
+            f" ({self.eval_tps:.1f} tok/s), load {self.load_seconds:.2f}s,"
+            f" total {self.total_seconds:.2f}s"
+        )
+
+
+def timing_from_message(message: Any, kind: str = "") -> Optional[EvalTiming]:
+    """AIMessage の response_metadata から EvalTiming を作る。情報が無ければ None"""
+    metadata = getattr(message, "response_metadata", None) or {}
+    if "eval_count" not in metadata and "prompt_eval_count" not in metadata:
+        return None
+    return EvalTiming(
+        kind=kind,
+        model=metadata.get("model", metadata.get("model_name", "")),
+        prompt_tokens=metadata.get("prompt_eval_count") or 0,
+        prompt_seconds=(metadata.get("prompt_eval_duration") or 0) / _NS,
+        eval_tokens=metadata.get("eval_count") or 0,
+        eval_seconds=(metadata.get("eval_duration") or 0) / _NS,
+        load_seconds=(metadata.get("load_duration") or 0) / _NS,
+        total_seconds=(metadata.get("total_duration") or 0) / _NS,
+    )
+
+
+_recent: Deque[EvalTiming] = deque(maxlen=MAX_RECENT)
+_lock = threading.Lock()
+
+
+def record_timings(kind: str, messages: Iterable[Any]) -> List[EvalTiming]:
+    """
+    messages のうち Ollama の計測値を持つもの（エージェントの各ステップの応答）を記録する。
+
+    Parameters
+    ----------
+    kind : str
+        呼び出し元（"simple_ask" など）
+    messages : Iterable[Any]
+        LangChain のメッセージ
+    """
+    timings = [t for t in (timing_from_message(m, kind) for m in messages) if t]
+    with _lock:
+        _recent.extend(timings)
+    return timings
+
+
+def recent_timings() -> List[EvalTiming]:
+    """直近 MAX_RECENT 件の EvalTiming（古い順）"""
+    with _lock:
+        return list(_recent)
+
+
+def eval_report(timings: Optional[List[EvalTiming]] = None) -> str:
+    """
+    呼び出しごとのプロンプト評価時間と生成時間の表（Markdown）。
+
+    Parameters
+    ----------
+    timings : List[EvalTiming], optional
+        対象。省略時は recent_timings()
+    """
+    timings = recent_timings() if timings is None else timings
+    lines = [
+        "| kind | model | prompt tok | prompt s | eval tok | eval s | eval tok/s | load s |",
+        "|---|---|---:|---:|---:|---:|---:|---:|",
+    ]
+    for t in timings:
+        lines.append(
+            f"| {t.kind} | {t.model} | {t.prompt_tokens} | {t.prompt_seconds:.2f}"
+            f" | {t.eval_tokens} | {t.eval_seconds:.2f} | {t.eval_tps:.1f}"
+            f" | {t.load_seconds:.2f} |"
+        )
+    prompt = sum(t.prompt_seconds for t in timings)
+    generate = sum(t.eval_seconds for t in timings)
+    if prompt + generate:
+        lines.append("")
+        lines.append(
+            f"prompt eval {prompt:.2f}s / eval {generate:.2f}s"
+            f" (prompt eval {prompt / (prompt + generate):.0%})"
+        )
+    return "\n".join(lines)
@@ -0,0 +1,166 @@
+"""
+ツール呼び出しの逐次取得
+
+エージェントを stream_mode="updates" で実行し、ツールの実行が終わるたびに
+ToolEvent（ツール名・引数・結果・実行時間）を返す。
+呼び出し元は途中結果を表示したり、十分な結果が集まった時点で反復をやめて
+エージェントのループを打ち切ったりできる。
+
+```python
+for event in iter_tool_calls(model, message, tools=web_tools):
+    st.write(f"{event.name} {event.elapsed:.1f}s")
+    if enough:
+        break
+```
+"""
+
+from __future__ import annotations
+
+import json
+import threading
+import time
+from dataclasses import dataclass
+from textwrap import dedent
+from typing import Any, Dict, Iterator, List, Optional
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+from .registry import get_agent
+from .telemetry import finish_call, start_call
+
+# 固定の指示を先に置き、プロンプトの先頭を呼び出し間で共通にする
+# （Ollama の KV キャッシュが再利用される）
+TOOL_CALL_INSTRUCTION = dedent(
+    """\
+    出力は必ず
+    OK
+    のみにすること
+
+    """
+)
+
+
+@dataclass
+class ToolEvent:
+    name: str
+    args: Dict[str, Any]
+    tool_call_id: str
+    # ツールが返した文字列
+    content: str
+    # ツールの実行時間（秒）
+    elapsed: float
+    # 何回目のモデル応答から呼ばれたか（1 始まり）
+    step: int
+    # エージェント開始からの経過時間（秒）
+    finished_at: float
+    # ツールがエラーを返したか
+    error: bool = False
+
+    def json(self) -> Any:
+        """content を JSON として解釈した値"""
+        return json.loads(self.content)
+
+
+class _ToolTimer(BaseCallbackHandler):
+    """ツールごとの実行時間を tool_call_id 単位で計測する"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._started: Dict[UUID, float] = {}
+        self.elapsed: Dict[str, float] = {}
+
+    def on_tool_start(self, serialized, input_str, *, run_id: UUID, **kwargs) -> None:
+        with self._lock:
+            self._started[run_id] = time.perf_counter()
+
+    def on_tool_end(self, output, *, run_id: UUID, **kwargs) -> None:
+        self._finish(output, run_id)
+
+    def on_tool_error(self, error, *, run_id: UUID, **kwargs) -> None:
+        self._finish(None, run_id)
+
+    def _finish(self, output, run_id: UUID) -> None:
+        with self._lock:
+            started = self._started.pop(run_id, None)
+            tool_call_id = getattr(output, "tool_call_id", None)
+            if started is not None and tool_call_id:
+                self.elapsed[tool_call_id] = time.perf_counter() - started
+
+
+def iter_tool_calls(
+    model: str,
+    message: str,
+    reasoning: Optional[str] = "low",
+    tools: List[Any] = [],
+) -> Iterator[ToolEvent]:
+    """
+    エージェントにツールを使わせ、ツールの実行が終わるたびに ToolEvent を返す。
+    反復を途中でやめると、エージェントのループもそこで止まる。
+
+    Parameters
+    ----------
+    model : str
+        使用する LLM モデル名
+    message : str
+        ユーザーメッセージ
+    reasoning : str, optional
+        推論レベル。gpt-oss 以外では無視される
+    tools : List[Any], optional
+        エージェントに渡すツール
+    """
+    agent = get_agent(model, reasoning, tools)
+    timer = _ToolTimer()
+    call = start_call("tool_call", model, reasoning)
+    payload = {"messages": [{"role": "user", "content": TOOL_CALL_INSTRUCTION + message}]}
+    start = time.perf_counter()
+    step = 0
+    # tool_call_id → (name, args, モデルが呼び出しを返した時刻)
+    pending: Dict[str, tuple] = {}
+    error: Optional[BaseException] = None
+    try:
+        for update in agent.stream(
+            payload, config={"callbacks": [timer]}, stream_mode="updates"
+        ):
+            for node, state in update.items():
+                if not isinstance(state, dict):
+                    continue
+                messages = state.get("messages", [])
+                if node == "tools":
+                    now = time.perf_counter()
+                    for tool_message in messages:
+                        tool_call_id = getattr(tool_message, "tool_call_id", "")
+                        name, args, requested = pending.pop(
+                            tool_call_id, (getattr(tool_message, "name", ""), {}, now)
+                        )
+                        yield ToolEvent(
+                            name=name,
+                            args=args,
+                            tool_call_id=tool_call_id,
+                            content=tool_message.content,
+                            # コールバックで計測できなければ、呼び出しから結果までの時間
+                            elapsed=timer.elapsed.get(tool_call_id, now - requested),
+                            step=step,
+                            finished_at=now - start,
+                            error=getattr(tool_message, "status", "success") == "error",
+                        )
+                    continue
+                call.add_messages(messages)
+                for ai_message in messages:
+                    tool_calls = getattr(ai_message, "tool_calls", None) or []
+                    if tool_calls:
+                        step += 1
+                    for tool_call in tool_calls:
+                        pending[tool_call["id"]] = (
+                            tool_call["name"],
+                            tool_call.get("args", {}),
+                            time.perf_counter(),
+                        )
+    except GeneratorExit:
+        # 呼び出し元が途中で反復をやめた
+        raise
+    except BaseException as e:
+        error = e
+        raise
+    finally:
+        finish_call(call, error)
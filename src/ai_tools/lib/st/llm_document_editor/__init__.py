@@ -1,9 +1,14 @@
 from __future__ import annotations
+import logging
 import streamlit as st
 from typing import Callable
 from ai_tools.lib.llm_text_editor import LLMTextEditor
 from ai_tools.lib.llm_text_editor.type import Edit
-from ai_tools.lib.llm import simple_ask
+from ai_tools.lib.llm import FILE_SEPARATOR, PromptBudget, simple_ask
+
+logger = logging.getLogger(__name__)
+
+MODEL = "qwen3:14b"
 
 
 class LLMDocumentEditor:
@@ -32,38 +37,54 @@ class LLMDocumentEditor:
 
     def _run_edit(self, target_text: str, prompt: str):
         """LLM に問い合わせて編集を実行"""
+        # ドキュメント・参考情報はモデルのコンテキストに収まるよう切り詰める
+        # （ドキュメントを優先し、先頭と末尾を残す）
+        budget = PromptBudget(MODEL)
+        budget.add("edit", target_text + prompt, policy="keep")
+        budget.add("document", self.document, policy="head_tail", priority=1)
+        if self.extra_context:
+            budget.add("context", self.extra_context, split=FILE_SEPARATOR)
+        parts = budget.fit()
+        if budget.report.trimmed:
+            logger.info("prompt budget: %s", budget.report.summary())
+
+        # 固定の指示・ドキュメント・参考情報を先に、編集ごとに変わる内容を最後に置く
+        # （同じドキュメントへの連続した編集で Ollama の KV キャッシュが再利用される）
         message = f"""\
 ユーザー指令に基づき、編集対象文字列を置換せよ。
 出力は、全文ではなく置換内容のみにせよ。他の一切の応答は不要。
 
+テキスト：
+{parts["document"]}
+
+"""
+
+        if parts.get("context"):
+            message += f"参考情報：\n{parts['context']}\n\n"
+
+        message += f"""\
 編集対象文字列：
 {target_text}
 
 ユーザー指令：
 {prompt}
-
-テキスト：
-{self.document}
 """
 
-        if self.extra_context:
-            message += f"参考情報：\n{self.extra_context}\n\n"
-
-        print("message:" + str(message))
+        logger.debug("message: %s", message)
         response = simple_ask(
-            model="qwen3:14b", reasoning="low", message=message
+            model=MODEL, reasoning="low", message=message
         )
-        print("response:" + str(response))
+        logger.debug("response: %s", response)
         edit = Edit(
             search=target_text,
             replace=response,
         )
 
         # LLMTextEditor で実際に編集
-        print("target_text:" + str(target_text))
+        logger.debug("target_text: %s", target_text)
         editor = LLMTextEditor(self.document)
         new_text = editor.apply_edits([edit])
-        print("new_text:" + str(new_text))
+        logger.debug("new_text: %s", new_text)
 
         # 変更を反映
         self.document = new_text
@@ -0,0 +1,56 @@
+# ai_tools/lib/st/llm_telemetry/__init__.py
+import streamlit as st
+from ai_tools.lib.llm import read_log
+
+COLUMNS = [
+    "kind",
+    "model",
+    "wall_seconds",
+    "first_token_seconds",
+    "prompt_tokens",
+    "prompt_seconds",
+    "eval_tokens",
+    "eval_seconds",
+    "eval_tps",
+    "tool_calls",
+    "cached",
+    "error",
+]
+
+
+def llm_telemetry_panel(limit: int = 50, expanded: bool = False) -> None:
+    """
+    LLM 呼び出しの計測ログを表示する。
+
+    Parameters
+    ----------
+    limit : int, default 50
+        表示する件数（新しい順）。
+    expanded : bool, default False
+        expander を開いた状態で表示する。
+
+    Returns
+    -------
+    None
+    """
+    with st.expander("LLM telemetry", expanded=expanded):
+        records = read_log(limit)
+        if not records:
+            st.caption("記録なし")
+            return
+
+        calls = [r for r in records if not r.get("cached")]
+        col1, col2, col3, col4 = st.columns(4)
+        col1.metric("calls", len(records))
+        col2.metric("cache hits", len(records) - len(calls))
+        if calls:
+            wall = sum(r.get("wall_seconds", 0.0) for r in calls) / len(calls)
+            eval_tokens = sum(r.get("eval_tokens", 0) for r in calls)
+            eval_seconds = sum(r.get("eval_seconds", 0.0) for r in calls)
+            col3.metric("avg wall", f"{wall:.2f}s")
+            col4.metric(
+                "eval tok/s", f"{eval_tokens / eval_seconds:.1f}" if eval_seconds else "-"
+            )
+
+        rows = [{c: r.get(c) for c in COLUMNS} for r in reversed(records)]
+        st.dataframe(rows, hide_index=True)
@@ -0,0 +1,54 @@
+# ai_tools/lib/st/stream_writer/__init__.py
+import time
+from typing import Iterable, Optional
+import streamlit as st
+
+
+def stream_writer(
+    tokens: Iterable[str],
+    placeholder=None,
+    interval: float = 0.05,
+    cursor: str = "▌",
+    show_timing: bool = False,
+) -> str:
+    """
+    トークンのイテラブルを受け取り、届いた分から markdown で表示する。
+
+    Parameters
+    ----------
+    tokens : Iterable[str]
+        表示するトークン（stream_chat / stream_ask の戻り値など）。
+    placeholder : optional
+        描画先。省略時は st.empty() を作る。
+    interval : float, default 0.05
+        再描画の最小間隔（秒）。
+    cursor : str, default "▌"
+        生成中に末尾に表示する文字。
+    show_timing : bool, default False
+        最初のトークンまでの時間と全体の時間を st.caption で表示する。
+
+    Returns
+    -------
+    str
+        表示したテキスト全体。
+    """
+    placeholder = placeholder or st.empty()
+    start = time.perf_counter()
+    first_token = None
+    last_draw = 0.0
+    text = ""
+    for token in tokens:
+        if first_token is None:
+            first_token = time.perf_counter() - start
+        text += token
+        now = time.perf_counter()
+        if now - last_draw >= interval:
+            placeholder.markdown(text + cursor)
+            last_draw = now
+    placeholder.markdown(text)
+
+    if show_timing:
+        elapsed = time.perf_counter() - start
+        ttft = "-" if first_token is None else f"{first_token:.2f}s"
+        st.caption(f"first token: {ttft} / total: {elapsed:.2f}s")
+    return text
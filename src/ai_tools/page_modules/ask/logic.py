@@ -1,33 +1,93 @@
 import re
-from ai_tools.lib.llm import simple_ask
+from ai_tools.lib.llm import (
+    FILE_SEPARATOR,
+    SOURCEMAP_SEPARATOR,
+    PromptBudget,
+    simple_ask,
+    stream_ask,
+)
 from ai_tools.lib.llm_text_editor import LLMTextEditor
 from ai_tools.tools.edit import build_edit_data_list, edit_all
 from ai_tools.utils.file_io import read_files_content, generate_sourcemap
 
 
-def build_message(user_text, file_paths, sourcemap_paths, plan_flag):
-    message = user_text
-    if plan_flag:
-        message += "\n\n以上の要求を満たすよう計画して。ファイルパスは必ずフルパスを表示すること。"
-    if sourcemap_paths.strip():
-        sm = generate_sourcemap(sourcemap_paths)
-        if sm:
-            message += f"\n\n## Sourcemap\n{sm}"
-    if file_paths.strip():
-        message += "\n\n## Files\n"
-        files_md = read_files_content(file_paths)
+MODEL = "gpt-oss:20b"
+
+
+def compose_message(sourcemap, files_md, request, has_files):
+    # 変わりにくい大きな内容（ソースマップ・ファイル）を先に、ユーザーの文章を最後に置く。
+    # 同じファイルのまま質問だけ変えた場合、Ollama の KV キャッシュで先頭部分の評価が省かれる。
+    message = ""
+    if sourcemap:
+        message += f"## Sourcemap\n{sourcemap}\n\n"
+    if has_files:
+        message += "## Files\n"
         if files_md:
             message += f"\n\n{files_md}"
-    return message
+        message += "\n\n"
+    if message and request:
+        message += "## Request\n\n"
+    return message + request
+
+
+def build_request(user_text, plan_flag):
+    request = user_text
+    if plan_flag:
+        request += "\n\n以上の要求を満たすよう計画して。ファイルパスは必ずフルパスを表示すること。"
+    return request
+
+
+def build_message(user_text, file_paths, sourcemap_paths, plan_flag):
+    sm = generate_sourcemap(sourcemap_paths) if sourcemap_paths.strip() else ""
+    files_md = read_files_content(file_paths) if file_paths.strip() else ""
+    return compose_message(
+        sm, files_md, build_request(user_text, plan_flag), bool(file_paths.strip())
+    )
+
+
+def build_budgeted_message(user_text, file_paths, sourcemap_paths, plan_flag, model=MODEL):
+    """
+    build_message と同じ構成で、モデルのコンテキストに収まるよう切り詰めたメッセージを作る。
+    要求は削らず、ファイル・ソースマップの順に予算を割り当てる（各ファイルは先頭を残す）。
+
+    Returns
+    -------
+    Tuple[str, BudgetReport]
+        メッセージと、どのセクションをどれだけ削ったかの報告
+    """
+    budget = PromptBudget(model)
+    budget.add("request", build_request(user_text, plan_flag), policy="keep")
+    if file_paths.strip():
+        budget.add("files", read_files_content(file_paths), split=FILE_SEPARATOR)
+    if sourcemap_paths.strip():
+        budget.add(
+            "sourcemap",
+            generate_sourcemap(sourcemap_paths),
+            split=SOURCEMAP_SEPARATOR,
+            priority=-1,
+        )
+    parts = budget.fit()
+    message = compose_message(
+        parts.get("sourcemap", ""),
+        parts.get("files", ""),
+        parts["request"],
+        bool(file_paths.strip()),
+    )
+    return message, budget.report
 
 
 def execute_ai(message):
-    return simple_ask(model="gpt-oss:20b", message=message, reasoning="low")
+    return simple_ask(model=MODEL, message=message, reasoning="low")
+
+
+def stream_ai(message):
+    """execute_ai のストリーミング版。反復するとトークンを返す"""
+    return stream_ask(model=MODEL, message=message, reasoning="low")
 
 
 def apply_edits(message):
     edit_data_list = build_edit_data_list(
-        user_prompt=message, model="gpt-oss:20b", reasoning="low"
+        user_prompt=message, model=MODEL, reasoning="low"
     )
     edit_all(edit_data_list)
     return edit_data_list
@@ -1,7 +1,7 @@
 import streamlit as st
 from textwrap import dedent
 from dataclasses import dataclass
-from ai_tools.st_agents.web_search import st_agent_websearch
+from ai_tools.st_agents.web_search import DOCUMENT_MODES, st_agent_websearch
 from ai_tools.st_agents.title import st_agent_title
 
 @dataclass
@@ -19,10 +19,12 @@ st.title("Web検索")
 
 with st.form("search_form"):
     user_text = st.text_area("検索内容", value="")
+    # auto: 集めた情報が多いときはソースごとにメモにしてからまとめる（map_reduce）
+    mode = st.selectbox("ドキュメント化", DOCUMENT_MODES)
     submitted = st.form_submit_button("検索")
 
 if submitted:
-    result = st_agent_websearch(user_text)
+    result = st_agent_websearch(user_text, mode=mode)
     st.session_state.state.ai_message = result.body
     st.session_state.state.ai_title = result.title
 
@@ -7,10 +7,16 @@ from ai_tools.page_modules.ask.ui import (
     render_form,
     render_downloads,
 )
-from ai_tools.page_modules.ask.logic import build_message, execute_ai, apply_edits
+from ai_tools.page_modules.ask.logic import (
+    build_message,
+    build_budgeted_message,
+    stream_ai,
+    apply_edits,
+)
 from ai_tools.lib.st.llm_document_editor import LLMDocumentEditor
 from ai_tools.lib.st.state_manager.ui import state_manager_ui
 from ai_tools.lib.st.edit_list import edit_list_builder
+from ai_tools.lib.st.stream_writer import stream_writer
 
 
 # 1. UI
@@ -30,12 +36,21 @@ if submitted_exec or submitted_plan:
     state_manager.store(state)
 
     # 4. メッセージ作成
-    message = build_message(user_text, file_paths, sourcemap_paths, submitted_plan)
-
-    # 5. AI 呼び出し
+    # モデルのコンテキストに収まるよう、ファイル・ソースマップを切り詰める
+    message, report = build_budgeted_message(
+        user_text, file_paths, sourcemap_paths, submitted_plan
+    )
+    if report.trimmed:
+        st.warning(report.summary())
+
+    # 5. AI 呼び出し（生成中のトークンをその場で表示）
     if submitted_exec or submitted_plan:
-        result = execute_ai(message)
-        state.ai_message = result
+        stream = stream_ai(message)
+        placeholder = st.empty()
+        stream_writer(stream, placeholder, show_timing=True)
+        # 生成後は下のエディタで表示するので消す
+        placeholder.empty()
+        state.ai_message = stream.answer
 
     state_manager.store(state)
 
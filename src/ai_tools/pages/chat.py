@@ -1,8 +1,11 @@
 import streamlit as st
-from ai_tools.lib.llm import chat
+from ai_tools.lib.llm import ChatHistory, stream_chat
+from ai_tools.lib.st.stream_writer import stream_writer
 
 st.title("Chat")
 
+MODEL = "gpt-oss:20b"
+
 # システムプロンプト（ハードコード）
 SYSTEM_PROMPT = ""  # 空の場合は追加されない
 
@@ -13,6 +16,9 @@ if "editing_index" not in st.session_state:
     st.session_state.editing_index = None
 if "deleting_index" not in st.session_state:
     st.session_state.deleting_index = None
+# 送信する履歴の要約などを会話の間保持する
+if "chat_history" not in st.session_state:
+    st.session_state.chat_history = ChatHistory(MODEL)
 
 # 既存のメッセージを表示
 for idx, message in enumerate(st.session_state.messages):
@@ -75,13 +81,25 @@ if prompt := st.chat_input("メッセージを入力"):
     # ユーザーメッセージを追加
     st.session_state.messages.append({"role": "user", "content": prompt})
     
-    # LLMに送信（chat関数は全履歴を {"role": ..., "content": ...} 形式で返す）
-    st.session_state.messages = chat(
-        model="gpt-oss:20b",
-        messages=st.session_state.messages,
+    with st.chat_message("user"):
+        st.markdown(prompt)
+
+    # 過去のツール結果を除き、古いターンは要約して送信する履歴をトークン予算に収める
+    # （画面に表示する st.session_state.messages はそのまま残す）
+    history = st.session_state.chat_history
+    sent = history.prepare(st.session_state.messages)
+
+    # LLMに送信し、届いたトークンから表示する
+    # （反復完了後の stream.messages は送信した履歴＋応答を {"role": ..., "content": ...} 形式で持つ）
+    stream = stream_chat(
+        model=MODEL,
+        messages=sent,
         reasoning="low",
         tools=[]
     )
+    with st.chat_message("assistant"):
+        stream_writer(stream)
+    st.session_state.messages += stream.messages[len(sent):]
     
     # 再描画
     st.rerun()
\ No newline at end of file
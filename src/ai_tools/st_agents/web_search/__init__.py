@@ -1,18 +1,23 @@
 import streamlit as st
-from ai_tools.lib.llm import simple_ask, structured_ask, tool_call
-from ai_tools.tools.web_search import web_tools
-from textwrap import dedent
-from time import sleep
 from pydantic import BaseModel, Field
 from typing import Optional, List
 import re
 
+from .pipeline import (
+    DOCUMENT_INSTRUCTION,
+    DOCUMENT_MODES,
+    MODEL,
+    StageTiming,
+    WebSearchPipeline,
+    build_document_prompt,
+)
+
 
 """
 Web検索エージェント。
 """
 
-model = "gpt-oss:20b"
+model = MODEL
 
 
 class Information(BaseModel):
@@ -40,64 +45,43 @@ def sanitize_path(path: str) -> str:
     return path
 
 
-def st_agent_websearch(user_message: str) -> Document:
-    for i in range(5):
+def st_agent_websearch(
+    user_message: str, mode: Optional[str] = None, fan_out: Optional[int] = None
+) -> Document:
+    """
+    Web検索してドキュメントを作る。
+
+    Parameters
+    ----------
+    user_message : str
+        ユーザー要求
+    mode : str, optional
+        ドキュメント化の方式（DOCUMENT_MODES）。省略時は AI_TOOLS_WEBSEARCH_MODE
+    fan_out : int, optional
+        map_reduce でメモを同時に作る数
+    """
+    # 要求ごとに段階の結果を保存し、失敗後に再実行したときは完了済みの段階を飛ばす
+    checkpoints = st.session_state.setdefault("websearch_checkpoints", {})
+    checkpoint = checkpoints.setdefault(user_message, {})
+    with st.status("検索中...", expanded=False) as status:
+        pipeline = WebSearchPipeline(
+            user_message,
+            model=model,
+            checkpoint=checkpoint,
+            on_progress=st.write,
+            mode=mode,
+            fan_out=fan_out,
+        )
         try:
-            with st.status("検索中...", expanded=False) as status:
-                st.write("開始")
-
-                st.write("情報の収集")
-                search_result = tool_call(
-                    model=model,
-                    reasoning="low",
-                    tools=web_tools,
-                    message=dedent(
-                        f"""\
-                            ユーザー要求を直接的に満たすためにWeb検索を行い情報を収集せよ。
-                            必要な情報が集まるまで検索は何度でも行うこと。必ず最低3回実行すること。
-                            本文取得が必要であれば取得すること。
-                            名詞は絶対に勝手に変更してはならない。違う名詞の検索は無意味だ。
-                            
-                            ユーザー要求：
-                            {user_message}
-                        """
-                    ),
-                )
-                st.write(f"{len(search_result)} 件収集")
-
-                st.write("ドキュメント化")
-                response = simple_ask(
-                    model,
-                    dedent(
-                        f"""\
-                            集められた情報から、ユーザーの要求を満たすドキュメントを作成しろ。
-                            なお、ユーザーが要求しているのは特別な指示がない限り、詳細なコードではなく定義と概略である。実装手順はお前には聞いてない。
-                            お前の考えた手順は低品質かつ無意味だから出すな。一般的に行われている内容を探せ。
-                            検索結果に含まれない情報は一切出力してはならない。
-
-                            なにかを説明するときはそれが何に所属するなんなのか、出典つきで説明すること。
-
-                            見やすい形で整形し出力せよ。
-                            表は見づらいので単純なデータの列挙でのみ許可。3カラム以上の表は禁止。
-                            基本的には見出しと文章で説明せよ。
-
-                            1行目は必ずこのドキュメントのタイトルを出力すること。
-                            最後には必ず出典一覧をつけること。タイトル：URL形式。
-
-                            ユーザー要求：
-                            {user_message}
-
-                            情報：
-                            {search_result}
-                            """
-                    ),
-                )
-                sleep(1)
-
-                status.update(label="完了", state="complete", expanded=False)
-
-                title = sanitize_path(response.split("\n")[0].strip())
-            return Document(title=title, body=response)
-        except:
-            pass
-    raise ValueError("試行回数が限界に達しました。")
\ No newline at end of file
+            response = pipeline.run()
+        except ValueError:
+            status.update(label="失敗", state="error", expanded=True)
+            st.markdown(pipeline.report_markdown())
+            raise
+        st.markdown(pipeline.report_markdown())
+        status.update(label="完了", state="complete", expanded=False)
+
+    # 完了した要求のチェックポイントは不要
+    checkpoints.pop(user_message, None)
+    title = sanitize_path(response.split("\n")[0].strip())
+    return Document(title=title, body=response)
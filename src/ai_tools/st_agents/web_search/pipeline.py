@@ -0,0 +1,556 @@
+"""
+Web検索エージェントの段階実行
+
+クエリの計画 → 並列検索 → 並列取得 →（ソースごとのメモ）→ ドキュメント化 の順に実行する。
+各段階の結果はチェックポイント（辞書）に保存し、失敗した段階だけを
+指数バックオフで再試行する。検索・取得は成功したクエリ・URL を保存するので、
+再試行では失敗した分だけをやり直す。検索・取得は 1 件終わるたびに進捗を報告し、
+取得は MAX_FETCH 件の本文が集まった時点でやめる（取得できない URL は次の順位で補う）。
+
+チェックポイントに st.session_state の辞書を渡せば、途中で失敗しても
+同じ要求を再実行したときに完了済みの段階を飛ばせる。
+
+```python
+pipeline = WebSearchPipeline(user_message, on_progress=st.write)
+body = pipeline.run()
+st.markdown(pipeline.report_markdown())
+```
+
+ドキュメント化の方式（mode）
+
+- single: 全ソースを 1 つのプロンプトに入れて 1 回で書く
+- map_reduce: ソースごとに要求に関係する事実だけを URL 付きのメモにまとめ（fan_out 件ずつ並列）、
+  メモを集めて最後に 1 回で書く。最後の呼び出しのプロンプトが短くなる
+- auto: single のプロンプトがモデルのコンテキスト長（context_size から出力用の予約を引いた分）に
+  収まれば single、収まらず削ることになるときだけ map_reduce
+
+既定は環境変数 AI_TOOLS_WEBSEARCH_MODE（既定 auto）。
+2 つの方式の比較は bench/websearch_document.py で行う。
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import time
+from dataclasses import dataclass
+from textwrap import dedent
+from typing import Any, Callable, Dict, List, Optional
+
+from pydantic import BaseModel, Field
+
+from ai_tools.lib.llm import (
+    PromptBudget,
+    asimple_ask,
+    default_parallel,
+    gather,
+    run_sync,
+    simple_ask,
+    structured_ask,
+)
+from ai_tools.tools.web import PART_SIZE, AsyncFetcher, CachedPage, canonical_url, part_text
+from ai_tools.tools.web_search import fetch_page, search_text
+
+MODEL = "gpt-oss:20b"
+
+# 計画するクエリ数の上限
+MAX_QUERIES = 5
+# 1 クエリあたりの検索結果数
+RESULTS_PER_QUERY = 5
+# 本文を取得するページ数の上限
+MAX_FETCH = 8
+# 同時に実行する検索・取得の数
+SEARCH_PARALLEL = 4
+FETCH_PARALLEL = 8
+# 1 ページの取得のタイムアウト（秒）
+FETCH_TIMEOUT = 20
+# 4xx のうち、時間をおけば成功しうるもの
+TRANSIENT_STATUS = (408, 425, 429)
+# 段階ごとの試行回数と、再試行までの待ち時間（秒、試行ごとに倍にする）
+STAGE_ATTEMPTS = 3
+BACKOFF_SECONDS = 1.0
+
+DOCUMENT_MODES = ("auto", "single", "map_reduce")
+DOCUMENT_MODE = os.environ.get("AI_TOOLS_WEBSEARCH_MODE", "auto")
+# メモにするソース数の上限（本文を取得した上位のソース）
+MAX_NOTES = MAX_FETCH
+# メモに要求に関係する情報が無いときの出力
+NO_NOTES = "なし"
+
+
+class QueryPlan(BaseModel):
+    queries: List[str] = Field(default=[], description="検索クエリ")
+
+
+PLAN_INSTRUCTION = dedent(
+    """\
+    ユーザー要求を直接的に満たす情報を集めるためのWeb検索クエリを3〜5個作成せよ。
+    クエリは互いに異なる観点（定義、公式ドキュメント、比較、事例など）にすること。
+    名詞は絶対に勝手に変更してはならない。違う名詞の検索は無意味だ。
+
+    """
+)
+
+DOCUMENT_INSTRUCTION = dedent(
+    """\
+    集められた情報から、ユーザーの要求を満たすドキュメントを作成しろ。
+    なお、ユーザーが要求しているのは特別な指示がない限り、詳細なコードではなく定義と概略である。実装手順はお前には聞いてない。
+    お前の考えた手順は低品質かつ無意味だから出すな。一般的に行われている内容を探せ。
+    検索結果に含まれない情報は一切出力してはならない。
+
+    なにかを説明するときはそれが何に所属するなんなのか、出典つきで説明すること。
+
+    見やすい形で整形し出力せよ。
+    表は見づらいので単純なデータの列挙でのみ許可。3カラム以上の表は禁止。
+    基本的には見出しと文章で説明せよ。
+
+    1行目は必ずこのドキュメントのタイトルを出力すること。
+    最後には必ず出典一覧をつけること。タイトル：URL形式。
+    """
+)
+
+
+NOTE_INSTRUCTION = dedent(
+    f"""\
+    以下の情報源から、ユーザー要求に関係する事実・定義・数値だけを箇条書きのメモにまとめよ。
+    情報源に書かれていないことは書いてはならない。名詞は変更しないこと。
+    メモは短く、最大10項目。関係する情報が無ければ「{NO_NOTES}」とだけ出力すること。
+
+    """
+)
+
+
+def build_note_prompt(user_message: str, source: dict, model: str = MODEL) -> str:
+    """
+    1 つの情報源をメモにするプロンプトを作る。
+    固定の指示を先頭に置き、並列に投げる呼び出し間でプロンプトの先頭を共通にする。
+    """
+    budget = PromptBudget(model)
+    budget.add("instruction", NOTE_INSTRUCTION, policy="keep")
+    budget.add("request", user_message, policy="keep")
+    budget.add("source", source.get("body", ""))
+    parts = budget.fit()
+    return (
+        f"{NOTE_INSTRUCTION}"
+        f"ユーザー要求：\n{user_message}\n\n"
+        f"情報源：{source.get('title', '')}（{source['url']}）\n{parts['source']}\n"
+    )
+
+
+def build_document_prompt(user_message: str, search_result: List[dict], model: str = MODEL):
+    """
+    ドキュメント化のプロンプトを作る。
+    固定の指示 → 検索結果 → ユーザー要求の順に並べ、検索結果はトークン予算に収める。
+
+    Returns
+    -------
+    Tuple[str, BudgetReport]
+        プロンプトと、検索結果をどれだけ削ったかの報告
+    """
+    budget = PromptBudget(model)
+    budget.add("instruction", DOCUMENT_INSTRUCTION, policy="keep")
+    budget.add("request", user_message, policy="keep")
+    budget.add(
+        "results",
+        [json.dumps(r, ensure_ascii=False) for r in search_result],
+        joiner="\n",
+    )
+    parts = budget.fit()
+    prompt = (
+        f"{DOCUMENT_INSTRUCTION}\n"
+        f"情報：\n{parts['results']}\n\n"
+        f"ユーザー要求：\n{user_message}\n"
+    )
+    return prompt, budget.report
+
+
+@dataclass
+class StageTiming:
+    name: str
+    # 全試行の合計時間（バックオフの待ち時間を含む）
+    seconds: float = 0.0
+    attempts: int = 0
+    # 段階が扱った件数（クエリ数・URL 数など）
+    items: int = 0
+    # チェックポイントから復元したか
+    resumed: bool = False
+    # 最後の試行のエラー（成功すれば空）
+    error: str = ""
+
+    @property
+    def ok(self) -> bool:
+        return not self.error
+
+    def summary(self) -> str:
+        if self.resumed:
+            return f"{self.name}: checkpoint ({self.items} items)"
+        text = f"{self.name}: {self.seconds:.1f}s, {self.items} items"
+        if self.attempts > 1:
+            text += f", {self.attempts} attempts"
+        if self.error:
+            text += f", failed: {self.error}"
+        return text
+
+
+class StageIncomplete(Exception):
+    """一部の項目が失敗した（成功した items 件はチェックポイントに保存済み）"""
+
+    def __init__(self, message: str, items: int):
+        super().__init__(message)
+        self.items = items
+
+
+class WebSearchPipeline:
+    """
+    Web検索からドキュメント作成までの段階実行。
+
+    Parameters
+    ----------
+    user_message : str
+        ユーザー要求
+    model : str, default MODEL
+        計画とドキュメント化に使うモデル
+    checkpoint : Dict[str, Any], optional
+        段階ごとの結果の保存先。省略時は新しい辞書
+    attempts : int, default STAGE_ATTEMPTS
+        段階ごとの試行回数
+    backoff : float, default BACKOFF_SECONDS
+        最初の再試行までの待ち時間（秒）。以降は倍にする
+    on_progress : Callable[[str], None], optional
+        進捗メッセージを受け取る関数（st.write など）
+    mode : str, optional
+        ドキュメント化の方式（DOCUMENT_MODES）。省略時は DOCUMENT_MODE
+    fan_out : int, optional
+        map_reduce でメモを同時に作る数。省略時は default_parallel()
+    use_cache : bool, default True
+        LLM の応答キャッシュを使うか（ベンチマークでは False）
+    """
+
+    def __init__(
+        self,
+        user_message: str,
+        *,
+        model: str = MODEL,
+        checkpoint: Optional[Dict[str, Any]] = None,
+        attempts: int = STAGE_ATTEMPTS,
+        backoff: float = BACKOFF_SECONDS,
+        on_progress: Optional[Callable[[str], None]] = None,
+        mode: Optional[str] = None,
+        fan_out: Optional[int] = None,
+        use_cache: bool = True,
+    ):
+        self.user_message = user_message
+        self.model = model
+        self.checkpoint = checkpoint if checkpoint is not None else {}
+        self.attempts = attempts
+        self.backoff = backoff
+        self.on_progress = on_progress or (lambda message: None)
+        self.mode = mode or DOCUMENT_MODE
+        if self.mode not in DOCUMENT_MODES:
+            raise ValueError(f"unknown mode: {self.mode}")
+        self.fan_out = fan_out or default_parallel()
+        self.use_cache = use_cache
+        # 実行中の段階の試行回数（0 始まり）
+        self.attempt = 0
+        self.timings: List[StageTiming] = []
+
+    # ------------------------------------------------------------------
+    #  実行
+    # ------------------------------------------------------------------
+    def run(self) -> str:
+        """
+        全段階を実行してドキュメントを返す。
+
+        Raises
+        ------
+        ValueError
+            検索結果が 1 件も得られなかった、またはドキュメント化に失敗した
+        """
+        self.timings = []
+        self.collect()
+        return self.write()
+
+    def collect(self) -> None:
+        """計画・検索・取得を実行する"""
+        self.run_stage("plan", self.plan)
+        if not self.checkpoint.get("plan"):
+            # 計画に失敗したら要求そのものを検索する。
+            # 再実行で計画をやり直すと検索済みのクエリと食い違うので、完了扱いにする
+            self.checkpoint["plan"] = [self.user_message]
+            self.checkpoint.setdefault("completed", []).append("plan")
+
+        # 計画のクエリで未検索のものがあれば、検索が完了済みでもやり直す
+        done = self.checkpoint.get("search", {})
+        if any(q not in done for q in self.checkpoint["plan"]):
+            self.checkpoint["completed"] = [
+                name for name in self.checkpoint.get("completed", []) if name != "search"
+            ]
+        self.run_stage("search", self.search)
+        if not self.checkpoint.get("search"):
+            raise ValueError(f"検索に失敗しました: {self.timings[-1].error}")
+
+        # 取得に失敗したページは検索結果の要約で代用する
+        self.run_stage("fetch", self.fetch)
+
+    def write(self) -> str:
+        """集めた情報からドキュメントを作る（collect の後に呼ぶ）"""
+        if self.resolved_mode() == "map_reduce":
+            # メモを作れなかったソースは元の本文のまま使う
+            self.run_stage("notes", self.notes)
+        if not self.run_stage("document", self.document):
+            raise ValueError(f"ドキュメント化に失敗しました: {self.timings[-1].error}")
+        return self.checkpoint["document"]
+
+    def run_stage(self, name: str, func: Callable[[], int]) -> bool:
+        """
+        段階を実行する。完了済みならチェックポイントを使い、失敗したら
+        バックオフを挟んで attempts 回まで再試行する。
+
+        Returns
+        -------
+        bool
+            完了したか
+        """
+        timing = StageTiming(name)
+        self.timings.append(timing)
+        if name in self.checkpoint.get("completed", []):
+            timing.resumed = True
+            timing.items = _count(self.checkpoint.get(name))
+            self.on_progress(timing.summary())
+            return True
+
+        start = time.perf_counter()
+        for attempt in range(self.attempts):
+            self.attempt = attempt
+            timing.attempts = attempt + 1
+            try:
+                timing.items = func()
+                timing.error = ""
+                self.checkpoint.setdefault("completed", []).append(name)
+                break
+            except Exception as e:
+                timing.error = f"{type(e).__name__}: {e}"
+                timing.items = getattr(e, "items", timing.items)
+                if attempt + 1 < self.attempts:
+                    wait = self.backoff * 2**attempt
+                    self.on_progress(f"{name}: {timing.error}（{wait:.1f}s 後に再試行）")
+                    time.sleep(wait)
+        timing.seconds = time.perf_counter() - start
+        self.on_progress(timing.summary())
+        return timing.ok
+
+    def cache_enabled(self) -> bool:
+        """
+        LLM の応答キャッシュを使うか。空の応答もキャッシュされるので、
+        再試行では同じ失敗を返さないようキャッシュを通さない
+        """
+        return self.use_cache and self.attempt == 0
+
+    # ------------------------------------------------------------------
+    #  段階
+    # ------------------------------------------------------------------
+    def plan(self) -> int:
+        """検索クエリを作る"""
+        result = structured_ask(
+            model=self.model,
+            reasoning="low",
+            schema=QueryPlan,
+            use_cache=self.cache_enabled(),
+            message=f"{PLAN_INSTRUCTION}ユーザー要求：\n{self.user_message}\n",
+        )
+        queries = list(dict.fromkeys(q.strip() for q in result.queries if q.strip()))
+        if not queries:
+            raise ValueError("クエリが空です")
+        self.checkpoint["plan"] = queries[:MAX_QUERIES]
+        return len(self.checkpoint["plan"])
+
+    def search(self) -> int:
+        """クエリを並列に検索する。成功したクエリの結果は保存し、再試行では失敗分だけ検索する"""
+        done: Dict[str, list] = self.checkpoint.setdefault("search", {})
+        queries = [q for q in self.checkpoint["plan"] if q not in done]
+        fetcher = AsyncFetcher(
+            lambda q: search_text(q, max_results=RESULTS_PER_QUERY),
+            max_concurrency=SEARCH_PARALLEL,
+            # クエリなのでホスト単位の制限は掛けない
+            skip_limit=lambda q: True,
+            on_result=lambda q, results, seconds: self.on_progress(
+                f"search({q}) {seconds:.1f}s → "
+                + (f"{len(results)} 件" if results is not None else "失敗")
+            ),
+        )
+        for query, results in zip(queries, fetcher.fetch_all_sync(queries)):
+            if results is not None:
+                done[query] = results
+        failed = len(queries) - sum(q in done for q in queries)
+        if failed:
+            raise StageIncomplete(f"{failed}/{len(queries)} 件の検索に失敗", len(done))
+        return len(done)
+
+    def fetch(self) -> int:
+        """
+        上位の URL から順に本文を並列に取得し、MAX_FETCH 件取得できたらやめる。
+        取得できなかった分は次の順位の URL で補う。4xx など再試行しても変わらない失敗は
+        チェックポイントに記録して以降は取得しない。一時的な失敗のために MAX_FETCH 件に
+        届かなかった場合だけ失敗にし、段階の再試行でやり直す
+        """
+        done: Dict[str, dict] = self.checkpoint.setdefault("fetch", {})
+        rejected: Dict[str, str] = self.checkpoint.setdefault("fetch_rejected", {})
+        candidates = [
+            s["url"] for s in self.sources() if s["url"] not in done and s["url"] not in rejected
+        ]
+        fetcher = AsyncFetcher(
+            lambda u: fetch_page(u, timeout=FETCH_TIMEOUT, max_chars=2 * PART_SIZE),
+            max_concurrency=FETCH_PARALLEL,
+            on_result=lambda u, page, seconds: self.on_progress(
+                f"fetch({u}) {seconds:.1f}s → {_fetch_status(page)}"
+            ),
+        )
+        failed = 0
+        while len(done) < MAX_FETCH and candidates:
+            count = MAX_FETCH - len(done)
+            urls, candidates = candidates[:count], candidates[count:]
+            for url, page in zip(urls, fetcher.fetch_all_sync(urls)):
+                if page is not None and page.text:
+                    done[url] = _excerpt(page)
+                elif _is_permanent(page):
+                    rejected[url] = _fetch_status(page)
+                else:
+                    failed += 1
+        if failed and len(done) < MAX_FETCH:
+            raise StageIncomplete(f"{failed} 件の取得に失敗", len(done))
+        return len(done)
+
+    def notes(self) -> int:
+        """本文を取得した上位のソースを並列にメモにする。再試行では失敗したソースだけを投げる"""
+        done: Dict[str, str] = self.checkpoint.setdefault("notes", {})
+        fetched = self.checkpoint.get("fetch", {})
+        sources = [s for s in self.sources() if s["url"] in fetched][:MAX_NOTES]
+        sources = [s for s in sources if s["url"] not in done]
+        prompts = [build_note_prompt(self.user_message, s, self.model) for s in sources]
+        results = run_sync(
+            lambda: gather(
+                *(asimple_ask(self.model, p, use_cache=self.cache_enabled()) for p in prompts),
+                limit=self.fan_out,
+                return_exceptions=True,
+            )
+        )
+        for source, result in zip(sources, results):
+            if not isinstance(result, BaseException):
+                done[source["url"]] = result.strip()
+        failed = len(sources) - sum(s["url"] in done for s in sources)
+        if failed:
+            raise StageIncomplete(f"{failed}/{len(sources)} 件のメモに失敗", len(done))
+        return len(done)
+
+    def document(self) -> int:
+        """集めた情報（map_reduce ではメモ）からドキュメントを作る"""
+        prompt, report = build_document_prompt(
+            self.user_message, self.document_sources(), self.model
+        )
+        self.on_progress(report.summary())
+        response = simple_ask(self.model, prompt, use_cache=self.cache_enabled())
+        if not response.strip():
+            raise ValueError("応答が空です")
+        self.checkpoint["document"] = response
+        return 1
+
+    # ------------------------------------------------------------------
+    #  結果
+    # ------------------------------------------------------------------
+    def sources(self) -> List[dict]:
+        """
+        検索結果を URL で重複除去し、各クエリの上位から交互に並べる。
+        本文を取得できたものは本文に置き換える。
+        """
+        fetched: Dict[str, dict] = self.checkpoint.get("fetch", {})
+        ranked = [
+            self.checkpoint.get("search", {}).get(q, []) for q in self.checkpoint.get("plan", [])
+        ]
+        sources: List[dict] = []
+        seen = set()
+        for rank in range(max(map(len, ranked), default=0)):
+            for results in ranked:
+                if rank >= len(results):
+                    continue
+                result = results[rank]
+                url = result.get("href") or result.get("url") or ""
+                key = canonical_url(url) if url else ""
+                if not key or key in seen:
+                    continue
+                seen.add(key)
+                source = {
+                    "url": url,
+                    "title": result.get("title", ""),
+                    "body": result.get("body", ""),
+                }
+                if url in fetched:
+                    source.update(fetched[url])
+                sources.append(source)
+        return sources
+
+    def resolved_mode(self) -> str:
+        """
+        auto を single / map_reduce に決める。
+        全ソースを入れた single のプロンプトが予算（PromptBudget）に収まらないときだけ map_reduce にする。
+        """
+        if self.mode != "auto":
+            return self.mode
+        _, report = build_document_prompt(self.user_message, self.sources(), self.model)
+        return "map_reduce" if report.trimmed else "single"
+
+    def document_sources(self) -> List[dict]:
+        """ドキュメント化のプロンプトに入れる情報。メモがあるソースは本文をメモに置き換える"""
+        if self.resolved_mode() != "map_reduce":
+            return self.sources()
+        notes: Dict[str, str] = self.checkpoint.get("notes", {})
+        result = []
+        for source in self.sources():
+            note = notes.get(source["url"])
+            if note is None:
+                result.append(source)
+            elif note.strip("。. ") != NO_NOTES:
+                result.append({"url": source["url"], "title": source["title"], "notes": note})
+        return result
+
+    def report_markdown(self) -> str:
+        """段階ごとの時間の表"""
+        lines = ["| stage | seconds | attempts | items | status |", "|---|---:|---:|---:|---|"]
+        for t in self.timings:
+            status = "checkpoint" if t.resumed else ("ok" if t.ok else t.error)
+            lines.append(f"| {t.name} | {t.seconds:.1f} | {t.attempts} | {t.items} | {status} |")
+        return "\n".join(lines)
+
+
+def _is_permanent(page: Optional[CachedPage]) -> bool:
+    """再試行しても結果が変わらない取得の失敗か（4xx、本文にテキストが無いページ）"""
+    if page is None or page.text:
+        return False
+    if page.error_status:
+        return 400 <= page.error_status < 500 and page.error_status not in TRANSIENT_STATUS
+    # 取得はできたがテキストが無い（fetched_at は取得に成功したときだけ入る）
+    return page.fetched_at > 0
+
+
+def _fetch_status(page: Optional[CachedPage]) -> str:
+    if page is not None and page.text:
+        status = f"{len(page.text)} 文字"
+        if page.stats.get("total_chars"):
+            # 本文抽出で除いた定型部分（メニュー・フッターなど）の割合
+            status += f"（定型部分 {page.stats['boilerplate_ratio']:.0%} を除去）"
+        return status
+    if page is not None and page.error_status:
+        return f"HTTP {page.error_status}"
+    if page is not None and page.fetched_at:
+        return "テキストなし"
+    return "失敗"
+
+
+def _excerpt(page: CachedPage) -> Dict[str, str]:
+    # 先頭の part 1 つ分だけを使う（残りはトークン予算で削られるだけなので取らない）
+    return {"body": part_text(page.text, page.ensure_chunks(), 1)}
+
+
+def _count(value: Any) -> int:
+    if isinstance(value, (list, dict)):
+        return len(value)
+    return 1 if value else 0
@@ -2,11 +2,15 @@
 from .edit_data import EditData, EditType
 from typing import List
 from ai_tools.lib.llm import structured_ask
+import logging
 import os
 from .utils import edit_one
 from pydantic import BaseModel, Field
 
 
+logger = logging.getLogger(__name__)
+
+
 class Result(BaseModel):
     edit_data_list: List[EditData] = Field(default=[], description="EditDataのリスト")
 
@@ -17,11 +21,7 @@ def build_edit_data_list(
     """
     ユーザーのプロンプトを受け取り、LLM で EditData のリストを生成。
     """
-    print('########################################')
-    print('########################################')
-    print('user_prompt:' + str(user_prompt))
-    print('########################################')
-    print('########################################')
+    logger.debug("user_prompt: %s", user_prompt)
     for i in range(5):
         # LLM に渡すプロンプト例
         prompt = f"""
@@ -45,12 +45,12 @@ def build_edit_data_list(
 計画:
 {user_prompt}
     """
-        print('prompt:' + str(prompt))
+        logger.debug("prompt: %s", prompt)
         # 生成結果は EditData のリスト
         result = structured_ask(
             model=model, message=prompt, schema=Result, reasoning=reasoning
         )
-        print('result:' + str(result))
+        logger.debug("result: %s", result)
         return result.edit_data_list
     raise ValueError("build_edit_data_list:試行回数が限界に達しました。")
 
@@ -0,0 +1,95 @@
+from .session import HttpSession, HttpResponse, get_session, configure_session
+from .cache import CachedPage, PageCache, get_page_cache, configure_page_cache
+from .fetcher import AsyncFetcher, run_sync
+from .pdf import PdfDocument, iter_pdf_pages, extract_pdf_text
+from .chunk import PART_SIZE, normalize_text, chunk_bounds, part_text, total_parts
+from .html_text import TextExtractor, FastTextExtractor, make_text_extractor
+from .readability import MainContentExtractor
+from .charset import (
+    StreamDecoder,
+    detect_charset,
+    decode_bytes,
+    header_charset,
+    normalize_charset,
+)
+from .links import (
+    LinkExtractor,
+    CrawlFrontier,
+    canonical_url,
+    resolve_link,
+    extract_links_from_html,
+)
+from .status import UrlStatus, check_url, check_urls, format_status
+from .find import Match, WordIndex, compile_patterns, find_matches, get_word_index
+from .search_backend import (
+    SearchBackend,
+    DdgsBackend,
+    LocalIndexBackend,
+    FallbackBackend,
+    page_title,
+    make_search_backend,
+    get_search_backend,
+    configure_search_backend,
+)
+from .search_cache import (
+    SearchCache,
+    get_search_cache,
+    configure_search_cache,
+    normalize_query,
+)
+
+__all__ = [
+    "HttpSession",
+    "HttpResponse",
+    "get_session",
+    "configure_session",
+    "CachedPage",
+    "PageCache",
+    "get_page_cache",
+    "configure_page_cache",
+    "AsyncFetcher",
+    "run_sync",
+    "PdfDocument",
+    "iter_pdf_pages",
+    "extract_pdf_text",
+    "PART_SIZE",
+    "normalize_text",
+    "chunk_bounds",
+    "part_text",
+    "total_parts",
+    "TextExtractor",
+    "FastTextExtractor",
+    "make_text_extractor",
+    "MainContentExtractor",
+    "SearchCache",
+    "get_search_cache",
+    "configure_search_cache",
+    "normalize_query",
+    "SearchBackend",
+    "DdgsBackend",
+    "LocalIndexBackend",
+    "FallbackBackend",
+    "page_title",
+    "make_search_backend",
+    "get_search_backend",
+    "configure_search_backend",
+    "Match",
+    "WordIndex",
+    "compile_patterns",
+    "find_matches",
+    "get_word_index",
+    "UrlStatus",
+    "check_url",
+    "check_urls",
+    "format_status",
+    "LinkExtractor",
+    "CrawlFrontier",
+    "canonical_url",
+    "resolve_link",
+    "extract_links_from_html",
+    "StreamDecoder",
+    "detect_charset",
+    "decode_bytes",
+    "header_charset",
+    "normalize_charset",
+]
@@ -0,0 +1,359 @@
+"""
+取得済みページのディスクキャッシュ
+
+正規化済み URL（encode_url の結果）の SHA-256 をキーに、
+生データ・抽出テキスト・レスポンスヘッダー・part の境界索引を保存する。
+TTL 切れのエントリは ETag / Last-Modified で条件付き再検証し、
+総サイズが上限を超えたら最終アクセスが古い順に削除する。
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional
+
+from ai_tools.utils.cache_dir import default_cache_dir
+
+from .chunk import chunk_bounds
+
+
+# 上限を超えたときに削除して減らす先（max_bytes に対する割合）
+EVICT_TARGET = 0.9
+
+
+@dataclass
+class CachedPage:
+    url: str
+    raw: bytes = b""
+    text: str = ""
+    headers: Dict[str, str] = field(default_factory=dict)
+    fetched_at: float = 0.0
+    # text が全体を含むか（PDF を途中のページまでしか展開していない場合は False）
+    complete: bool = True
+    # part の境界位置（chunk.chunk_bounds の結果）
+    chunks: List[int] = field(default_factory=list)
+    # テキストの抽出方法（"main": 本文のみ、"full": 全文、"pdf"）
+    extract_mode: str = ""
+    # 抽出時の統計（MainContentExtractor.report）
+    stats: Dict[str, float] = field(default_factory=dict)
+    # リダイレクト後の URL（リダイレクトが無ければ空）
+    final_url: str = ""
+    # 取得に失敗したときの HTTP ステータス（4xx/5xx。保存はしない）
+    error_status: int = 0
+
+    @property
+    def base_url(self) -> str:
+        """相対リンクの基準にする URL（リダイレクト後の URL）"""
+        return self.final_url or self.url
+
+    def ensure_chunks(self) -> List[int]:
+        """part の境界索引を返す（未計算なら計算する）"""
+        if not self.chunks or self.chunks[-1] != len(self.text):
+            self.chunks = chunk_bounds(self.text)
+        return self.chunks
+
+    @property
+    def etag(self) -> Optional[str]:
+        return self.headers.get("ETag")
+
+    @property
+    def last_modified(self) -> Optional[str]:
+        return self.headers.get("Last-Modified")
+
+    def validators(self) -> Dict[str, str]:
+        """条件付きリクエスト用のヘッダーを返す"""
+        headers = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+
+class PageCache:
+    """
+    ページのディスクキャッシュ。
+
+    1 エントリにつき <key>.json（URL・ヘッダー・取得時刻）、<key>.bin（生データ）、
+    <key>.txt（抽出テキスト）の 3 ファイルを保存する。
+    LRU の判定には .json の mtime を使い、get のたびに更新する。
+    直近に使ったエントリはメモリにも保持し、同じページの part 連続取得ではディスクを読まない。
+
+    Parameters
+    ----------
+    directory : Path, optional
+        保存先ディレクトリ。省略時は default_cache_dir() / "pages"
+    ttl : float, default 3600
+        再検証なしで使える秒数
+    max_bytes : int, default 256MB
+        キャッシュ全体のサイズ上限
+    memory_items : int, default 16
+        メモリに保持するエントリ数
+    """
+
+    def __init__(
+        self,
+        directory: Optional[Path] = None,
+        *,
+        ttl: float = 3600,
+        max_bytes: int = 256 * 1024 * 1024,
+        memory_items: int = 16,
+    ):
+        self.directory = Path(directory) if directory else default_cache_dir() / "pages"
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.memory_items = memory_items
+        self._memory: "OrderedDict[str, CachedPage]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._listeners: List[Callable[[CachedPage], None]] = []
+        # 総サイズ（put / delete で増減する。None なら未集計で、次の put で数え直す）
+        self._total: Optional[int] = None
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+    @staticmethod
+    def key(url: str) -> str:
+        return hashlib.sha256(url.encode("utf-8")).hexdigest()
+
+    def _path(self, key: str, suffix: str) -> Path:
+        return self.directory / f"{key}{suffix}"
+
+    def _write(self, path: Path, data: bytes) -> None:
+        # 書き込み途中のファイルを読まないように一時ファイル経由で置き換える
+        tmp = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        tmp.write_bytes(data)
+        os.replace(tmp, path)
+
+    def _write_meta(self, key: str, page: CachedPage) -> None:
+        meta = {
+            "url": page.url,
+            "headers": page.headers,
+            "fetched_at": page.fetched_at,
+            "complete": page.complete,
+            "chunks": page.ensure_chunks(),
+            "extract_mode": page.extract_mode,
+            "stats": page.stats,
+            "final_url": page.final_url,
+        }
+        self._write(
+            self._path(key, ".json"),
+            json.dumps(meta, ensure_ascii=False).encode("utf-8"),
+        )
+
+    def _remember(self, key: str, page: CachedPage) -> None:
+        self._memory[key] = page
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_items:
+            self._memory.popitem(last=False)
+
+    # ------------------------------------------------------------------
+    # 読み書き
+    # ------------------------------------------------------------------
+    def get(self, url: str) -> Optional[CachedPage]:
+        """
+        キャッシュを取得する。鮮度は判定しない（is_fresh で確認する）。
+
+        Parameters
+        ----------
+        url : str
+            encode_url で正規化済みの URL
+
+        Returns
+        -------
+        Optional[CachedPage]
+            キャッシュが無い・壊れている場合は None
+        """
+        key = self.key(url)
+        meta_path = self._path(key, ".json")
+        with self._lock:
+            page = self._memory.get(key)
+            if page is not None:
+                self._memory.move_to_end(key)
+        try:
+            if page is not None:
+                os.utime(meta_path)
+                return page
+            page = self._read(key, url)
+            os.utime(meta_path)
+        except (OSError, ValueError):
+            with self._lock:
+                self._memory.pop(key, None)
+            return None
+        with self._lock:
+            self._remember(key, page)
+        return page
+
+    def peek(self, url: str) -> Optional[CachedPage]:
+        """
+        get と同じだが、最終アクセス時刻（LRU の順序）もメモリ上のエントリも更新しない。
+        索引の作成など、利用とみなさない読み込みに使う。
+        """
+        key = self.key(url)
+        with self._lock:
+            page = self._memory.get(key)
+        if page is not None:
+            return page
+        try:
+            return self._read(key, url)
+        except (OSError, ValueError):
+            return None
+
+    def _read(self, key: str, url: str) -> CachedPage:
+        meta = json.loads(self._path(key, ".json").read_text(encoding="utf-8"))
+        raw = self._path(key, ".bin").read_bytes()
+        text = self._path(key, ".txt").read_text(encoding="utf-8")
+        return CachedPage(
+            url=meta.get("url", url),
+            raw=raw,
+            text=text,
+            headers=meta.get("headers", {}),
+            fetched_at=meta.get("fetched_at", 0.0),
+            complete=meta.get("complete", True),
+            chunks=meta.get("chunks", []),
+            extract_mode=meta.get("extract_mode", ""),
+            stats=meta.get("stats", {}),
+            final_url=meta.get("final_url", ""),
+        )
+
+    def read_meta(self) -> Iterator[Dict]:
+        """全エントリのメタ情報（URL・取得時刻など）。最終アクセス時刻は更新しない"""
+        for meta_path in self.directory.glob("*.json"):
+            try:
+                yield json.loads(meta_path.read_text(encoding="utf-8"))
+            except (OSError, ValueError):
+                continue
+
+    def add_listener(self, callback: Callable[[CachedPage], None]) -> None:
+        """put のたびに保存したページで callback を呼ぶ（ローカル索引の差分更新用）"""
+        with self._lock:
+            if callback not in self._listeners:
+                self._listeners.append(callback)
+
+    def has_fresh(self, url: str) -> bool:
+        """TTL 内のエントリがあるか（本文は読まずにメタ情報だけ見る）"""
+        meta_path = self._path(self.key(url), ".json")
+        try:
+            meta = json.loads(meta_path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return False
+        return time.time() - meta.get("fetched_at", 0.0) < self.ttl
+
+    def put(self, page: CachedPage) -> None:
+        """キャッシュを保存し、必要なら古いエントリを削除する"""
+        key = self.key(page.url)
+        page.fetched_at = page.fetched_at or time.time()
+        with self._lock:
+            old_size = self._entry_size(key)
+            self._write(self._path(key, ".bin"), page.raw)
+            self._write(self._path(key, ".txt"), page.text.encode("utf-8"))
+            # .json は最後に書く（.json があれば他も揃っている）
+            self._write_meta(key, page)
+            self._remember(key, page)
+            self._add_size(self._entry_size(key) - old_size)
+            # ディレクトリを走査するのは上限を超えたとき（と初回）だけ
+            if self._total is None or self._total > self.max_bytes:
+                self.evict()
+            listeners = list(self._listeners)
+        for callback in listeners:
+            callback(page)
+
+    def touch(self, page: CachedPage) -> None:
+        """再検証（304）で有効と分かったエントリの取得時刻を更新する"""
+        page.fetched_at = time.time()
+        key = self.key(page.url)
+        with self._lock:
+            old_size = self._entry_size(key)
+            self._write_meta(key, page)
+            self._remember(key, page)
+            self._add_size(self._entry_size(key) - old_size)
+
+    def is_fresh(self, page: CachedPage) -> bool:
+        return time.time() - page.fetched_at < self.ttl
+
+    def delete(self, url: str) -> None:
+        key = self.key(url)
+        with self._lock:
+            self._memory.pop(key, None)
+            self._add_size(-self._entry_size(key))
+            for suffix in (".json", ".bin", ".txt"):
+                self._path(key, suffix).unlink(missing_ok=True)
+
+    # ------------------------------------------------------------------
+    # LRU 削除
+    # ------------------------------------------------------------------
+    def _entry_size(self, key: str) -> int:
+        size = 0
+        for suffix in (".json", ".bin", ".txt"):
+            try:
+                size += self._path(key, suffix).stat().st_size
+            except OSError:
+                pass
+        return size
+
+    def _add_size(self, delta: int) -> None:
+        if self._total is not None:
+            self._total += delta
+
+    def evict(self) -> None:
+        """
+        総サイズが max_bytes を超えていれば最終アクセスが古い順に max_bytes * EVICT_TARGET まで削除する。
+        ディレクトリ全体を走査して総サイズを数え直す（他のプロセスの書き込みもここで反映される）。
+        """
+        entries = []
+        total = 0
+        for meta_path in self.directory.glob("*.json"):
+            key = meta_path.stem
+            size = self._entry_size(key)
+            try:
+                last_access = meta_path.stat().st_mtime
+            except OSError:
+                continue
+            entries.append((last_access, key, size))
+            total += size
+
+        if total > self.max_bytes:
+            # 上限ぎりぎりまでにすると次の put でまた走査するので、少し余裕を空ける
+            target = int(self.max_bytes * EVICT_TARGET)
+            entries.sort()
+            for _, key, size in entries:
+                if total <= target:
+                    break
+                self._memory.pop(key, None)
+                for suffix in (".json", ".bin", ".txt"):
+                    self._path(key, suffix).unlink(missing_ok=True)
+                total -= size
+        self._total = total
+
+
+_cache: Optional[PageCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_page_cache() -> PageCache:
+    """プロセス共有の PageCache を返す（初回に生成）"""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = PageCache()
+        return _cache
+
+
+def configure_page_cache(**kwargs) -> PageCache:
+    """
+    共有キャッシュを指定の設定で作り直す。
+
+    Parameters
+    ----------
+    **kwargs
+        PageCache のコンストラクタ引数（directory, ttl, max_bytes, memory_items）
+    """
+    global _cache
+    with _cache_lock:
+        _cache = PageCache(**kwargs)
+        return _cache
@@ -0,0 +1,227 @@
+"""
+文字コードの判定とデコード
+
+判定は次の順で行い、本文のデコードは判定した文字コードで 1 回だけ行う。
+
+1. BOM
+2. Content-Type ヘッダーの charset
+3. 先頭 META_SCAN_BYTES バイト内の <meta charset> / <meta http-equiv="Content-Type">
+4. 先頭 SNIFF_BYTES バイトの統計的な判定（UTF-8 として正しいか、ISO-2022-JP のエスケープ、
+   Shift_JIS / EUC-JP それぞれで解釈した場合のかな・漢字の割合）
+
+ヘッダーや meta の名前は、ブラウザと同じく上位互換の文字コードに読み替える
+（Shift_JIS → cp932、ISO-8859-1 → cp1252 など）。
+"""
+
+from __future__ import annotations
+
+import codecs
+import re
+from typing import Optional, Tuple
+
+# meta を探す範囲
+META_SCAN_BYTES = 4096
+# 統計的な判定に使う範囲
+SNIFF_BYTES = 64 * 1024
+
+_BOMS = (
+    (codecs.BOM_UTF32_LE, "utf-32"),
+    (codecs.BOM_UTF32_BE, "utf-32"),
+    (codecs.BOM_UTF8, "utf-8-sig"),
+    (codecs.BOM_UTF16_LE, "utf-16"),
+    (codecs.BOM_UTF16_BE, "utf-16"),
+)
+# 上位互換の文字コードへの読み替え
+_ALIASES = {
+    "shift_jis": "cp932",
+    "shift-jis": "cp932",
+    "sjis": "cp932",
+    "x-sjis": "cp932",
+    "ms_kanji": "cp932",
+    "windows-31j": "cp932",
+    "csshiftjis": "cp932",
+    "euc-jp": "euc_jis_2004",
+    "euc_jp": "euc_jis_2004",
+    "x-euc-jp": "euc_jis_2004",
+    "iso-8859-1": "cp1252",
+    "latin1": "cp1252",
+    "latin-1": "cp1252",
+    "us-ascii": "cp1252",
+    "ascii": "cp1252",
+}
+
+_HEADER_CHARSET = re.compile(r"charset\s*=\s*[\"']?([^\s;\"']+)", re.I)
+_META_CHARSET = re.compile(
+    rb"""<meta\b[^>]*?\bcharset\s*=\s*["']?\s*([A-Za-z0-9_:.+-]+)""", re.I
+)
+_ISO2022_ESCAPE = re.compile(rb"\x1b(?:\$[@B(]|\([BJ])")
+_HIRAGANA_KATAKANA = re.compile(r"[ぁ-ゟァ-ヿ　-。]")
+_HALFWIDTH_KANA = re.compile(r"[｡-ﾟ]")
+_KANJI = re.compile(r"[一-鿿]")
+
+
+def normalize_charset(name: Optional[str]) -> Optional[str]:
+    """文字コード名を Python の codec 名にする。未知の名前は None。"""
+    if not name:
+        return None
+    name = name.strip().strip("\"'").lower()
+    name = _ALIASES.get(name, name)
+    try:
+        codecs.lookup(name)
+    except LookupError:
+        return None
+    return name
+
+
+def header_charset(headers) -> Optional[str]:
+    """レスポンスヘッダーから charset を取得（ヘッダー上の名前のまま）"""
+    charset = None
+    if hasattr(headers, "get_content_charset"):
+        charset = headers.get_content_charset()
+    if not charset:
+        match = _HEADER_CHARSET.search(headers.get("Content-Type", ""))
+        if match:
+            charset = match.group(1)
+    return charset
+
+
+def bom_charset(data: bytes) -> Optional[str]:
+    for bom, name in _BOMS:
+        if data.startswith(bom):
+            return name
+    return None
+
+
+def meta_charset(data: bytes) -> Optional[str]:
+    """先頭 META_SCAN_BYTES バイトの <meta> から charset を取得"""
+    m = _META_CHARSET.search(data[:META_SCAN_BYTES])
+    if not m:
+        return None
+    name = normalize_charset(m.group(1).decode("ascii", errors="ignore"))
+    # ASCII 互換でない文字コードが meta に書かれていても、ここまで読めている以上は誤り
+    if name and name.replace("-", "_").startswith(("utf_16", "utf_32")):
+        return "utf-8"
+    return name
+
+
+def _valid_prefix(data: bytes, charset: str) -> bool:
+    """data が charset として正しいか（末尾で切れた文字は許容）"""
+    try:
+        codecs.getincrementaldecoder(charset)("strict").decode(data, final=False)
+    except UnicodeDecodeError:
+        return False
+    return True
+
+
+def _japanese_score(text: str) -> float:
+    """正しい文字コードで解釈した日本語らしさ（非 ASCII 文字あたり）"""
+    non_ascii = sum(1 for c in text if ord(c) > 0x7F)
+    if not non_ascii:
+        return 0.0
+    kana = len(_HIRAGANA_KATAKANA.findall(text))
+    kanji = len(_KANJI.findall(text))
+    halfwidth = len(_HALFWIDTH_KANA.findall(text))
+    return (2 * kana + kanji - 2 * halfwidth) / non_ascii
+
+
+def sniff_charset(data: bytes) -> str:
+    """
+    先頭 SNIFF_BYTES バイトから文字コードを推定する。
+
+    - 8 ビット文字が無い: ISO-2022-JP のエスケープがあればそれ、無ければ UTF-8
+    - UTF-8 として正しい: UTF-8
+    - Shift_JIS（cp932）/ EUC-JP のうち正しく解釈できるもの。両方とも可能なら
+      かな・漢字の割合が高い方
+    - どれでもない: cp1252
+    """
+    sample = data[:SNIFF_BYTES]
+    if sample.isascii():
+        return "iso2022_jp" if _ISO2022_ESCAPE.search(sample) else "utf-8"
+    if _valid_prefix(sample, "utf-8"):
+        return "utf-8"
+
+    candidates = [c for c in ("cp932", "euc_jis_2004") if _valid_prefix(sample, c)]
+    if len(candidates) == 1:
+        return candidates[0]
+    if candidates:
+        scores = {
+            c: _japanese_score(sample.decode(c, errors="replace")) for c in candidates
+        }
+        return max(candidates, key=lambda c: scores[c])
+
+    # 数バイトの誤りなら日本語の文字コードとして扱う
+    for charset in ("cp932", "euc_jis_2004"):
+        text = sample.decode(charset, errors="replace")
+        if text.count("�") <= len(sample) // 1000 + 1 and _japanese_score(text) > 0.5:
+            return charset
+    return "cp1252"
+
+
+def detect_charset(data: bytes, headers=None) -> Tuple[str, str]:
+    """
+    文字コードを判定する。
+
+    Parameters
+    ----------
+    data : bytes
+        本文（先頭 SNIFF_BYTES バイトだけでもよい）
+    headers
+        レスポンスヘッダー（Content-Type を見る）
+
+    Returns
+    -------
+    Tuple[str, str]
+        (codec 名, 判定の根拠 "bom" / "header" / "meta" / "sniff")
+    """
+    charset = bom_charset(data)
+    if charset:
+        return charset, "bom"
+    if headers is not None:
+        charset = normalize_charset(header_charset(headers))
+        if charset:
+            return charset, "header"
+    charset = meta_charset(data)
+    if charset:
+        return charset, "meta"
+    return sniff_charset(data), "sniff"
+
+
+def decode_bytes(data: bytes, headers=None) -> str:
+    """detect_charset で判定した文字コードで 1 回だけデコードする"""
+    charset, _ = detect_charset(data, headers)
+    return data.decode(charset, errors="replace")
+
+
+class StreamDecoder:
+    """
+    レスポンス本文を逐次デコードする。
+
+    判定に必要な分だけ先頭を溜めてから detect_charset で文字コードを決める。
+    BOM・ヘッダー・meta で決まれば META_SCAN_BYTES バイト、統計的に判定する場合は
+    SNIFF_BYTES バイト（または本文の終わり）まで溜める。
+
+    Parameters
+    ----------
+    headers
+        レスポンスヘッダー
+    """
+
+    def __init__(self, headers=None):
+        self.headers = headers
+        self.charset: Optional[str] = None
+        self.source = ""
+        self._pending = b""
+        self._decoder = None
+
+    def decode(self, data: bytes, final: bool = False) -> str:
+        if self._decoder is None:
+            self._pending += data
+            if len(self._pending) < META_SCAN_BYTES and not final:
+                return ""
+            charset, source = detect_charset(self._pending, self.headers)
+            if source == "sniff" and len(self._pending) < SNIFF_BYTES and not final:
+                return ""
+            self.charset, self.source = charset, source
+            self._decoder = codecs.getincrementaldecoder(self.charset)(errors="replace")
+            data, self._pending = self._pending, b""
+        return self._decoder.decode(data, final=final)
@@ -0,0 +1,79 @@
+"""
+ページテキストの part 分割
+
+空白を正規化したテキストを、文末（。！？.!? など）で区切れるように
+ほぼ一定の文字数のチャンクへ分割し、その境界位置を索引として持つ。
+索引はページキャッシュに一緒に保存するので、part の取り出しはスライス 1 回で済む。
+"""
+
+from __future__ import annotations
+
+import re
+from typing import List
+
+# fetch_webpage の 1 part あたりの文字数
+PART_SIZE = 2000
+# 区切り位置を探す範囲（チャンク末尾から遡る文字数）
+LOOKBACK = 300
+
+_WHITESPACE = re.compile(r"\s+")
+_SENTENCE_END = re.compile(r"[。．！？」』]\s*|[.!?][\"')\]]*\s+")
+
+
+def normalize_text(text: str) -> str:
+    """連続する空白を 1 つにまとめる"""
+    return _WHITESPACE.sub(" ", text).strip()
+
+
+def chunk_bounds(
+    text: str, part_size: int = PART_SIZE, lookback: int = LOOKBACK
+) -> List[int]:
+    """
+    チャンク境界の位置を返す。
+
+    各チャンクは part_size 文字以下で、可能なら末尾 lookback 文字以内の文末、
+    無ければ空白、それも無ければ part_size 文字ちょうどで区切る。
+
+    Parameters
+    ----------
+    text : str
+        normalize_text 済みのテキスト
+    part_size : int, default PART_SIZE
+        1 チャンクの最大文字数
+    lookback : int, default LOOKBACK
+        区切り位置を探す範囲
+
+    Returns
+    -------
+    List[int]
+        境界位置のリスト。part n（1 始まり）は text[bounds[n-1]:bounds[n]]。
+    """
+    bounds = [0]
+    start = 0
+    length = len(text)
+    while length - start > part_size:
+        limit = start + part_size
+        low = max(start + 1, limit - lookback)
+
+        cut = -1
+        for m in _SENTENCE_END.finditer(text, low, limit):
+            cut = m.end()
+        if cut <= start:
+            space = text.rfind(" ", low, limit)
+            cut = space + 1 if space >= 0 else limit
+
+        bounds.append(cut)
+        start = cut
+    bounds.append(length)
+    return bounds
+
+
+def total_parts(bounds: List[int]) -> int:
+    return max(1, len(bounds) - 1)
+
+
+def part_text(text: str, bounds: List[int], part: int) -> str:
+    """part 番号（1 始まり）のテキストを返す。範囲外なら空文字列。"""
+    if part < 1 or part >= len(bounds):
+        return ""
+    return text[bounds[part - 1] : bounds[part]].strip()
@@ -0,0 +1,123 @@
+"""
+複数 URL の並列取得エンジン
+
+取得処理そのもの（fetch_text_sync など）は同期関数のまま、
+asyncio のスレッド実行で並列化する。
+全体の同時実行数とホスト単位の同時実行数・アクセス間隔を制限する。
+"""
+
+from __future__ import annotations
+
+import asyncio
+import time
+import urllib.parse
+from typing import Any, Callable, Dict, List, Optional
+
+from ai_tools.utils.aio import run_sync
+
+
+class AsyncFetcher:
+    """
+    同期の取得関数を並列に実行するエンジン。
+
+    Parameters
+    ----------
+    fetch : Callable[[str], T]
+        URL を受け取り取得結果を返す同期関数
+    max_concurrency : int, default 8
+        全体の同時取得数
+    max_per_host : int, default 2
+        1 ホストあたりの同時取得数
+    min_interval : float, default 0.25
+        同一ホストへのリクエスト開始間隔（秒）
+    timeout : float, optional
+        1 URL あたりの待ち時間の上限（秒）。超えたものは失敗扱い
+    skip_limit : Callable[[str], bool], optional
+        True を返す URL はホスト単位の制限を掛けない（キャッシュ済みなど）
+    on_result : Callable[[str, Any, float], None], optional
+        1 件終わるたびに (URL, 取得結果, 秒) で呼ぶ（進捗表示用）。
+        イベントループのスレッド（run_sync の呼び出し元）で呼ばれる
+    """
+
+    def __init__(
+        self,
+        fetch: Callable[[str], Any],
+        *,
+        max_concurrency: int = 8,
+        max_per_host: int = 2,
+        min_interval: float = 0.25,
+        timeout: Optional[float] = None,
+        skip_limit: Optional[Callable[[str], bool]] = None,
+        on_result: Optional[Callable[[str, Any, float], None]] = None,
+    ):
+        self.fetch = fetch
+        self.max_concurrency = max_concurrency
+        self.max_per_host = max_per_host
+        self.min_interval = min_interval
+        self.timeout = timeout
+        self.skip_limit = skip_limit
+        self.on_result = on_result
+
+    async def fetch_one(
+        self,
+        url: str,
+        semaphore: asyncio.Semaphore,
+        host_slots: Dict[str, asyncio.Semaphore],
+        host_next: Dict[str, float],
+    ) -> Any:
+        async with semaphore:
+            if self.skip_limit and self.skip_limit(url):
+                return await self.call(url)
+
+            if "://" not in url:
+                url_for_host = "https://" + url
+            else:
+                url_for_host = url
+            host = urllib.parse.urlsplit(url_for_host).netloc.lower()
+            slot = host_slots.setdefault(host, asyncio.Semaphore(self.max_per_host))
+            async with slot:
+                # 同一ホストへのアクセス間隔を空ける
+                now = time.monotonic()
+                start_at = max(now, host_next.get(host, now))
+                host_next[host] = start_at + self.min_interval
+                if start_at > now:
+                    await asyncio.sleep(start_at - now)
+                return await self.call(url)
+
+    async def call(self, url: str) -> Any:
+        start = time.monotonic()
+        try:
+            task = asyncio.to_thread(self.fetch, url)
+            if self.timeout is not None:
+                result = await asyncio.wait_for(task, self.timeout)
+            else:
+                result = await task
+        except Exception as e:
+            print(f"[AsyncFetcher] {url}: {e}")
+            result = None
+        if self.on_result is not None:
+            self.on_result(url, result, time.monotonic() - start)
+        return result
+
+    async def fetch_all(self, urls: List[str]) -> List[Any]:
+        """
+        URL のリストを並列に取得する。
+
+        Returns
+        -------
+        List[Any]
+            urls と同じ順序の取得結果。例外・タイムアウトになったものは None。
+        """
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        host_slots: Dict[str, asyncio.Semaphore] = {}
+        host_next: Dict[str, float] = {}
+        return list(
+            await asyncio.gather(
+                *(self.fetch_one(u, semaphore, host_slots, host_next) for u in urls)
+            )
+        )
+
+    def fetch_all_sync(self, urls: List[str]) -> List[Any]:
+        """fetch_all の同期版"""
+        return run_sync(lambda: self.fetch_all(urls))
+
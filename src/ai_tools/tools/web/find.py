@@ -0,0 +1,289 @@
+"""
+ページテキスト内の複数パターン検索
+
+- パターンは compile_patterns でまとめて 1 つの正規表現にし、テキストを 1 回だけ走査する。
+  コンパイル結果はパターンの組ごとにメモ化する。
+- 1 語のリテラル（記号を含まない英数字・かな漢字）は WordIndex で引く。
+  WordIndex は「語 → 出現位置」と「n-gram → 語」の索引で、ページごとに 1 回だけ作って
+  メモリに保持するので、同じページへの 2 回目以降の検索はテキストを走査しない。
+  casefold で長さが変わるリテラル（"İ" など）は位置がずれるので正規表現で探す。
+- max_hits 件見つかった時点で走査を止める。
+"""
+
+from __future__ import annotations
+
+import re
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+_WORD = re.compile(r"\w+")
+# 正規表現の特殊文字を含まないか
+_METACHAR = re.compile(r"[.^$*+?{}\[\]\\|()]")
+# 後方参照・グループ名を含むパターンは 1 つにまとめられない
+_GROUP_REFERENCE = re.compile(r"\\\d|\(\?P[<=]|\\g<")
+# 保持する WordIndex の数
+INDEX_ITEMS = 16
+# WordIndex の n-gram 索引の最大長
+NGRAM = 3
+
+
+class Match(NamedTuple):
+    start: int
+    end: int
+    # マッチしたパターン（find_matches に渡した文字列）
+    pattern: str
+
+
+# ----------------------------------------------------------------------
+# パターンのコンパイル（メモ化）
+# ----------------------------------------------------------------------
+@lru_cache(maxsize=256)
+def compile_patterns(patterns: Tuple[str, ...]) -> List[Tuple["re.Pattern[str]", Tuple[str, ...]]]:
+    """
+    パターンの組を、大文字小文字を区別しない正規表現にまとめる。
+
+    各パターンを名前付きグループ (?P<p0>...)|(?P<p1>...) でつなぎ、どのパターンに
+    マッチしたかは lastgroup で判定する。後方参照やグループ名を含むパターンは
+    番号がずれるので単独でそのままコンパイルする。
+
+    Returns
+    -------
+    List[Tuple[re.Pattern, Tuple[str, ...]]]
+        (コンパイル済みパターン, グループ p0, p1... に対応するパターン) のリスト。
+        単独でコンパイルしたものは対応するパターンが 1 つだけ
+
+    Raises
+    ------
+    re.error
+        不正な正規表現が含まれる場合（メッセージにパターンを含める）
+    """
+    combinable = [p for p in patterns if not _GROUP_REFERENCE.search(p)]
+    compiled = []
+    for p in patterns:
+        try:
+            single = re.compile(p, re.IGNORECASE)
+        except re.error as e:
+            raise re.error(f"Invalid regular expression pattern '{p}': {e}") from e
+        if p not in combinable:
+            compiled.append((single, (p,)))
+    if len(combinable) == 1:
+        compiled.append((re.compile(combinable[0], re.IGNORECASE), tuple(combinable)))
+    elif combinable:
+        source = "|".join(f"(?P<p{i}>{p})" for i, p in enumerate(combinable))
+        try:
+            compiled.append((re.compile(source, re.IGNORECASE), tuple(combinable)))
+        except re.error:
+            # (?i) などの全体フラグは先頭以外に置けないので、まとめられなければ個別に走査する
+            compiled.extend((re.compile(p, re.IGNORECASE), (p,)) for p in combinable)
+    return compiled
+
+
+def is_literal_word(pattern: str) -> bool:
+    """WordIndex で引けるパターン（特殊文字を含まない 1 語）か"""
+    return not _METACHAR.search(pattern) and _WORD.fullmatch(pattern) is not None
+
+
+# ----------------------------------------------------------------------
+# 語の索引
+# ----------------------------------------------------------------------
+@dataclass
+class WordIndex:
+    """
+    テキスト中の語（\\w+）ごとの出現位置の索引。
+
+    語は casefold して引く。casefold で長さが変わる語（"İ" や "ß" を含む語）は
+    位置がずれるので元の形のまま irregular に置き、lookup では正規表現で探す。
+    lookup は n-gram（最大 NGRAM 文字）→ 語の索引で候補の語を絞り、結果をメモ化する。
+
+    Attributes
+    ----------
+    words : Dict[str, List[int]]
+        casefold した語 → 出現位置（昇順）
+    irregular : Dict[str, List[int]]
+        casefold で長さが変わる語（元の形）→ 出現位置（昇順）
+    """
+
+    words: Dict[str, List[int]]
+    irregular: Dict[str, List[int]] = field(default_factory=dict)
+
+    @classmethod
+    def build(cls, text: str) -> "WordIndex":
+        words: Dict[str, List[int]] = {}
+        irregular: Dict[str, List[int]] = {}
+        for m in _WORD.finditer(text):
+            word = m.group()
+            folded = word.casefold()
+            if len(folded) == len(word):
+                words.setdefault(folded, []).append(m.start())
+            else:
+                irregular.setdefault(word, []).append(m.start())
+        return cls(words, irregular)
+
+    def __post_init__(self):
+        self._lookups: Dict[str, List[Tuple[int, int]]] = {}
+        self._vocabulary: List[str] = list(self.words)
+        self._grams: Optional[Dict[str, List[int]]] = None
+
+    def _gram_index(self) -> Dict[str, List[int]]:
+        """n-gram → それを含む語の番号（初回の lookup で作る）"""
+        if self._grams is None:
+            grams: Dict[str, List[int]] = {}
+            for i, word in enumerate(self._vocabulary):
+                seen = {
+                    word[at : at + n]
+                    for n in range(1, NGRAM + 1)
+                    for at in range(len(word) - n + 1)
+                }
+                for gram in seen:
+                    grams.setdefault(gram, []).append(i)
+            self._grams = grams
+        return self._grams
+
+    def _candidates(self, key: str) -> List[str]:
+        """key を部分文字列として含む語（casefold 済み）"""
+        grams = self._gram_index()
+        n = min(NGRAM, len(key))
+        postings = sorted(
+            (grams.get(key[at : at + n], []) for at in range(len(key) - n + 1)), key=len
+        )
+        if not postings[0]:
+            return []
+        ids = set(postings[0])
+        for posting in postings[1:]:
+            ids.intersection_update(posting)
+            if not ids:
+                return []
+        words = [self._vocabulary[i] for i in ids]
+        # NGRAM 文字を超える key は n-gram がそろっていても含むとは限らない
+        return words if len(key) <= NGRAM else [w for w in words if key in w]
+
+    def lookup(self, literal: str) -> Optional[List[Tuple[int, int]]]:
+        """
+        literal を部分文字列として含む語から、(開始, 終了) 位置を昇順で返す。
+        正規表現（IGNORECASE）で literal を探した場合と同じ結果になる。
+        casefold で長さが変わる literal は索引で引けないので None を返す（正規表現で探す）。
+        """
+        key = literal.casefold()
+        if len(key) != len(literal):
+            return None
+        found = self._lookups.get(key)
+        if found is not None:
+            return found
+        found = []
+        for word in self._candidates(key):
+            # 1 語の中の重ならない出現位置
+            ats = []
+            at = word.find(key)
+            while at >= 0:
+                ats.append(at)
+                at = word.find(key, at + len(key))
+            found.extend((o + a, o + a + len(key)) for o in self.words[word] for a in ats)
+        if self.irregular:
+            pattern = re.compile(re.escape(literal), re.IGNORECASE)
+            for word, offsets in self.irregular.items():
+                spans = [m.span() for m in pattern.finditer(word)]
+                found.extend((o + s, o + e) for o in offsets for s, e in spans)
+        found.sort()
+        self._lookups[key] = found
+        return found
+
+
+_indexes: "OrderedDict[Tuple[str, float, int], WordIndex]" = OrderedDict()
+_indexes_lock = threading.Lock()
+
+
+def get_word_index(key: str, version: float, text: str) -> WordIndex:
+    """
+    ページの WordIndex を返す（無ければ作る）。
+
+    Parameters
+    ----------
+    key : str
+        ページを識別する文字列（URL）
+    version : float
+        ページの版（取得時刻）。変わったら作り直す
+    text : str
+        ページのテキスト
+    """
+    cache_key = (key, version, len(text))
+    with _indexes_lock:
+        index = _indexes.get(cache_key)
+        if index is not None:
+            _indexes.move_to_end(cache_key)
+            return index
+    index = WordIndex.build(text)
+    with _indexes_lock:
+        _indexes[cache_key] = index
+        while len(_indexes) > INDEX_ITEMS:
+            _indexes.popitem(last=False)
+    return index
+
+
+# ----------------------------------------------------------------------
+# 検索
+# ----------------------------------------------------------------------
+def find_matches(
+    text: str,
+    patterns: Sequence[str],
+    max_hits: int = 10,
+    index: Optional[WordIndex] = None,
+) -> Tuple[List[Match], Optional[int]]:
+    """
+    テキストから複数のパターンを探し、出現順に max_hits 件まで返す。
+
+    Parameters
+    ----------
+    text : str
+        検索対象のテキスト
+    patterns : Sequence[str]
+        正規表現（大文字小文字は区別しない）
+    max_hits : int, default 10
+        返す件数の上限。正規表現はこの件数を超えた時点で走査を止める
+    index : WordIndex, optional
+        指定すると、1 語のリテラルは索引から引く
+
+    Returns
+    -------
+    Tuple[List[Match], Optional[int]]
+        マッチのリストと、全体の件数（走査を途中で止めた場合は None）
+
+    Raises
+    ------
+    re.error
+        不正な正規表現が含まれる場合
+    """
+    patterns = tuple(dict.fromkeys(p for p in patterns if p))
+    looked_up: Dict[str, List[Tuple[int, int]]] = {}
+    for p in patterns:
+        if index is not None and is_literal_word(p):
+            found = index.lookup(p)
+            if found is not None:
+                looked_up[p] = found
+    regexes = tuple(p for p in patterns if p not in looked_up)
+
+    matches: List[Match] = []
+    total = 0
+    for p, found in looked_up.items():
+        # 索引の結果は出現順なので先頭 max_hits 件だけで足りる
+        total += len(found)
+        matches.extend(Match(s, e, p) for s, e in found[:max_hits])
+
+    stopped = False
+    for compiled, names in compile_patterns(regexes) if regexes else ():
+        count = 0
+        for m in compiled.finditer(text):
+            if m.start() == m.end():
+                continue
+            name = names[0] if len(names) == 1 else names[int(m.lastgroup[1:])]
+            matches.append(Match(m.start(), m.end(), name))
+            count += 1
+            if count > max_hits:
+                stopped = True
+                break
+        total += count
+
+    matches.sort()
+    return matches[:max_hits], None if stopped else total
@@ -0,0 +1,390 @@
+"""
+HTML からテキスト・リンクを抽出する
+
+- TextExtractor: html.parser ベース。タグ・テキストノードごとに Python のメソッドが呼ばれる。
+- FastTextExtractor: 正規表現ベース。script/style/nav/footer などの部分木は
+  閉じタグまで読み飛ばし、残りのタグは置換で一括除去する。
+
+どちらも feed() / close() と text / links 属性を持つので、make_text_extractor で
+実行時に切り替えられる（HTML_BACKEND または環境変数 AI_TOOLS_HTML_BACKEND）。
+"""
+
+from __future__ import annotations
+
+import html
+import os
+import re
+from html.parser import HTMLParser
+from typing import Dict, List, Optional, Tuple, Union
+
+# "fast" または "parser"
+HTML_BACKEND = os.environ.get("AI_TOOLS_HTML_BACKEND", "fast")
+
+
+# ----------------------------------------------------------------------
+# html.parser ベース
+# ----------------------------------------------------------------------
+class TextExtractor(HTMLParser):
+    def __init__(self, body_only=False):
+        super().__init__()
+        self.text = []
+        self.links = []
+        self.current_link = None
+        self.body_only = body_only
+        self.in_body = False
+        self.in_script = False
+        self.in_style = False
+
+    def handle_starttag(self, tag, attrs):
+        if tag == "body":
+            self.in_body = True
+        elif tag == "script":
+            self.in_script = True
+        elif tag == "style":
+            self.in_style = True
+        elif tag == "a" and (not self.body_only or self.in_body):
+            for attr, value in attrs:
+                if attr == "href":
+                    self.current_link = value
+                    break
+
+    def handle_endtag(self, tag):
+        if tag == "body":
+            self.in_body = False
+        elif tag == "script":
+            self.in_script = False
+        elif tag == "style":
+            self.in_style = False
+        elif tag == "a":
+            self.current_link = None
+
+    def handle_data(self, data):
+        # script, styleタグ内は無視
+        if self.in_script or self.in_style:
+            return
+
+        # body_onlyがTrueの場合、body内のみ抽出
+        if self.body_only and not self.in_body:
+            return
+
+        clean_data = data.strip()
+        if clean_data:
+            self.text.append(clean_data)
+            if self.current_link and clean_data:
+                self.links.append({"text": clean_data, "url": self.current_link})
+
+
+# ----------------------------------------------------------------------
+# 正規表現ベース
+# ----------------------------------------------------------------------
+# 中身ごと捨てる要素（本文ではない部分木）
+SKIP_TAGS = (
+    "script",
+    "style",
+    "noscript",
+    "template",
+    "svg",
+    "iframe",
+    "nav",
+    "footer",
+    "aside",
+    "button",
+    "select",
+)
+# role 属性でナビゲーション等と分かる要素も捨てる
+_SKIP_ROLES = ("navigation", "banner", "contentinfo", "complementary", "dialog")
+# 閉じタグを持たない要素
+_VOID_TAGS = frozenset(
+    ("area", "base", "br", "col", "embed", "hr", "img", "input", "link", "meta")
+    + ("param", "source", "track", "wbr")
+)
+# 中身をタグとして解釈しない要素
+_RAW_TEXT_TAGS = ("script", "style", "template", "noscript")
+
+_COMMENT = re.compile(r"<!--.*?-->|<!\[CDATA\[.*?\]\]>", re.S)
+_TAG = re.compile(r"<(?:[a-zA-Z/!?](?:[^>\"']|\"[^\"]*\"|'[^']*')*)>")
+_ANCHOR = re.compile(r"<a\b((?:[^>\"']|\"[^\"]*\"|'[^']*')*)>(.*?)</a\s*>", re.S | re.I)
+_HREF = re.compile(r"""\bhref\s*=\s*(?:"([^"]*)"|'([^']*)'|([^\s>]+))""", re.I)
+# 読み飛ばす要素の開始タグ（要素名、または role / aria-hidden / hidden 属性で判定）
+# 要素名の後は空白・/・> に限る（<nav-menu> などのカスタム要素は読み飛ばさない）
+_SKIP_OPEN = re.compile(
+    r"<(%s)(?=[\s/>])(?:[^>\"']|\"[^\"]*\"|'[^']*')*>"
+    r"|<([a-zA-Z][a-zA-Z0-9:-]*)\s(?:[^>\"']|\"[^\"]*\"|'[^']*')*?"
+    r"(?:\brole\s*=\s*[\"']?(?:%s)\b|\baria-hidden\s*=\s*[\"']?true|\shidden(?=[\s=/>]))"
+    r"(?:[^>\"']|\"[^\"]*\"|'[^']*')*>"
+    % ("|".join(SKIP_TAGS), "|".join(_SKIP_ROLES)),
+    re.I,
+)
+_ANCHOR_OPEN = re.compile(r"<a(?=[\s>])", re.I)
+_ANCHOR_CLOSE = re.compile(r"</a\s*>", re.I)
+_LABEL = re.compile(r"""\b(?:title|aria-label)\s*=\s*(?:"([^"]*)"|'([^']*)')""", re.I)
+_BODY = re.compile(r"<body\b[^>]*>", re.I)
+_BODY_END = re.compile(r"</body\s*>", re.I)
+_HEAD_END = re.compile(r"</head\s*>", re.I)
+_subtree_cache: Dict[str, "re.Pattern[str]"] = {}
+
+
+def _skip_subtree(doc: str, tag: str, pos: int) -> int:
+    """<tag> の直後 pos から、対応する </tag> の直後の位置を返す（入れ子対応）"""
+    end = _subtree_end(doc, tag, pos)
+    return len(doc) if end is None else end
+
+
+def _subtree_end(doc: str, tag: str, pos: int) -> Optional[int]:
+    """_skip_subtree と同じ。閉じタグがまだ無ければ None"""
+    pattern = _subtree_cache.get(tag)
+    if pattern is None:
+        if tag in _RAW_TEXT_TAGS:
+            # script / style の中身はタグとして解釈しない
+            pattern = re.compile(rf"</({tag})\s*>", re.I)
+        else:
+            pattern = re.compile(rf"<(/?){tag}(?=[\s/>])[^>]*>", re.I)
+        _subtree_cache[tag] = pattern
+    if tag in _RAW_TEXT_TAGS:
+        m = pattern.search(doc, pos)
+        return m.end() if m else None
+    depth = 1
+    for m in pattern.finditer(doc, pos):
+        if m.group(0).endswith("/>"):
+            continue
+        depth += -1 if m.group(1) else 1
+        if depth == 0:
+            return m.end()
+    return None
+
+
+def html_to_text(fragment: str) -> str:
+    """タグを空白に置き換え、文字参照を戻す"""
+    text = _TAG.sub(" ", fragment)
+    if "&" in text:
+        text = html.unescape(text)
+    return text
+
+
+def body_html(doc: str) -> str:
+    """body 要素の中身を返す。body タグが無い場合は head 以降を返す。"""
+    m = _BODY.search(doc)
+    if m:
+        end = None
+        for end in _BODY_END.finditer(doc, m.end()):
+            pass
+        return doc[m.end() : end.start() if end else len(doc)]
+    head = _HEAD_END.search(doc)
+    return doc[head.end() :] if head else doc
+
+
+def strip_skipped(doc: str) -> str:
+    """
+    コメントと、SKIP_TAGS / ナビゲーション系 role / 非表示属性を持つ部分木を取り除く。
+    Python のループは読み飛ばす要素の数だけ回る。
+    """
+    return _strip(_COMMENT.sub(" ", doc))[0]
+
+
+def _strip(doc: str, stop_unclosed: bool = False) -> Tuple[str, int]:
+    """
+    strip_skipped の本体（コメントは除去済みとする）。
+    stop_unclosed なら閉じていない部分木の手前で止め、(結果, 処理した位置) を返す。
+    """
+    pieces: List[str] = []
+    pos = 0
+    while True:
+        m = _SKIP_OPEN.search(doc, pos)
+        if m is None:
+            break
+        name = (m.group(1) or m.group(2)).lower()
+        if name in _VOID_TAGS or m.group(0).endswith("/>"):
+            pieces.append(doc[pos : m.start()])
+            pos = m.end()
+            continue
+        end = _subtree_end(doc, name, m.end())
+        if end is None and stop_unclosed:
+            pieces.append(doc[pos : m.start()])
+            return "".join(pieces), m.start()
+        pieces.append(doc[pos : m.start()])
+        pieces.append(" ")
+        pos = len(doc) if end is None else end
+    pieces.append(doc[pos:])
+    return "".join(pieces), len(doc)
+
+
+def complete_prefix(doc: str) -> int:
+    """
+    途中まで届いた HTML のうち、単独で処理できる先頭部分の長さ。
+    最後のタグの直後で区切り、閉じていないコメントと <a> の手前で止める
+    （テキストの途中や、リンクの途中で区切らない）。
+    """
+    partial = doc.rfind("<")
+    if partial < 0 or doc.find(">", partial) >= 0:
+        partial = len(doc)
+    cut = doc.rfind(">", 0, partial) + 1
+    for opener, closer in (("<!--", "-->"), ("<![CDATA[", "]]>")):
+        start = doc.rfind(opener, 0, cut)
+        if start >= 0 and doc.find(closer, start, cut) < 0:
+            cut = start
+    anchor = None
+    for anchor in _ANCHOR_OPEN.finditer(doc, 0, cut):
+        pass
+    if anchor is not None and not _ANCHOR_CLOSE.search(doc, anchor.end(), cut):
+        cut = anchor.start()
+    return cut
+
+
+def find_links(doc: str, include_empty: bool = False) -> List[Dict[str, str]]:
+    """
+    <a href> を {"text", "url"} のリストにする。
+
+    テキストの無いリンク（アイコンだけの「次へ」など）は除く。include_empty のときは
+    title / aria-label 属性（無ければ空文字列）をテキストにして含める。
+    """
+    links = []
+    for m in _ANCHOR.finditer(doc):
+        href = _HREF.search(m.group(1))
+        if not href:
+            continue
+        url = href.group(1) or href.group(2) or href.group(3) or ""
+        if "&" in url:
+            url = html.unescape(url)
+        link_text = " ".join(html_to_text(m.group(2)).split())
+        if not link_text and include_empty:
+            label = _LABEL.search(m.group(1))
+            link_text = html.unescape(label.group(1) or label.group(2)) if label else ""
+            if url:
+                links.append({"text": link_text, "url": url})
+            continue
+        if link_text and url:
+            links.append({"text": link_text, "url": url})
+    return links
+
+
+class FastTextExtractor:
+    """
+    正規表現ベースの高速なテキスト・リンク抽出器。
+
+    TextExtractor と同じく feed() で HTML を受け取り、text（文字列のリスト）と
+    links（{"text", "url"} のリスト）を返す。feed() のたびに、届いた分のうち
+    閉じたタグ・部分木までを処理し、残りだけを保持する（取得しながらパースできる）。
+    incremental が False のサブクラスは、close() 時に文書全体を parse() に渡す。
+
+    処理は 3 段階で、Python のループが回るのは読み飛ばす要素とリンクの数だけ。
+
+    1. コメントを除去し、script/style/nav/footer などの部分木を閉じタグまで読み飛ばす
+    2. 残りのタグを正規表現の置換で一括して空白にする
+    3. <a href> をまとめて拾い、リンクテキストとする
+
+    Parameters
+    ----------
+    body_only : bool, default False
+        body 内のみ抽出するか。body タグが無い場合は head 以降を対象にする。
+    """
+
+    # feed() のたびに処理するか（文書全体を見る必要がある抽出器は False）
+    incremental = True
+
+    def __init__(self, body_only: bool = False):
+        self.body_only = body_only
+        self.text: List[str] = []
+        self.links: List[Dict[str, str]] = []
+        self._buffer: List[str] = []
+        self._pending = ""
+        self._in_body = not body_only
+        self._done = False
+
+    def feed(self, data: str) -> None:
+        if not self.incremental:
+            self._buffer.append(data)
+            return
+        self._pending += data
+        self._consume(final=False)
+
+    def close(self) -> None:
+        if self._done:
+            return
+        self._done = True
+        if not self.incremental:
+            doc = "".join(self._buffer)
+            self._buffer = []
+            self.parse(doc)
+            return
+        self._consume(final=True)
+
+    def _consume(self, final: bool) -> None:
+        """保持している HTML のうち、処理できる部分を処理する"""
+        if not self._in_body:
+            m = _BODY.search(self._pending)
+            if m:
+                self._pending = self._pending[m.end() :]
+            elif final:
+                self._pending = body_html(self._pending)
+            else:
+                return
+            self._in_body = True
+
+        doc = self._pending
+        limit = len(doc)
+        if self.body_only:
+            # </body> 以降は close() まで保持する（最後の </body> までを本文とする）
+            ends = list(_BODY_END.finditer(doc)) if final else [_BODY_END.search(doc)]
+            if ends and ends[-1] is not None:
+                limit = ends[-1].start()
+        if final:
+            self._pending = ""
+            self._parse_piece(strip_skipped(doc[:limit]))
+            return
+
+        cut = complete_prefix(doc[:limit])
+        if cut == 0:
+            return
+        # コメントは閉じたものだけなので、先に除去しても長さ以外は変わらない
+        piece, consumed = _strip(_COMMENT.sub(lambda m: " " * len(m.group(0)), doc[:cut]), True)
+        self._pending = doc[consumed:]
+        self._parse_piece(piece)
+
+    def _parse_piece(self, doc: str) -> None:
+        text = html_to_text(doc).strip()
+        if text:
+            self.text.append(text)
+        self.links.extend(find_links(doc))
+
+    def parse(self, doc: str) -> None:
+        if self.body_only:
+            doc = body_html(doc)
+
+        # 1. 不要な部分木を読み飛ばす
+        doc = strip_skipped(doc)
+
+        # 2. テキスト
+        text = html_to_text(doc).strip()
+        if text:
+            self.text = [text]
+
+        # 3. リンク
+        self.links = find_links(doc)
+
+
+def make_text_extractor(
+    body_only: bool = False,
+    backend: Optional[str] = None,
+    main_content: bool = False,
+) -> Union[TextExtractor, FastTextExtractor]:
+    """
+    設定されたバックエンドの抽出器を生成する。
+
+    Parameters
+    ----------
+    body_only : bool, default False
+        body 内のみ抽出するか
+    backend : str, optional
+        "fast" または "parser"。省略時は HTML_BACKEND
+    main_content : bool, default False
+        本文らしい部分だけを抽出する（readability.MainContentExtractor）。
+        backend の指定より優先する。
+    """
+    if main_content:
+        from .readability import MainContentExtractor
+
+        return MainContentExtractor(body_only=body_only)
+    backend = backend or HTML_BACKEND
+    if backend == "parser":
+        return TextExtractor(body_only=body_only)
+    return FastTextExtractor(body_only=body_only)
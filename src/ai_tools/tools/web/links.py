@@ -0,0 +1,254 @@
+"""
+リンク抽出とクロールのフロンティア
+
+- LinkExtractor: HTML を届いた分から順に読み、完結した <a href> ごとにリンクを返す。
+  相対 URL（"page", "../x", "//host/x", "?q=1" など）は <base href> とページ URL で解決し、
+  正規化した URL（canonical_url）で重複を除く。
+- CrawlFrontier: 幅優先のクロール待ち行列。深さ・ページ数・ホストを制限する。
+"""
+
+from __future__ import annotations
+
+import html
+import re
+import urllib.parse
+from collections import deque
+from typing import Deque, Dict, Iterable, List, Optional, Set, Tuple
+
+from .html_text import find_links
+
+# 重複判定で無視するクエリパラメータ（トラッキング用）
+_TRACKING_PARAMS = ("utm_", "fbclid", "gclid")
+_DEFAULT_PORTS = {"http": 80, "https": 443}
+# たどらないスキーム
+_SKIP_SCHEMES = ("javascript:", "mailto:", "tel:", "data:", "about:", "blob:")
+
+_BASE = re.compile(r"""<base\b[^>]*?\bhref\s*=\s*(?:"([^"]*)"|'([^']*)'|([^\s>]+))""", re.I)
+_ANCHOR_OPEN = re.compile(r"<a\b", re.I)
+_ANCHOR_CLOSE = re.compile(r"</a\s*>", re.I)
+
+
+def canonical_url(url: str) -> str:
+    """
+    重複判定用の URL。
+    スキーム・ホストの小文字化、既定ポート・フラグメント・トラッキング用パラメータ・
+    末尾の / を除去する。
+    """
+    parsed = urllib.parse.urlsplit(url.strip())
+    scheme = parsed.scheme.lower()
+    netloc = parsed.netloc.lower()
+    if parsed.port and _DEFAULT_PORTS.get(scheme) == parsed.port:
+        netloc = netloc.rsplit(":", 1)[0]
+    query = "&".join(
+        q
+        for q in parsed.query.split("&")
+        if q and not q.lower().startswith(_TRACKING_PARAMS)
+    )
+    path = parsed.path.rstrip("/") or "/"
+    return urllib.parse.urlunsplit((scheme, netloc, path, query, ""))
+
+
+def resolve_link(href: str, base_url: str) -> Optional[str]:
+    """
+    href をページの URL（または <base href>）で絶対 URL にする。
+    http(s) 以外のリンクやページ内リンクのみのものは None。
+    """
+    href = href.strip()
+    if not href or href.startswith("#") or href.lower().startswith(_SKIP_SCHEMES):
+        return None
+    url, _ = urllib.parse.urldefrag(urllib.parse.urljoin(base_url, href))
+    if not url.lower().startswith(("http://", "https://")):
+        return None
+    return url
+
+
+class LinkExtractor:
+    """
+    HTML を逐次受け取り、重複を除いたリンクを返す。
+
+    ```python
+    extractor = LinkExtractor(page_url)
+    for chunk in chunks:
+        for link in extractor.feed(chunk):
+            ...
+    links = extractor.close()
+    ```
+
+    バッファに残すのは閉じていない <a> 以降だけなので、ページ全体は保持しない。
+
+    Parameters
+    ----------
+    base_url : str
+        ページの URL（相対 URL の解決に使う）
+    seen : Set[str], optional
+        既出の canonical_url。複数ページで共有すればページをまたいで重複を除ける
+    """
+
+    def __init__(self, base_url: str, seen: Optional[Set[str]] = None):
+        self.base_url = base_url
+        self.seen: Set[str] = seen if seen is not None else set()
+        self.count = 0
+        self._buffer = ""
+        self._base_checked = False
+
+    def feed(self, data: str) -> List[Dict[str, str]]:
+        """data を追加し、新たに完結したリンクを返す"""
+        doc = self._buffer + data
+        if not self._base_checked:
+            # <base href> は head 内にあるので、body が始まるまで探す
+            m = _BASE.search(doc)
+            if m:
+                href = html.unescape(m.group(1) or m.group(2) or m.group(3) or "")
+                self.base_url = urllib.parse.urljoin(self.base_url, href)
+                self._base_checked = True
+            elif re.search(r"<body\b", doc, re.I):
+                self._base_checked = True
+
+        # 最後の閉じた </a> までを処理し、残りは次回に回す
+        last_close = None
+        for last_close in _ANCHOR_CLOSE.finditer(doc):
+            pass
+        cut = self._tail_start(doc, last_close.end() if last_close else 0)
+        self._buffer = doc[cut:]
+        return self._collect(doc[:cut]) if last_close else []
+
+    def close(self) -> List[Dict[str, str]]:
+        """残りのバッファを処理する"""
+        doc, self._buffer = self._buffer, ""
+        return self._collect(doc)
+
+    @staticmethod
+    def _tail_start(doc: str, processed: int) -> int:
+        """次回に回す部分の開始位置（processed 以降で最初の <a、無ければ末尾付近）"""
+        m = _ANCHOR_OPEN.search(doc, processed)
+        if m:
+            return m.start()
+        # "<" で終わるなど、タグの途中で切れている可能性があるので少し残す
+        lt = doc.rfind("<", processed)
+        return lt if lt >= 0 else len(doc)
+
+    def _collect(self, doc: str) -> List[Dict[str, str]]:
+        links = []
+        for link in find_links(doc, include_empty=True):
+            url = resolve_link(link["url"], self.base_url)
+            if url is None:
+                continue
+            key = canonical_url(url)
+            if key in self.seen:
+                continue
+            self.seen.add(key)
+            self.count += 1
+            links.append({"text": link["text"] or url, "url": url})
+        return links
+
+
+def extract_links_from_html(doc: str, base_url: str) -> List[Dict[str, str]]:
+    """HTML 全体から重複を除いたリンクを返す"""
+    extractor = LinkExtractor(base_url)
+    return extractor.feed(doc) + extractor.close()
+
+
+# ----------------------------------------------------------------------
+# クロールのフロンティア
+# ----------------------------------------------------------------------
+class CrawlFrontier:
+    """
+    幅優先のクロール待ち行列。
+
+    Parameters
+    ----------
+    start_urls : Iterable[str]
+        起点の URL（深さ 0）
+    max_depth : int, default 1
+        起点から辿るリンクの深さ
+    max_pages : int, default 20
+        取り出す URL の総数
+    same_host : bool, default True
+        起点と同じホストのみ辿る
+    path_prefix : bool, default False
+        起点と同じディレクトリ以下のみ辿る（ドキュメントサイトの一部だけを読む場合）
+    max_queue : int, default 1000
+        待ち行列の上限。超えたリンクは捨てる
+    """
+
+    def __init__(
+        self,
+        start_urls: Iterable[str],
+        *,
+        max_depth: int = 1,
+        max_pages: int = 20,
+        same_host: bool = True,
+        path_prefix: bool = False,
+        max_queue: int = 1000,
+    ):
+        self.max_depth = max_depth
+        self.max_pages = max_pages
+        self.same_host = same_host
+        self.path_prefix = path_prefix
+        self.max_queue = max_queue
+        self.seen: Set[str] = set()
+        self.popped = 0
+        self.dropped = 0
+        self._queue: Deque[Tuple[str, int]] = deque()
+        self._hosts: Set[str] = set()
+        self._prefixes: List[str] = []
+        for url in start_urls:
+            self.add_scope(url)
+            self.push(url, 0)
+
+    def add_scope(self, url: str) -> None:
+        """url のホスト・ディレクトリを辿る範囲に加える（起点がリダイレクトした場合など）"""
+        self._hosts.add(urllib.parse.urlsplit(canonical_url(url)).netloc)
+        # "/book/ch01.html" → "/book/"、"/book/" → "/book/"
+        path = urllib.parse.urlsplit(url).path or "/"
+        prefix = path.rsplit("/", 1)[0] + "/"
+        if prefix not in self._prefixes:
+            self._prefixes.append(prefix)
+
+    def allowed(self, url: str) -> bool:
+        parsed = urllib.parse.urlsplit(canonical_url(url))
+        if self.same_host and parsed.netloc not in self._hosts:
+            return False
+        if self.path_prefix and not any(
+            (parsed.path + "/").startswith(p) for p in self._prefixes
+        ):
+            return False
+        return True
+
+    def push(self, url: str, depth: int) -> bool:
+        """URL を追加する。既出・制限外なら False"""
+        key = canonical_url(url)
+        if depth > self.max_depth or key in self.seen or not self.allowed(url):
+            return False
+        self.seen.add(key)
+        if len(self._queue) >= self.max_queue:
+            self.dropped += 1
+            return False
+        self._queue.append((url, depth))
+        return True
+
+    def pop_level(self, limit: Optional[int] = None) -> List[Tuple[str, int]]:
+        """
+        先頭と同じ深さの URL をまとめて取り出す（並列取得用）。
+        max_pages に達したら空リストを返す。
+        """
+        batch: List[Tuple[str, int]] = []
+        if not self._queue:
+            return batch
+        depth = self._queue[0][1]
+        while (
+            self._queue
+            and self._queue[0][1] == depth
+            and self.popped < self.max_pages
+            and (limit is None or len(batch) < limit)
+        ):
+            batch.append(self._queue.popleft())
+            self.popped += 1
+        return batch
+
+    def pending(self) -> List[Tuple[str, int]]:
+        """まだ取り出していない URL"""
+        return list(self._queue)
+
+    def __bool__(self) -> bool:
+        return bool(self._queue) and self.popped < self.max_pages
@@ -0,0 +1,502 @@
+"""
+PDF テキスト抽出（標準ライブラリのみ使用）
+
+ファイル全体を文字列化して正規表現を何度も掛けるのではなく、
+オブジェクト構造（カタログ → ページツリー → Contents）を辿り、
+必要になったページのストリームだけを zlib.decompressobj で展開する。
+ページ単位のジェネレータなので、先頭の数ページだけ欲しい場合は途中で止められる。
+
+xref テーブルは使わず、"N G obj" の位置を 1 回の走査で索引化する。
+上限バイトで打ち切られた（末尾の xref が無い）PDF も読めるようにするため。
+"""
+
+from __future__ import annotations
+
+import bisect
+import re
+import zlib
+from typing import Any, Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+
+class Ref(NamedTuple):
+    num: int
+    gen: int
+
+
+class PdfStream(NamedTuple):
+    dict: Dict[str, Any]
+    data: bytes  # 未展開のストリームデータ
+
+
+_OBJ_HEADER = re.compile(rb"(\d+)\s+(\d+)\s+obj\b")
+_ROOT_REF = re.compile(rb"/Root\s+(\d+)\s+(\d+)\s+R")
+_OBJSTM = re.compile(rb"/Type\s*/ObjStm\b")
+_WHITESPACE = b" \t\r\n\f\x00"
+_NUMBER = re.compile(rb"[+-]?(?:\d+\.?\d*|\.\d+)")
+_REF_TAIL = re.compile(rb"\s+(\d+)\s+R\b")
+_TOKEN_END = re.compile(rb"[\s()<>\[\]{}/%]")
+_ESCAPE = re.compile(rb"\\([nrtbf()\\]|[0-7]{1,3}|\r\n|\r|\n)")
+_ESCAPE_MAP = {
+    b"n": b"\n",
+    b"r": b"\r",
+    b"t": b"\t",
+    b"b": b"\b",
+    b"f": b"\f",
+    b"(": b"(",
+    b")": b")",
+    b"\\": b"\\",
+}
+
+# コンテンツストリームのトークン
+_CONTENT_TOKEN = re.compile(
+    rb"""
+    (?P<str>\((?:\\.|[^\\()]|\((?:\\.|[^\\()])*\))*\))
+    |(?P<hex><[0-9A-Fa-f\s]*>)
+    |(?P<open>\[)
+    |(?P<close>\])
+    |(?P<name>/[^\s/\[\]()<>{}%]*)
+    |(?P<num>[+-]?(?:\d+\.?\d*|\.\d+))
+    |(?P<op>[A-Za-z'"][A-Za-z*]*)
+    """,
+    re.S | re.X,
+)
+# 行送り・位置移動系のオペレータ（前後の文字列を空白で区切る）
+_BREAK_OPS = {b"Td", b"TD", b"T*", b"Tm", b"ET", b"'", b'"'}
+
+
+def unescape_string(raw: bytes) -> bytes:
+    """PDF のリテラル文字列のエスケープを解除する"""
+
+    def repl(m: "re.Match[bytes]") -> bytes:
+        seq = m.group(1)
+        if seq in _ESCAPE_MAP:
+            return _ESCAPE_MAP[seq]
+        if seq[:1] in (b"\r", b"\n"):
+            return b""  # 行継続
+        return bytes([int(seq, 8) & 0xFF])
+
+    return _ESCAPE.sub(repl, raw)
+
+
+def decode_pdf_string(raw: bytes) -> str:
+    """PDF 文字列をテキストへ変換する（UTF-16BE の BOM 付きのみ特別扱い）"""
+    if raw.startswith(b"\xfe\xff"):
+        return raw[2:].decode("utf-16-be", errors="ignore")
+    return raw.decode("latin-1", errors="ignore")
+
+
+def inflate(data: bytes) -> bytes:
+    """
+    FlateDecode を展開する。途中で切れたデータでも展開できた分だけ返す。
+    """
+    decompressor = zlib.decompressobj()
+    try:
+        return decompressor.decompress(data)
+    except zlib.error:
+        return b""
+
+
+class PdfDocument:
+    """
+    PDF のオブジェクトを必要になった時点で解析するリーダー。
+
+    Parameters
+    ----------
+    data : bytes
+        PDF ファイルのバイナリデータ
+    """
+
+    def __init__(self, data: bytes):
+        self.data = data
+        self.offsets: Dict[int, int] = {}
+        # 同じ番号が複数ある場合（増分更新）は後勝ち
+        for m in _OBJ_HEADER.finditer(data):
+            self.offsets[int(m.group(1))] = m.end()
+        self._sorted_offsets = sorted(self.offsets.values())
+        self._objects: Dict[int, Any] = {}
+        self._compressed: Optional[Dict[int, Tuple[int, int]]] = None
+        self._objstm_data: Dict[int, bytes] = {}
+        # ページツリーから得たページ数（読めなかった場合は None）
+        self.page_count: Optional[int] = None
+
+    # ------------------------------------------------------------------
+    # 値のパース
+    # ------------------------------------------------------------------
+    def skip_space(self, buf: bytes, pos: int) -> int:
+        n = len(buf)
+        while pos < n:
+            c = buf[pos]
+            if c in _WHITESPACE:
+                pos += 1
+            elif c == 0x25:  # % コメント
+                while pos < n and buf[pos] not in b"\r\n":
+                    pos += 1
+            else:
+                break
+        return pos
+
+    def parse_value(self, buf: bytes, pos: int) -> Tuple[Any, int]:
+        """buf[pos:] から値を 1 つ読み、(値, 終了位置) を返す"""
+        pos = self.skip_space(buf, pos)
+        if pos >= len(buf):
+            return None, pos
+        c = buf[pos : pos + 1]
+
+        if buf.startswith(b"<<", pos):
+            result: Dict[str, Any] = {}
+            pos += 2
+            while True:
+                pos = self.skip_space(buf, pos)
+                if pos >= len(buf) or buf.startswith(b">>", pos):
+                    return result, pos + 2
+                key, pos = self.parse_value(buf, pos)
+                value, pos = self.parse_value(buf, pos)
+                if isinstance(key, str):
+                    result[key] = value
+
+        if c == b"[":
+            items: List[Any] = []
+            pos += 1
+            while True:
+                pos = self.skip_space(buf, pos)
+                if pos >= len(buf) or buf[pos : pos + 1] == b"]":
+                    return items, pos + 1
+                value, pos = self.parse_value(buf, pos)
+                items.append(value)
+
+        if c == b"/":
+            m = _TOKEN_END.search(buf, pos + 1)
+            end = m.start() if m else len(buf)
+            return buf[pos + 1 : end].decode("latin-1"), end
+
+        if c == b"(":
+            depth, i = 0, pos
+            while i < len(buf):
+                ch = buf[i]
+                if ch == 0x5C:  # バックスラッシュ
+                    i += 2
+                    continue
+                if ch == 0x28:
+                    depth += 1
+                elif ch == 0x29:
+                    depth -= 1
+                    if depth == 0:
+                        return unescape_string(buf[pos + 1 : i]), i + 1
+                i += 1
+            return unescape_string(buf[pos + 1 :]), len(buf)
+
+        if c == b"<":
+            end = buf.find(b">", pos)
+            end = len(buf) if end < 0 else end
+            hex_digits = re.sub(rb"\s", b"", buf[pos + 1 : end])
+            if len(hex_digits) % 2:
+                hex_digits += b"0"
+            try:
+                return bytes.fromhex(hex_digits.decode("ascii")), end + 1
+            except ValueError:
+                return b"", end + 1
+
+        m = _NUMBER.match(buf, pos)
+        if m:
+            token = m.group()
+            if b"." not in token:
+                ref = _REF_TAIL.match(buf, m.end())
+                if ref:
+                    return Ref(int(token), int(ref.group(1))), ref.end()
+                return int(token), m.end()
+            return float(token), m.end()
+
+        # true / false / null などのキーワード
+        m = _TOKEN_END.search(buf, pos)
+        end = m.start() if m else len(buf)
+        if end == pos:
+            end = pos + 1
+        word = buf[pos:end]
+        return {b"true": True, b"false": False}.get(word), end
+
+    # ------------------------------------------------------------------
+    # オブジェクト取得
+    # ------------------------------------------------------------------
+    def resolve(self, value: Any) -> Any:
+        """Ref なら実体を返す"""
+        if isinstance(value, Ref):
+            return self.get(value.num)
+        return value
+
+    def get(self, num: int) -> Any:
+        """オブジェクト番号から値（dict / PdfStream など）を取得する"""
+        if num in self._objects:
+            return self._objects[num]
+        self._objects[num] = None  # 循環参照対策
+
+        if num in self.offsets:
+            obj = self.parse_indirect(self.offsets[num])
+        else:
+            obj = self.get_compressed(num)
+        self._objects[num] = obj
+        return obj
+
+    def parse_indirect(self, pos: int) -> Any:
+        value, end = self.parse_value(self.data, pos)
+        if not isinstance(value, dict):
+            return value
+        end = self.skip_space(self.data, end)
+        if not self.data.startswith(b"stream", end):
+            return value
+
+        start = end + len(b"stream")
+        if self.data.startswith(b"\r\n", start):
+            start += 2
+        elif self.data.startswith(b"\n", start) or self.data.startswith(b"\r", start):
+            start += 1
+
+        length = self.resolve(value.get("Length"))
+        stop = -1
+        if isinstance(length, int) and length >= 0:
+            stop = start + length
+            # Length が壊れている場合は endstream を探す
+            if b"endstream" not in self.data[stop : stop + 32]:
+                stop = -1
+        if stop < 0:
+            stop = self.data.find(b"endstream", start)
+            if stop < 0:
+                # 打ち切られたファイル：次のオブジェクトの手前まで
+                i = bisect.bisect_right(self._sorted_offsets, start)
+                stop = (
+                    self._sorted_offsets[i]
+                    if i < len(self._sorted_offsets)
+                    else len(self.data)
+                )
+        return PdfStream(value, self.data[start:stop])
+
+    def get_compressed(self, num: int) -> Any:
+        """オブジェクトストリーム（/Type /ObjStm）内のオブジェクトを取得する"""
+        if self._compressed is None:
+            self._compressed = {}
+            number_at = {o: n for n, o in self.offsets.items()}
+            for m in _OBJSTM.finditer(self.data):
+                # ObjStm の辞書を含むオブジェクトを特定
+                i = bisect.bisect_right(self._sorted_offsets, m.start()) - 1
+                if i < 0:
+                    continue
+                stream_num = number_at.get(self._sorted_offsets[i])
+                if stream_num is None:
+                    continue
+                stream = self.get(stream_num)
+                if not isinstance(stream, PdfStream):
+                    continue
+                n = stream.dict.get("N", 0)
+                header = self.stream_bytes(stream)
+                if not header or not isinstance(n, int):
+                    continue
+                self._objstm_data[stream_num] = header
+                numbers = re.findall(rb"\d+", header[: stream.dict.get("First", 0)])
+                for k in range(0, min(len(numbers), n * 2) - 1, 2):
+                    self._compressed.setdefault(
+                        int(numbers[k]), (stream_num, int(numbers[k + 1]))
+                    )
+
+        location = self._compressed.get(num)
+        if location is None:
+            return None
+        stream_num, offset = location
+        stream = self.get(stream_num)
+        buf = self._objstm_data.get(stream_num)
+        if not isinstance(stream, PdfStream) or buf is None:
+            return None
+        first = stream.dict.get("First", 0)
+        value, _ = self.parse_value(buf, first + offset)
+        return value
+
+    def stream_bytes(self, stream: PdfStream) -> Optional[bytes]:
+        """ストリームを展開して返す。未対応のフィルタの場合は None"""
+        filters = self.resolve(stream.dict.get("Filter"))
+        if filters is None:
+            return stream.data
+        if not isinstance(filters, list):
+            filters = [filters]
+        data = stream.data
+        for f in filters:
+            if f in ("FlateDecode", "Fl"):
+                data = inflate(data)
+            else:
+                return None
+        return data
+
+    # ------------------------------------------------------------------
+    # ページ
+    # ------------------------------------------------------------------
+    def pages(self) -> List[Dict[str, Any]]:
+        """ページツリーを辿り、ページ辞書を順番に返す"""
+        root_match = None
+        for root_match in _ROOT_REF.finditer(self.data):
+            pass
+        if root_match is None:
+            return []
+        catalog = self.get(int(root_match.group(1)))
+        if not isinstance(catalog, dict):
+            return []
+
+        result: List[Dict[str, Any]] = []
+        visited = set()
+        stack = [catalog.get("Pages")]
+        while stack:
+            node_ref = stack.pop()
+            if isinstance(node_ref, Ref):
+                if node_ref.num in visited:
+                    continue
+                visited.add(node_ref.num)
+            node = self.resolve(node_ref)
+            if not isinstance(node, dict):
+                continue
+            kids = self.resolve(node.get("Kids"))
+            if isinstance(kids, list):
+                stack.extend(reversed(kids))
+            elif node.get("Type") == "Page" or "Contents" in node:
+                result.append(node)
+        return result
+
+    def page_contents(self, page: Dict[str, Any]) -> bytes:
+        """ページの Contents を展開・連結して返す"""
+        contents = self.resolve(page.get("Contents"))
+        if not isinstance(contents, list):
+            contents = [contents]
+        parts = []
+        for item in contents:
+            stream = self.resolve(item)
+            if isinstance(stream, PdfStream):
+                data = self.stream_bytes(stream)
+                if data:
+                    parts.append(data)
+        return b"\n".join(parts)
+
+    def iter_page_texts(self) -> Iterator[str]:
+        """
+        ページごとのテキストを順に返す。
+
+        ページツリーが読めない場合は、ファイル中のストリームを先頭から順に
+        1 ページとして扱う。
+        """
+        pages = self.pages()
+        if pages:
+            self.page_count = len(pages)
+            for page in pages:
+                yield content_stream_text(self.page_contents(page))
+            return
+
+        for num in sorted(self.offsets, key=self.offsets.get):
+            obj = self.get(num)
+            if isinstance(obj, PdfStream) and obj.dict.get("Type") not in (
+                "ObjStm",
+                "XRef",
+                "XObject",
+                "Metadata",
+            ):
+                data = self.stream_bytes(obj)
+                if data:
+                    text = content_stream_text(data)
+                    if text:
+                        yield text
+
+
+def content_stream_text(content: bytes) -> str:
+    """
+    コンテンツストリームからテキスト表示オペレータ（Tj, TJ, ', "）の文字列を取り出す。
+    """
+    parts: List[str] = []
+    operands: List[Any] = []
+    array: Optional[List[Any]] = None
+    pos = 0
+    while True:
+        m = _CONTENT_TOKEN.search(content, pos)
+        if m is None:
+            break
+        pos = m.end()
+        kind = m.lastgroup
+        token = m.group()
+
+        if kind == "str":
+            value: Any = decode_pdf_string(unescape_string(token[1:-1]))
+        elif kind == "hex":
+            digits = re.sub(rb"\s", b"", token[1:-1])
+            raw = bytes.fromhex(digits.decode("ascii") + ("0" if len(digits) % 2 else ""))
+            # ToUnicode を解釈しないので、ASCII として読めるものだけ採用
+            if raw.startswith(b"\xfe\xff") or all(0x20 <= b < 0x7F for b in raw):
+                value = decode_pdf_string(raw)
+            else:
+                value = ""
+        elif kind == "open":
+            array = []
+            continue
+        elif kind == "close":
+            operands.append(array or [])
+            array = None
+            continue
+        elif kind == "num":
+            value = float(token)
+        elif kind == "op":
+            if token in (b"Tj", b"'", b'"') and operands and isinstance(operands[-1], str):
+                if token != b"Tj":
+                    parts.append(" ")
+                parts.append(operands[-1])
+            elif token == b"TJ" and operands and isinstance(operands[-1], list):
+                for item in operands[-1]:
+                    if isinstance(item, str):
+                        parts.append(item)
+                    elif isinstance(item, float) and item < -200:
+                        # 大きな字間調整は単語区切りとみなす
+                        parts.append(" ")
+            elif token in _BREAK_OPS:
+                parts.append(" ")
+            elif token == b"ID":
+                # インライン画像のバイナリは読み飛ばす
+                end = content.find(b"EI", pos)
+                pos = len(content) if end < 0 else end + 2
+            operands = []
+            continue
+        else:
+            continue
+
+        if array is not None:
+            array.append(value)
+        else:
+            operands.append(value)
+
+    return re.sub(r"\s+", " ", "".join(parts)).strip()
+
+
+def iter_pdf_pages(pdf_data: bytes) -> Iterator[str]:
+    """PDF のテキストをページ単位で返すジェネレータ"""
+    return PdfDocument(pdf_data).iter_page_texts()
+
+
+def extract_pdf_text(
+    pdf_data: bytes, max_chars: Optional[int] = None
+) -> Tuple[str, bool]:
+    """
+    PDF からテキストを抽出する。
+
+    Parameters
+    ----------
+    pdf_data : bytes
+        PDF ファイルのバイナリデータ
+    max_chars : int, optional
+        この文字数に達したら以降のページは展開しない
+
+    Returns
+    -------
+    Tuple[str, bool]
+        抽出テキストと、全ページを処理したかどうか
+    """
+    doc = PdfDocument(pdf_data)
+    texts: List[str] = []
+    total = 0
+    for index, text in enumerate(doc.iter_page_texts()):
+        if not text:
+            continue
+        texts.append(text)
+        total += len(text) + 1
+        if max_chars is not None and total >= max_chars:
+            is_last = doc.page_count is not None and index + 1 >= doc.page_count
+            return " ".join(texts), is_last
+    return " ".join(texts), True
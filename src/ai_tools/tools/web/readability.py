@@ -0,0 +1,211 @@
+"""
+本文抽出（readability 相当）
+
+メニュー・Cookie バナー・フッター・関連記事リストなどを落とし、本文らしい部分だけを残す。
+LLM に渡すトークン数を減らすためのもの。
+
+1. FastTextExtractor と同じく script/nav/footer などの部分木を除去
+2. class / id がコメント欄・サイドバー・関連記事・Cookie バナー・共有ボタンなどを
+   示す要素（readability の unlikely candidates）の部分木を除去。
+   <nav> / <footer> を使わず div で組んだサイトの定型部分はここで落とす
+3. <main> / <article> があり十分なテキストを含むならそこに絞る
+4. ブロック要素（p, div, li, h1 など）で区切り、ブロックごとの文字数とリンク密度
+   （リンク文字数 / 文字数）で本文かどうかを判定する
+   - 長くてリンクの少ないブロックは本文
+   - 前後が本文のブロックは本文（見出し・短い段落・リンクを含む段落）
+"""
+
+from __future__ import annotations
+
+import re
+from typing import Dict, List, Optional, Tuple
+
+from .html_text import (
+    FastTextExtractor,
+    body_html,
+    find_links,
+    html_to_text,
+    strip_skipped,
+    _skip_subtree,
+    _subtree_end,
+    _VOID_TAGS,
+)
+
+# これ以上の文字数でリンク密度が低ければ本文
+LONG_BLOCK_CHARS = 80
+# 文末記号を含む場合はこの文字数から本文扱い
+SENTENCE_BLOCK_CHARS = 25
+# リンク密度（リンク文字数 / 文字数）の上限。短いブロックほど厳しくする
+MAX_LINK_DENSITY = 0.5
+MAX_SHORT_LINK_DENSITY = 0.2
+# 前後が本文のブロックはこのリンク密度まで本文とみなす（リンクを含む段落）
+MAX_INLINE_LINK_DENSITY = 0.75
+# 本文がこれ未満しか取れなかった場合は全文にフォールバックする
+MIN_CONTENT_CHARS = 200
+
+_BLOCK = re.compile(
+    r"</?(?:p|div|section|article|main|header|li|ul|ol|dl|dt|dd|table|tbody|thead|tr|td|th"
+    r"|h[1-6]|pre|blockquote|figure|figcaption|br|hr|form|fieldset|details|summary)\b[^>]*>",
+    re.I,
+)
+_CONTAINER = re.compile(r"<(main|article)\b[^>]*>", re.I)
+# class / id にこれらを含む要素は本文ではない（_LIKELY も含むものは残す）
+_UNLIKELY_NAMES = (
+    "comment|disqus|sidebar|related|share|sharing|social|cookie|consent|gdpr|breadcrumb"
+    "|menu|widget|promo|sponsor|advert|newsletter|subscribe|signup|popup|modal|pagination"
+    "|pager|footer|masthead|site-header|skip-link|rss|tag-cloud|author-bio"
+)
+# class / id の値に _UNLIKELY_NAMES を含む開始タグ（値は group 2）
+_UNLIKELY_OPEN = re.compile(
+    r"<([a-zA-Z][a-zA-Z0-9]*)\s[^>]*?\b(?:class|id)\s*=\s*[\"']?"
+    r"([^\"'>]*?(?:%s)[^\"'>]*)[^>]*>" % _UNLIKELY_NAMES,
+    re.I,
+)
+_LIKELY = re.compile(r"article|body|column|content|main", re.I)
+# 除去しない要素（ページ全体を包むもの）
+_WRAPPER_TAGS = ("html", "body", "main", "article")
+_ANCHOR_TEXT = re.compile(r"<a\b[^>]*>(.*?)</a\s*>", re.S | re.I)
+_SENTENCE = re.compile(r"[。．！？!?]|[.,;:]\s")
+
+
+def _block_stats(fragment: str) -> Tuple[str, int]:
+    """ブロックのテキストとリンク文字数を返す"""
+    text = " ".join(html_to_text(fragment).split())
+    link_chars = 0
+    if "<a" in fragment or "<A" in fragment:
+        for m in _ANCHOR_TEXT.finditer(fragment):
+            link_chars += len(" ".join(html_to_text(m.group(1)).split()))
+    return text, min(link_chars, len(text))
+
+
+def strip_unlikely(doc: str) -> str:
+    """
+    class / id が定型部分（コメント欄・サイドバー・Cookie バナーなど）を示す要素の部分木を
+    取り除く。本文らしい名前（content, post など）も含む要素と、閉じタグが見つからない要素、
+    文書の半分以上を占める要素（"has-sidebar" のようなページ全体の枠）は残す。
+    """
+    pieces: List[str] = []
+    pos = 0
+    while True:
+        m = _UNLIKELY_OPEN.search(doc, pos)
+        if m is None:
+            break
+        tag = m.group(1).lower()
+        if tag in _VOID_TAGS or m.group(0).endswith("/>"):
+            end: Optional[int] = m.end()
+        elif tag in _WRAPPER_TAGS or _LIKELY.search(m.group(2)):
+            end = None
+        else:
+            end = _subtree_end(doc, tag, m.end())
+            if end is not None and end - m.start() > len(doc) / 2:
+                end = None
+        if end is None:
+            pieces.append(doc[pos : m.end()])
+            pos = m.end()
+            continue
+        pieces.append(doc[pos : m.start()])
+        pieces.append(" ")
+        pos = end
+    pieces.append(doc[pos:])
+    return "".join(pieces)
+
+
+def main_container(doc: str) -> str:
+    """
+    <main> または唯一の <article> の中身を返す。
+    <article> が複数ある（一覧ページなど）場合や見つからない場合は doc をそのまま返す。
+    """
+    mains, articles = [], []
+    for m in _CONTAINER.finditer(doc):
+        (mains if m.group(1).lower() == "main" else articles).append(m)
+    candidates = mains[:1] or (articles if len(articles) == 1 else [])
+    for m in candidates:
+        end = _skip_subtree(doc, m.group(1).lower(), m.end())
+        inner = doc[m.end() : end]
+        if len(" ".join(html_to_text(inner).split())) >= MIN_CONTENT_CHARS:
+            return inner
+    return doc
+
+
+def classify_blocks(blocks: List[Tuple[str, int]]) -> List[bool]:
+    """各ブロックが本文かどうかを判定する"""
+    is_content = []
+    for text, link_chars in blocks:
+        length = len(text)
+        density = link_chars / length if length else 1.0
+        is_content.append(
+            (length >= LONG_BLOCK_CHARS and density < MAX_LINK_DENSITY)
+            or (
+                length >= SENTENCE_BLOCK_CHARS
+                and density < MAX_SHORT_LINK_DENSITY
+                and bool(_SENTENCE.search(text))
+            )
+        )
+
+    # 前後の本文に挟まれたブロックは本文（リンクの多い段落も含む）。
+    # 短くリンクの少ないブロックは直後が本文なら本文（見出し）
+    result = list(is_content)
+    for i, (text, link_chars) in enumerate(blocks):
+        if result[i] or not text or link_chars > len(text) * MAX_INLINE_LINK_DENSITY:
+            continue
+        prev_content = next((is_content[j] for j in range(i - 1, -1, -1) if blocks[j][0]), False)
+        next_content = next(
+            (is_content[j] for j in range(i + 1, len(blocks)) if blocks[j][0]), False
+        )
+        heading = len(text) <= LONG_BLOCK_CHARS and link_chars <= len(text) * MAX_LINK_DENSITY
+        if next_content and (prev_content or heading):
+            result[i] = True
+    return result
+
+
+class MainContentExtractor(FastTextExtractor):
+    """
+    本文だけを抽出する FastTextExtractor。
+
+    Attributes
+    ----------
+    report : Dict[str, float]
+        total_chars（除去前の全文字数）、content_chars（本文の文字数）、
+        link_chars（全体のリンク文字数）、boilerplate_ratio（本文以外の割合）、
+        link_ratio（リンク文字の割合）
+    """
+
+    # ブロックの分類に文書全体が必要なので close() でまとめて処理する
+    incremental = False
+
+    def __init__(self, body_only: bool = False):
+        super().__init__(body_only=body_only)
+        self.report: Dict[str, float] = {}
+
+    def parse(self, doc: str) -> None:
+        if self.body_only:
+            doc = body_html(doc)
+        doc = strip_skipped(doc)
+        self.links = find_links(doc)
+
+        # 除去前の全文（FastTextExtractor の結果に相当）とリンク文字数
+        full_text = " ".join(html_to_text(doc).split())
+        total_chars = len(full_text)
+        link_chars = sum(
+            len(" ".join(html_to_text(m.group(1)).split())) for m in _ANCHOR_TEXT.finditer(doc)
+        )
+
+        container = main_container(strip_unlikely(doc))
+        blocks = [_block_stats(fragment) for fragment in _BLOCK.split(container)]
+        blocks = [b for b in blocks if b[0]]
+
+        flags = classify_blocks(blocks)
+        content = [text for (text, _), keep in zip(blocks, flags) if keep]
+        text = " ".join(content)
+        if len(text) < MIN_CONTENT_CHARS and len(text) < total_chars / 10:
+            # 本文が判定できないページは全文を返す
+            text = full_text
+
+        self.text = [text] if text else []
+        self.report = {
+            "total_chars": total_chars,
+            "content_chars": len(text),
+            "link_chars": link_chars,
+            "boilerplate_ratio": 1 - len(text) / total_chars if total_chars else 0.0,
+            "link_ratio": link_chars / total_chars if total_chars else 0.0,
+        }
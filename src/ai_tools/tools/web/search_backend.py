@@ -0,0 +1,346 @@
+"""
+検索バックエンド
+
+web_search が使う検索エンジンを差し替えられるようにする。
+
+- DdgsBackend: DDGS（DuckDuckGo）で検索する
+- LocalIndexBackend: 取得済みページと過去の検索結果を SQLite FTS5 に索引し、そこから検索する。
+  ネットワーク無しで動くので、エージェントのベンチマークを再現可能な状態で回せる。
+- FallbackBackend: 主バックエンドが失敗・0 件のときに別のバックエンドで検索する
+
+get_search_backend() が返す共有バックエンドは環境変数 AI_TOOLS_SEARCH_BACKEND で選ぶ。
+
+- "auto"（既定）: DDGS で検索し、結果をローカル索引に記録する。失敗時はローカル索引で検索
+- "ddgs": DDGS のみ
+- "local": ローカル索引のみ（オフライン）
+"""
+
+from __future__ import annotations
+
+import os
+import re
+import sqlite3
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterator, List, Optional, Protocol, Set
+
+from .cache import CachedPage, PageCache, default_cache_dir, get_page_cache
+from .search_cache import normalize_query
+
+SEARCH_BACKEND = os.environ.get("AI_TOOLS_SEARCH_BACKEND", "auto")
+# 差分更新の待ちがこの件数を超えたら URL を捨て、次の sync で全件を見直す
+MAX_QUEUED = 10000
+
+_TITLE = re.compile(rb"<title[^>]*>(.*?)</title\s*>", re.S | re.I)
+
+
+class SearchBackend(Protocol):
+    """
+    検索バックエンドのインターフェース。
+
+    search は DDGS().text と同じ形式（title / href / body の辞書のリスト）を返す。
+    ローカル索引の結果には "source": "local" が付く（検索結果キャッシュには保存しない）。
+    """
+
+    name: str
+
+    def search(self, query: str, max_results: int) -> List[dict]: ...
+
+
+# ----------------------------------------------------------------------
+# DDGS
+# ----------------------------------------------------------------------
+class DdgsBackend:
+    """
+    DDGS で検索する。
+
+    Parameters
+    ----------
+    backend : str, default "duckduckgo"
+        DDGS().text の backend 引数
+    """
+
+    def __init__(self, backend: str = "duckduckgo"):
+        self.backend = backend
+        self.name = f"ddgs:{backend}"
+
+    def search(self, query: str, max_results: int) -> List[dict]:
+        from ddgs import DDGS
+
+        return DDGS().text(query, max_results=max_results, backend=self.backend)
+
+
+# ----------------------------------------------------------------------
+# ローカル索引（SQLite FTS5）
+# ----------------------------------------------------------------------
+class LocalIndexBackend:
+    """
+    SQLite FTS5 の全文検索索引から検索する。
+
+    索引するのは次の 2 つ。
+
+    - ページキャッシュ（PageCache）に保存されているページ。初回の検索で既存のページを取り込み、
+      以降はキャッシュに保存されたページだけを検索のたびに取り込む
+    - record() で渡された検索結果（タイトルと要約）。本文が未取得の URL も検索できる
+
+    日本語も検索できるよう trigram トークナイザーを使うので、2 文字以下の語は検索語にならない。
+
+    Parameters
+    ----------
+    path : Path, optional
+        索引ファイル。省略時は default_cache_dir() / "search_index.sqlite3"
+    page_cache : PageCache, optional
+        取り込むページキャッシュ。省略時は get_page_cache()
+    """
+
+    name = "local"
+
+    def __init__(
+        self,
+        path: Optional[Path] = None,
+        *,
+        page_cache: Optional[PageCache] = None,
+    ):
+        self.path = Path(path) if path else default_cache_dir() / "search_index.sqlite3"
+        self.page_cache = page_cache
+        self._lock = threading.Lock()
+        # 全件を取り込み済みのページキャッシュと、その後に保存された未索引のページの URL
+        # （本文はキャッシュにあるので、sync まで URL だけを持つ）
+        self._synced: Optional[PageCache] = None
+        self._queued: Set[str] = set()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS docs"
+                " (url TEXT PRIMARY KEY, title TEXT, fetched_at REAL)"
+            )
+            conn.execute(
+                "CREATE VIRTUAL TABLE IF NOT EXISTS docs_fts USING fts5"
+                " (url UNINDEXED, title, body, tokenize='trigram')"
+            )
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        # 呼び出しごとに接続する（AsyncFetcher のワーカーなど別スレッドからも呼ばれる）
+        conn = sqlite3.connect(self.path, timeout=10)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    # ------------------------------------------------------------------
+    # 索引の更新
+    # ------------------------------------------------------------------
+    def add(self, url: str, title: str, body: str, fetched_at: float = 0.0) -> None:
+        """1 件を索引する（同じ URL は置き換える）"""
+        with self._lock, self._connect() as conn:
+            self._upsert(conn, url, title, body, fetched_at)
+
+    @staticmethod
+    def _upsert(conn, url: str, title: str, body: str, fetched_at: float) -> None:
+        conn.execute("DELETE FROM docs_fts WHERE url = ?", (url,))
+        conn.execute(
+            "INSERT INTO docs_fts (url, title, body) VALUES (?, ?, ?)", (url, title, body)
+        )
+        conn.execute(
+            "INSERT OR REPLACE INTO docs (url, title, fetched_at) VALUES (?, ?, ?)",
+            (url, title, fetched_at),
+        )
+
+    def add_page(self, page: CachedPage) -> None:
+        """取得済みページを索引する"""
+        self.add(page.url, page_title(page), page.text, page.fetched_at)
+
+    def record(self, results: List[dict]) -> None:
+        """
+        検索結果を索引する。本文を取得済みの URL（fetched_at > 0）は上書きしない。
+        """
+        with self._lock, self._connect() as conn:
+            for result in results:
+                url = result.get("href") or ""
+                if not url:
+                    continue
+                row = conn.execute(
+                    "SELECT fetched_at FROM docs WHERE url = ?", (url,)
+                ).fetchone()
+                if row and row[0]:
+                    continue
+                self._upsert(
+                    conn, url, result.get("title", ""), result.get("body", ""), 0.0
+                )
+
+    def _on_put(self, page: CachedPage) -> None:
+        with self._lock:
+            if len(self._queued) >= MAX_QUEUED:
+                self._queued.clear()
+                self._synced = None
+            elif self._synced is not None:
+                self._queued.add(page.url)
+
+    def sync(self) -> int:
+        """
+        ページキャッシュのうち、未索引または更新されたページを取り込む。
+
+        初回（とページキャッシュが差し替えられたとき）だけ全エントリのメタ情報を見て、
+        以降は add_listener で受け取った URL のページだけを取り込む。
+        ページは peek で読むので、キャッシュの LRU の順序は変えない。
+
+        Returns
+        -------
+        int
+            取り込んだページ数
+        """
+        cache = self.page_cache or get_page_cache()
+        with self._lock:
+            full = self._synced is not cache
+            if full:
+                # 取り込み中に保存されたページも取りこぼさないよう、先に登録する
+                cache.add_listener(self._on_put)
+                self._synced = cache
+            queued = list(self._queued)
+            self._queued.clear()
+        count = 0
+        with self._lock, self._connect() as conn:
+            for url in queued:
+                page = cache.peek(url)
+                if page is not None and page.text:
+                    self._upsert(conn, url, page_title(page), page.text, page.fetched_at)
+                    count += 1
+            if full:
+                indexed = dict(conn.execute("SELECT url, fetched_at FROM docs"))
+                for meta in cache.read_meta():
+                    url = meta.get("url", "")
+                    if not url or indexed.get(url, -1.0) >= meta.get("fetched_at", 0.0):
+                        continue
+                    page = cache.peek(url)
+                    if page is None or not page.text:
+                        continue
+                    self._upsert(conn, url, page_title(page), page.text, page.fetched_at)
+                    count += 1
+        if count:
+            print(f"[LocalIndexBackend] {count} ページを索引しました")
+        return count
+
+    # ------------------------------------------------------------------
+    # 検索
+    # ------------------------------------------------------------------
+    def search(self, query: str, max_results: int) -> List[dict]:
+        self.sync()
+        # trigram は 3 文字以上の語しか照合できない
+        words = [w for w in normalize_query(query).split() if len(w) >= 3]
+        if not words:
+            return []
+        match = " OR ".join('"' + w.replace('"', '""') + '"' for w in words)
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT url, title, snippet(docs_fts, 2, '', '', '…', 64)"
+                " FROM docs_fts WHERE docs_fts MATCH ?"
+                " ORDER BY bm25(docs_fts, 0.0, 5.0, 1.0) LIMIT ?",
+                (match, max_results),
+            ).fetchall()
+        return [
+            {"title": title, "href": url, "body": body, "source": self.name}
+            for url, title, body in rows
+        ]
+
+
+def page_title(page: CachedPage) -> str:
+    """HTML の <title>、無ければテキストの先頭"""
+    m = _TITLE.search(page.raw[:65536])
+    if m:
+        title = " ".join(m.group(1).decode("utf-8", errors="replace").split())
+        if title:
+            return title
+    return page.text[:80]
+
+
+# ----------------------------------------------------------------------
+# フォールバック
+# ----------------------------------------------------------------------
+class FallbackBackend:
+    """
+    primary で検索し、例外または 0 件なら fallback で検索する。
+    record_to を指定すると primary の結果をそこへ記録する。
+
+    Parameters
+    ----------
+    primary : SearchBackend
+        通常使うバックエンド
+    fallback : SearchBackend
+        primary が使えないときのバックエンド
+    record_to : LocalIndexBackend, optional
+        primary の結果を記録する索引
+    """
+
+    def __init__(
+        self,
+        primary: SearchBackend,
+        fallback: SearchBackend,
+        *,
+        record_to: Optional[LocalIndexBackend] = None,
+    ):
+        self.primary = primary
+        self.fallback = fallback
+        self.record_to = record_to
+        self.name = primary.name
+
+    def search(self, query: str, max_results: int) -> List[dict]:
+        try:
+            results = self.primary.search(query, max_results)
+        except Exception as e:
+            print(f"[FallbackBackend] {self.primary.name} で失敗: {e}")
+            results = []
+        if results:
+            if self.record_to is not None:
+                self.record_to.record(results)
+            return results
+        return self.fallback.search(query, max_results)
+
+
+def make_search_backend(kind: str) -> SearchBackend:
+    """
+    名前からバックエンドを生成する。
+
+    Parameters
+    ----------
+    kind : str
+        "auto" / "ddgs" / "local"
+    """
+    if kind == "ddgs":
+        return DdgsBackend()
+    if kind == "local":
+        return LocalIndexBackend()
+    if kind == "auto":
+        local = LocalIndexBackend()
+        return FallbackBackend(DdgsBackend(), local, record_to=local)
+    raise ValueError(f"unknown search backend: {kind}")
+
+
+_backend: Optional[SearchBackend] = None
+_backend_lock = threading.Lock()
+
+
+def get_search_backend() -> SearchBackend:
+    """プロセス共有の検索バックエンドを返す（初回に SEARCH_BACKEND から生成）"""
+    global _backend
+    with _backend_lock:
+        if _backend is None:
+            _backend = make_search_backend(SEARCH_BACKEND)
+        return _backend
+
+
+def configure_search_backend(backend) -> SearchBackend:
+    """
+    共有バックエンドを差し替える。
+
+    Parameters
+    ----------
+    backend : SearchBackend or str
+        バックエンド、または make_search_backend に渡す名前
+    """
+    global _backend
+    with _backend_lock:
+        _backend = make_search_backend(backend) if isinstance(backend, str) else backend
+        return _backend
@@ -0,0 +1,113 @@
+"""
+検索結果のキャッシュ
+
+SearchCache: 正規化したクエリ（大文字小文字・全角半角・記号・語順の違いを無視）を
+キーに検索結果をディスクへ保存し、TTL 内は検索せずに返す。
+検索をまたいだ URL の重複は WebSearchPipeline.sources() が canonical_url で除く。
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+import unicodedata
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from .cache import default_cache_dir
+
+_PUNCTUATION = re.compile(r"[\W_]+")
+
+
+def normalize_query(query: str) -> str:
+    """
+    クエリを正規化する。
+    NFKC で全角半角をそろえて小文字化し、記号を空白にして、重複を除いた語を並べ替える。
+    「Python asyncio 使い方」と「使い方 python  asyncio？」は同じキーになる。
+    """
+    text = unicodedata.normalize("NFKC", query).casefold()
+    words = _PUNCTUATION.sub(" ", text).split()
+    return " ".join(sorted(set(words)))
+
+
+class SearchCache:
+    """
+    検索結果のディスクキャッシュ。1 クエリにつき <key>.json を 1 つ保存する。
+
+    Parameters
+    ----------
+    directory : Path, optional
+        保存先ディレクトリ。省略時は default_cache_dir() / "search"
+    ttl : float, default 21600
+        キャッシュを使う秒数（6 時間）
+    """
+
+    def __init__(self, directory: Optional[Path] = None, *, ttl: float = 6 * 3600):
+        self.directory = Path(directory) if directory else default_cache_dir() / "search"
+        self.ttl = ttl
+        self._memory: Dict[str, dict] = {}
+        self._lock = threading.Lock()
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+    @staticmethod
+    def key(query: str, backend: str, max_results: int) -> str:
+        source = f"{backend}\n{max_results}\n{normalize_query(query)}"
+        return hashlib.sha256(source.encode("utf-8")).hexdigest()
+
+    def get(self, query: str, backend: str, max_results: int) -> Optional[List[dict]]:
+        """TTL 内の検索結果を返す。無ければ None。"""
+        key = self.key(query, backend, max_results)
+        with self._lock:
+            entry = self._memory.get(key)
+        if entry is None:
+            try:
+                entry = json.loads((self.directory / f"{key}.json").read_text(encoding="utf-8"))
+            except (OSError, ValueError):
+                return None
+            with self._lock:
+                self._memory[key] = entry
+        if time.time() - entry.get("searched_at", 0.0) >= self.ttl:
+            return None
+        return entry.get("results", [])
+
+    def put(self, query: str, backend: str, max_results: int, results: List[dict]) -> None:
+        key = self.key(query, backend, max_results)
+        entry = {"query": query, "searched_at": time.time(), "results": results}
+        path = self.directory / f"{key}.json"
+        tmp = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        with self._lock:
+            self._memory[key] = entry
+            tmp.write_text(json.dumps(entry, ensure_ascii=False), encoding="utf-8")
+            os.replace(tmp, path)
+
+
+_cache: Optional[SearchCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_search_cache() -> SearchCache:
+    """プロセス共有の SearchCache を返す（初回に生成）"""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = SearchCache()
+        return _cache
+
+
+def configure_search_cache(**kwargs) -> SearchCache:
+    """
+    共有キャッシュを指定の設定で作り直す。
+
+    Parameters
+    ----------
+    **kwargs
+        SearchCache のコンストラクタ引数（directory, ttl）
+    """
+    global _cache
+    with _cache_lock:
+        _cache = SearchCache(**kwargs)
+        return _cache
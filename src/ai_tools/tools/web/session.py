@@ -0,0 +1,372 @@
+"""
+HTTP セッション層（標準ライブラリのみ使用）
+
+ホスト単位でコネクションをプールし、keep-alive で使い回す。
+同一ホストへの連続アクセスで TCP + TLS ハンドシェイクを毎回払わないためのもの。
+"""
+
+from __future__ import annotations
+
+import http.client
+import io
+import ssl
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from typing import Dict, List, Optional, Tuple
+
+DEFAULT_HEADERS = {
+    "User-Agent": (
+        "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) "
+        "AppleWebKit/537.36 (KHTML, like Gecko) "
+        "Chrome/91.0.4472.124 Safari/537.36"
+    )
+}
+
+REDIRECT_CODES = (301, 302, 303, 307, 308)
+
+# 使い回したコネクションがサーバー側で切られていた場合に出る例外
+_STALE_ERRORS = (
+    http.client.RemoteDisconnected,
+    http.client.BadStatusLine,
+    ConnectionResetError,
+    BrokenPipeError,
+)
+
+HostKey = Tuple[str, str, int]
+
+
+class HttpResponse:
+    """
+    HttpSession.request の戻り値。
+
+    urllib のレスポンスと同じく status / reason / headers / read() を持つ。
+    close() 時に本文を読み切っていればコネクションをプールへ返却する。
+
+    Attributes
+    ----------
+    url : str
+        リダイレクト後の最終 URL
+    redirects : List[Tuple[int, str]]
+        辿ったリダイレクト (ステータスコード, 遷移先 URL) のリスト
+    """
+
+    def __init__(
+        self,
+        session: "HttpSession",
+        key: Optional[HostKey],
+        conn: Optional[http.client.HTTPConnection],
+        raw,
+        url: str,
+        redirects: Optional[List[Tuple[int, str]]] = None,
+    ):
+        self._session = session
+        self._key = key
+        self._conn = conn
+        self._raw = raw
+        self.url = url
+        self.redirects = redirects or []
+        self.status: int = raw.status
+        self.reason: str = raw.reason
+        self.headers = raw.headers if hasattr(raw, "headers") else raw.msg
+        self._closed = False
+
+    def read(self, amt: Optional[int] = None) -> bytes:
+        if amt is None:
+            return self._raw.read()
+        return self._raw.read(amt)
+
+    def getcode(self) -> int:
+        return self.status
+
+    def geturl(self) -> str:
+        return self.url
+
+    def close(self) -> None:
+        if self._closed:
+            return
+        self._closed = True
+        if self._conn is None:
+            # プロキシ経由（urllib）の場合
+            self._raw.close()
+            return
+        if not self._raw.isclosed() and self._raw.length == 0:
+            # HEAD / 204 などは本文が無いので読み切り扱いにする
+            self._raw.read()
+        reusable = self._raw.isclosed() and not self._raw.will_close
+        if not reusable:
+            self._raw.close()
+        self._session.release(self._key, self._conn, reusable=reusable)
+
+    def __enter__(self) -> "HttpResponse":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+class HttpSession:
+    """
+    ホスト単位のコネクションプールを持つ HTTP クライアント。
+
+    Parameters
+    ----------
+    max_per_host : int, default 4
+        1 ホストあたりの同時接続数の上限
+    max_idle_per_host : int, default 2
+        1 ホストあたりプールに保持するアイドル接続数の上限
+    idle_timeout : float, default 30.0
+        アイドル接続を破棄するまでの秒数
+    max_redirects : int, default 5
+        リダイレクトを辿る最大回数
+    headers : Dict[str, str], optional
+        全リクエストに付与するヘッダー。省略時は DEFAULT_HEADERS
+    """
+
+    def __init__(
+        self,
+        *,
+        max_per_host: int = 4,
+        max_idle_per_host: int = 2,
+        idle_timeout: float = 30.0,
+        max_redirects: int = 5,
+        headers: Optional[Dict[str, str]] = None,
+    ):
+        self.max_per_host = max_per_host
+        self.max_idle_per_host = max_idle_per_host
+        self.idle_timeout = idle_timeout
+        self.max_redirects = max_redirects
+        self.headers = dict(headers or DEFAULT_HEADERS)
+        self._lock = threading.Lock()
+        self._idle: Dict[HostKey, List[Tuple[http.client.HTTPConnection, float]]] = {}
+        self._slots: Dict[HostKey, threading.BoundedSemaphore] = {}
+        self._ssl_context = ssl.create_default_context()
+
+    # ------------------------------------------------------------------
+    # プール管理
+    # ------------------------------------------------------------------
+    def _slot(self, key: HostKey) -> threading.BoundedSemaphore:
+        with self._lock:
+            slot = self._slots.get(key)
+            if slot is None:
+                slot = threading.BoundedSemaphore(self.max_per_host)
+                self._slots[key] = slot
+            return slot
+
+    def acquire(
+        self, key: HostKey, timeout: float
+    ) -> Tuple[http.client.HTTPConnection, bool]:
+        """
+        プールから接続を取り出す。無ければ新規作成する。
+
+        Returns
+        -------
+        Tuple[HTTPConnection, bool]
+            接続と、それが使い回しかどうか
+        """
+        if not self._slot(key).acquire(timeout=timeout):
+            raise urllib.error.URLError(f"connection pool for {key[1]} is exhausted")
+
+        now = time.monotonic()
+        with self._lock:
+            idle = self._idle.get(key, [])
+            while idle:
+                conn, last_used = idle.pop()
+                if now - last_used <= self.idle_timeout:
+                    conn.timeout = timeout
+                    if conn.sock is not None:
+                        conn.sock.settimeout(timeout)
+                    return conn, True
+                conn.close()
+
+        scheme, host, port = key
+        if scheme == "https":
+            conn = http.client.HTTPSConnection(
+                host, port, timeout=timeout, context=self._ssl_context
+            )
+        else:
+            conn = http.client.HTTPConnection(host, port, timeout=timeout)
+        return conn, False
+
+    def release(
+        self, key: HostKey, conn: http.client.HTTPConnection, reusable: bool
+    ) -> None:
+        """接続をプールへ返却する。再利用できない接続は閉じる。"""
+        with self._lock:
+            idle = self._idle.setdefault(key, [])
+            if reusable and len(idle) < self.max_idle_per_host:
+                idle.append((conn, time.monotonic()))
+            else:
+                conn.close()
+        self._slot(key).release()
+
+    def close(self) -> None:
+        """プール内のアイドル接続を全て閉じる"""
+        with self._lock:
+            for idle in self._idle.values():
+                for conn, _ in idle:
+                    conn.close()
+            self._idle.clear()
+
+    # ------------------------------------------------------------------
+    # リクエスト
+    # ------------------------------------------------------------------
+    def request(
+        self,
+        method: str,
+        url: str,
+        *,
+        headers: Optional[Dict[str, str]] = None,
+        timeout: float = 60,
+        follow_redirects: bool = True,
+    ) -> HttpResponse:
+        """
+        リクエストを送信し、レスポンスを返す。
+
+        urllib.request.urlopen と同様に、4xx/5xx は urllib.error.HTTPError、
+        接続失敗は urllib.error.URLError を送出する。
+        HTTPError の redirects 属性にはそれまでに辿ったリダイレクトが入る。
+
+        Parameters
+        ----------
+        method : str
+            HTTP メソッド
+        url : str
+            エンコード済みの URL
+        headers : Dict[str, str], optional
+            追加ヘッダー
+        timeout : float, default 60
+            タイムアウト（秒）
+        follow_redirects : bool, default True
+            リダイレクトを辿るかどうか
+
+        Returns
+        -------
+        HttpResponse
+            レスポンス。with 文で使うこと。
+        """
+        req_headers = dict(self.headers)
+        if headers:
+            req_headers.update(headers)
+
+        redirects: List[Tuple[int, str]] = []
+        for _ in range(self.max_redirects + 1):
+            response = self._send(method, url, req_headers, timeout, redirects)
+            location = response.headers.get("Location")
+            if not (
+                follow_redirects and response.status in REDIRECT_CODES and location
+            ):
+                break
+            response.read()
+            response.close()
+            url = urllib.parse.urljoin(url, location)
+            redirects.append((response.status, url))
+            if response.status == 303:
+                method = "GET"
+        else:
+            raise urllib.error.URLError(f"too many redirects: {url}")
+
+        if response.status >= 400:
+            body = response.read()
+            response.close()
+            error = urllib.error.HTTPError(
+                url, response.status, response.reason, response.headers, io.BytesIO(body)
+            )
+            # エラーになるまでに辿ったリダイレクト
+            error.redirects = redirects
+            raise error
+        return response
+
+    def _send(
+        self,
+        method: str,
+        url: str,
+        headers: Dict[str, str],
+        timeout: float,
+        redirects: List[Tuple[int, str]],
+    ) -> HttpResponse:
+        parsed = urllib.parse.urlsplit(url)
+        scheme = parsed.scheme.lower()
+        if scheme not in ("http", "https"):
+            raise urllib.error.URLError(f"unsupported scheme: {scheme}")
+        host = parsed.hostname or ""
+        port = parsed.port or (443 if scheme == "https" else 80)
+
+        # プロキシ設定がある場合は urllib に任せる（プールはしない）
+        proxies = urllib.request.getproxies()
+        if scheme in proxies and not urllib.request.proxy_bypass(host):
+            req = urllib.request.Request(url, headers=headers, method=method)
+            try:
+                raw = urllib.request.urlopen(req, timeout=timeout)
+            except urllib.error.HTTPError as e:
+                raw = e
+            return HttpResponse(self, None, None, raw, raw.geturl(), redirects)
+
+        path = parsed.path or "/"
+        if parsed.query:
+            path += "?" + parsed.query
+
+        key: HostKey = (scheme, host, port)
+        for attempt in range(2):
+            conn, reused = self.acquire(key, timeout)
+            try:
+                conn.request(method, path, headers=headers)
+                raw = conn.getresponse()
+            except _STALE_ERRORS as e:
+                conn.close()
+                self.release(key, conn, reusable=False)
+                # 使い回した接続が切れていただけなら 1 回だけやり直す
+                if reused and attempt == 0:
+                    continue
+                raise urllib.error.URLError(e)
+            except OSError as e:
+                conn.close()
+                self.release(key, conn, reusable=False)
+                raise urllib.error.URLError(e)
+            except BaseException:
+                conn.close()
+                self.release(key, conn, reusable=False)
+                raise
+            return HttpResponse(self, key, conn, raw, url, redirects)
+        raise urllib.error.URLError(f"could not connect to {host}")
+
+    def open(
+        self, url: str, *, headers: Optional[Dict[str, str]] = None, timeout: float = 60
+    ) -> HttpResponse:
+        """GET リクエストのショートカット"""
+        return self.request("GET", url, headers=headers, timeout=timeout)
+
+
+# ----------------------------------------------------------------------
+# プロセス共有のセッション
+# ----------------------------------------------------------------------
+_session: Optional[HttpSession] = None
+_session_lock = threading.Lock()
+
+
+def get_session() -> HttpSession:
+    """プロセス共有の HttpSession を返す（初回に生成）"""
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = HttpSession()
+        return _session
+
+
+def configure_session(**kwargs) -> HttpSession:
+    """
+    共有セッションを指定の設定で作り直す。
+
+    Parameters
+    ----------
+    **kwargs
+        HttpSession のコンストラクタ引数（max_per_host など）
+    """
+    global _session
+    with _session_lock:
+        if _session is not None:
+            _session.close()
+        _session = HttpSession(**kwargs)
+        return _session
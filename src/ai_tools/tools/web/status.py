@@ -0,0 +1,185 @@
+"""
+URL の死活確認（本文をダウンロードしない）
+
+まず HEAD で確認し、HEAD を受け付けないサーバー（405 / 501 など）には
+Range: bytes=0-0 の GET で 1 バイトだけ要求する。
+サイズは Content-Length、または Content-Range の全体サイズから求める。
+リダイレクトは辿り、その経路を記録する。
+"""
+
+from __future__ import annotations
+
+import re
+import time
+import urllib.error
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+from .fetcher import AsyncFetcher
+from .session import HttpSession, get_session
+
+# HEAD がこれらのステータスなら ranged GET でやり直す
+HEAD_FALLBACK_CODES = (400, 403, 405, 501)
+
+_CONTENT_RANGE_TOTAL = re.compile(r"/\s*(\d+)\s*$")
+
+
+@dataclass
+class UrlStatus:
+    url: str
+    status: Optional[int] = None
+    reason: str = ""
+    # リダイレクト後の最終 URL
+    final_url: str = ""
+    # 辿ったリダイレクト (ステータスコード, 遷移先 URL)
+    redirects: List[Tuple[int, str]] = field(default_factory=list)
+    content_type: str = ""
+    content_length: Optional[int] = None
+    server: str = ""
+    # 確認に使ったメソッド（"HEAD" または "GET"）
+    method: str = ""
+    # 接続失敗などのエラー内容
+    error: str = ""
+    elapsed: float = 0.0
+
+    @property
+    def ok(self) -> bool:
+        return self.status is not None and 200 <= self.status < 400
+
+
+def _fill(result: UrlStatus, status: int, reason: str, headers, url: str, redirects) -> None:
+    result.status = status
+    result.reason = reason
+    result.final_url = url
+    result.redirects = list(redirects or [])
+    result.content_type = headers.get("Content-Type", "")
+    result.server = headers.get("Server", "")
+    total = _CONTENT_RANGE_TOTAL.search(headers.get("Content-Range", ""))
+    length = headers.get("Content-Length", "")
+    if total:
+        result.content_length = int(total.group(1))
+    elif length.isdigit() and status != 206:
+        result.content_length = int(length)
+
+
+def check_url(
+    url: str,
+    *,
+    headers: Optional[Dict[str, str]] = None,
+    timeout: float = 10,
+    session: Optional[HttpSession] = None,
+) -> UrlStatus:
+    """
+    URL の状態を本文を読まずに確認する。例外は送出せず UrlStatus.error に入れる。
+
+    Parameters
+    ----------
+    url : str
+        エンコード済みの URL
+    headers : Dict[str, str], optional
+        追加ヘッダー
+    timeout : float, default 10
+        タイムアウト（秒）
+    session : HttpSession, optional
+        使用するセッション。省略時は get_session()
+    """
+    session = session or get_session()
+    result = UrlStatus(url=url)
+    start = time.perf_counter()
+    try:
+        for method in ("HEAD", "GET"):
+            request_headers = dict(headers or {})
+            if method == "GET":
+                request_headers["Range"] = "bytes=0-0"
+            result.method = method
+            try:
+                with session.request(
+                    method, url, headers=request_headers, timeout=timeout
+                ) as response:
+                    _fill(
+                        result,
+                        response.status,
+                        response.reason,
+                        response.headers,
+                        response.url,
+                        response.redirects,
+                    )
+                    # 206 なら 1 バイトだけなので読み切って接続を使い回す。
+                    # Range を無視して全体を返すサーバーの本文は読まずに閉じる
+                    if response.status == 206 or method == "HEAD":
+                        response.read()
+                break
+            except urllib.error.HTTPError as e:
+                _fill(
+                    result,
+                    e.code,
+                    str(e.reason),
+                    e.headers,
+                    e.filename,
+                    getattr(e, "redirects", []),
+                )
+                if method == "HEAD" and e.code in HEAD_FALLBACK_CODES:
+                    continue
+                break
+    except urllib.error.URLError as e:
+        result.error = str(e.reason)
+    except Exception as e:
+        result.error = str(e)
+    result.elapsed = time.perf_counter() - start
+    return result
+
+
+def check_urls(
+    urls: List[str],
+    *,
+    headers: Optional[Dict[str, str]] = None,
+    timeout: float = 10,
+    max_concurrency: int = 8,
+    max_per_host: int = 2,
+) -> List[UrlStatus]:
+    """
+    複数の URL を並列に確認する（結果は urls と同じ順）。
+
+    Parameters
+    ----------
+    urls : List[str]
+        エンコード済みの URL
+    headers : Dict[str, str], optional
+        追加ヘッダー
+    timeout : float, default 10
+        1 URL あたりのタイムアウト（秒）
+    max_concurrency : int, default 8
+        全体の同時実行数
+    max_per_host : int, default 2
+        1 ホストあたりの同時実行数
+    """
+    fetcher = AsyncFetcher(
+        lambda u: check_url(u, headers=headers, timeout=timeout),
+        max_concurrency=max_concurrency,
+        max_per_host=max_per_host,
+    )
+    results = fetcher.fetch_all_sync(urls)
+    return [r or UrlStatus(url=u, error="check failed") for u, r in zip(urls, results)]
+
+
+def format_status(result: UrlStatus, label: Optional[str] = None) -> str:
+    """UrlStatus をツール出力用の文字列にする"""
+    label = label or result.url
+    if result.error:
+        return f"URL Status Check for {label}:\n❌ URL Error: {result.error}"
+
+    lines = [f"URL Status Check for {label}:"]
+    lines.append(f"🌐 Status Code: {result.status} ({result.method})")
+    for status, location in result.redirects:
+        lines.append(f"↪️ Redirect {status}: {location}")
+    length = "Unknown" if result.content_length is None else f"{result.content_length} bytes"
+    lines.append(f"📏 Content Length: {length}")
+    lines.append(f"📄 Content Type: {result.content_type or 'Unknown'}")
+    lines.append(f"🔧 Server: {result.server or 'Unknown'}")
+    if result.status == 200 or (result.status == 206 and result.method == "GET"):
+        lines.append("✅ URL is accessible")
+    elif result.status is not None and result.status >= 400:
+        lines.append(f"❌ HTTP Error {result.status}: {result.reason}")
+    else:
+        lines.append(f"⚠️ URL returned status code {result.status}")
+    return "\n".join(lines)
@@ -14,13 +14,62 @@ import urllib.request
 import urllib.parse
 import urllib.error
 import json
+import os
 import re
-import html
-from html.parser import HTMLParser
-from ddgs import DDGS
-from typing import Optional
-import zlib
+from typing import Iterator, List, Optional, Tuple
+import time
 from langchain.tools import tool
+from ai_tools.tools.web import (
+    get_session,
+    get_page_cache,
+    CachedPage,
+    AsyncFetcher,
+    extract_pdf_text,
+    PART_SIZE,
+    normalize_text,
+    part_text,
+    total_parts,
+    TextExtractor,
+    make_text_extractor,
+    get_search_cache,
+    get_search_backend,
+    SearchBackend,
+    find_matches,
+    get_word_index,
+    check_url,
+    check_urls,
+    format_status,
+    LinkExtractor,
+    CrawlFrontier,
+    extract_links_from_html,
+    page_title,
+    StreamDecoder,
+    decode_bytes,
+    header_charset,
+)
+
+# レスポンス本文の読み込み上限（これを超えた分は読まずに打ち切る）
+MAX_RESPONSE_BYTES = 20 * 1024 * 1024
+# 1 回に読み込むバイト数
+CHUNK_SIZE = 64 * 1024
+# fetch_webpage で 1 回に返す part 数の上限
+MAX_PARTS_PER_CALL = 5
+# テキスト抽出の対象にする Content-Type（text/* は全て許可）
+ACCEPTED_CONTENT_TYPES = (
+    "application/xhtml+xml",
+    "application/xml",
+    "application/json",
+    "application/pdf",
+)
+# extract_links / crawl_site で表示するリンク数
+MAX_LINKS = 20
+# crawl_site で取得するページ数の上限と、1 ページあたりの表示文字数
+MAX_CRAWL_PAGES = 30
+CRAWL_EXCERPT_CHARS = 600
+# web_search で取得する検索結果の件数
+SEARCH_MAX_RESULTS = 10
+# HTML から本文らしい部分だけを抽出するか（AI_TOOLS_MAIN_CONTENT=0 で全文）
+MAIN_CONTENT = os.environ.get("AI_TOOLS_MAIN_CONTENT", "1") != "0"
 
 
 def extract_text_from_pdf(pdf_data: bytes) -> str:
@@ -38,58 +87,16 @@ def extract_text_from_pdf(pdf_data: bytes) -> str:
         抽出されたテキスト
     """
     try:
-        text_parts = []
-        pdf_str = pdf_data.decode("latin-1", errors="ignore")
-
-        # PDFのストリームオブジェクトからテキストを抽出
-        # パターン: stream...endstream の間のデータ
-        stream_pattern = re.compile(rb"stream\r?\n(.*?)\r?\nendstream", re.DOTALL)
-
-        for match in stream_pattern.finditer(pdf_data):
-            stream_data = match.group(1)
-
-            # FlateDecode（zlib圧縮）の解凍を試みる
-            try:
-                decompressed = zlib.decompress(stream_data)
-                stream_text = decompressed.decode("latin-1", errors="ignore")
-            except:
-                stream_text = stream_data.decode("latin-1", errors="ignore")
-
-            # テキスト抽出パターン
-            # PDFのテキストオペレータ: Tj, TJ, ' など
-            text_operators = re.findall(
-                r"\(((?:[^()\\]|\\.)*)\)\s*T[jJ\']", stream_text
-            )
-
-            for text in text_operators:
-                # エスケープシーケンスを処理
-                decoded_text = (
-                    text.replace("\\(", "(").replace("\\)", ")").replace("\\\\", "\\")
-                )
-                if decoded_text.strip():
-                    text_parts.append(decoded_text)
-
-            # 配列形式のテキスト: [(text1)(text2)] TJ
-            array_pattern = re.findall(
-                r"\[((?:\([^)]*\)\s*-?\d*\s*)+)\]\s*TJ", stream_text
-            )
-            for array_text in array_pattern:
-                texts = re.findall(r"\(([^)]*)\)", array_text)
-                for text in texts:
-                    decoded_text = (
-                        text.replace("\\(", "(")
-                        .replace("\\)", ")")
-                        .replace("\\\\", "\\")
-                    )
-                    if decoded_text.strip():
-                        text_parts.append(decoded_text)
+        text, _ = extract_pdf_text(pdf_data)
+        if text:
+            return text
 
         # 抽出できなかった場合は単純なテキスト検索
-        if not text_parts:
-            # obj...endobj の間からテキストらしきものを抽出
-            simple_text = re.findall(r"\(([^)]{3,})\)", pdf_str)
-            text_parts = [t for t in simple_text if len(t.strip()) > 2]
-
+        # obj...endobj の間からテキストらしきものを抽出
+        simple_text = re.findall(rb"\(([^)]{3,})\)", pdf_data)
+        text_parts = [
+            t.decode("latin-1") for t in simple_text if len(t.strip()) > 2
+        ]
         return " ".join(text_parts)
 
     except Exception as e:
@@ -97,14 +104,59 @@ def extract_text_from_pdf(pdf_data: bytes) -> str:
         return ""
 
 
+def search_text(
+    query: str,
+    *,
+    max_results: int = SEARCH_MAX_RESULTS,
+    backend: Optional[SearchBackend] = None,
+    use_cache: bool = True,
+) -> list:
+    """
+    検索バックエンド（既定は get_search_backend()）で検索する。
+
+    正規化したクエリ（normalize_query）をキーに結果をキャッシュし、
+    TTL 内の同じ・ほぼ同じクエリは検索せずに返す。
+
+    Parameters
+    ----------
+    query: str
+        検索クエリ
+    max_results: int, default SEARCH_MAX_RESULTS
+        取得する件数
+    backend: SearchBackend, optional
+        使用するバックエンド。省略時は get_search_backend()
+    use_cache: bool, default True
+        検索結果キャッシュを使うかどうか
+
+    Returns
+    -------
+    list
+        title / href / body の辞書のリスト
+    """
+    backend = backend or get_search_backend()
+    cache = get_search_cache() if use_cache else None
+    results = cache.get(query, backend.name, max_results) if cache else None
+    if results is None:
+        results = backend.search(query, max_results)
+        # ローカル索引の結果はいつでも即座に得られるのでキャッシュしない
+        if cache and results and not any(r.get("source") == "local" for r in results):
+            cache.put(query, backend.name, max_results, results)
+    else:
+        print(f"[search_text] cache hit: {query}")
+    return results
+
+
 def fetch_text_sync(
     url: str,
     *,
     timeout: int = 60,  # 60 秒
+    use_cache: bool = True,
+    max_bytes: int = MAX_RESPONSE_BYTES,
 ) -> str:
     """
     標準ライブラリでURLを読み込み、テキストを取得する。
     PDFの場合は標準ライブラリでテキスト抽出を行う。
+    詳細は fetch_page を参照。
 
     Parameters
     ----------
@@ -112,54 +164,301 @@ def fetch_text_sync(
         取得対象の URL
     timeout: int, default 60
         タイムアウト（秒）
+    use_cache: bool, default True
+        ページキャッシュを使うかどうか
+    max_bytes: int, default MAX_RESPONSE_BYTES
+        読み込む本文の上限バイト数。超えた分は切り捨てる。
 
     Returns
     -------
     str
         ページのテキストコンテンツ。取得失敗時は空文字列。
     """
+    return fetch_page(
+        url, timeout=timeout, use_cache=use_cache, max_bytes=max_bytes
+    ).text
+
+
+def fetch_page(
+    url: str,
+    *,
+    timeout: int = 60,  # 60 秒
+    use_cache: bool = True,
+    max_bytes: int = MAX_RESPONSE_BYTES,
+    max_chars: Optional[int] = None,
+    main_content: Optional[bool] = None,
+) -> CachedPage:
+    """
+    URLを読み込み、生データ・テキスト・ヘッダーをまとめて返す。
+
+    接続は共有セッション（get_session）のプールを使い回す。
+    取得結果はページキャッシュ（get_page_cache）に保存し、TTL 内はディスクから返す。
+    TTL 切れの場合は ETag / Last-Modified で再検証する。
+    本文はチャンク単位で読み込み、HTML はパーサーへ逐次渡す。
+    テキスト化できない Content-Type や max_bytes を超える Content-Length は
+    本文を読む前に打ち切る。
+    PDF は max_chars 分のテキストが得られた時点でページの展開を止める
+    （続きが必要になったらキャッシュ済みの生データから展開する）。
+    テキストは空白を正規化した状態で保存し、part の境界索引も一緒に保存する。
+    HTML は既定（MAIN_CONTENT）でメニュー・フッターなどを除いた本文だけを抽出し、
+    除去した割合を CachedPage.stats に入れる。
+
+    Parameters
+    ----------
+    url: str
+        取得対象の URL
+    timeout: int, default 60
+        タイムアウト（秒）
+    use_cache: bool, default True
+        ページキャッシュを使うかどうか
+    max_bytes: int, default MAX_RESPONSE_BYTES
+        読み込む本文の上限バイト数。超えた分は切り捨てる。
+    max_chars: int, optional
+        必要なテキストの文字数。PDF 以外では無視される。
+    main_content: bool, optional
+        HTML から本文だけを抽出するか。省略時は MAIN_CONTENT。
+        キャッシュ済みのページが別のモードで抽出されていた場合は生データから抽出し直す。
+
+    Returns
+    -------
+    CachedPage
+        取得結果。取得失敗時は text が空文字列（HTTP エラーなら error_status にステータス）。
+    """
     try:
         # PDFかどうかをURLの拡張子で判定
         is_pdf = url.lower().endswith(".pdf")
 
-        headers = {
-            "User-Agent": (
-                "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) "
-                "AppleWebKit/537.36 (KHTML, like Gecko) "
-                "Chrome/91.0.4472.124 Safari/537.36"
-            )
-        }
-
         # URLをエンコード
         if not urllib.parse.urlparse(url).scheme:
             url = "https://" + url
 
         url = encode_url(url)
-        req = urllib.request.Request(url, headers=headers)
-
-        with urllib.request.urlopen(req, timeout=timeout) as response:
-            content = response.read()
-
-            if is_pdf:
-                # PDFからテキストを抽出
-                return extract_text_from_pdf(content)
+        mode = "main" if (MAIN_CONTENT if main_content is None else main_content) else "full"
+
+        cache = get_page_cache() if use_cache else None
+        cached = cache.get(url) if cache else None
+        if cached and cache.is_fresh(cached):
+            cached = reextract_html(cached, mode, cache)
+            return extend_pdf_text(cached, max_chars, cache)
+
+        # 期限切れキャッシュがあれば条件付きリクエストで再検証
+        request_headers = cached.validators() if cached else {}
+        with get_session().open(
+            url, headers=request_headers, timeout=timeout
+        ) as response:
+            if cached and response.status == 304:
+                response.read()
+                cache.touch(cached)
+                cached = reextract_html(cached, mode, cache)
+                return extend_pdf_text(cached, max_chars, cache)
+
+            content_type = check_payload(response.headers, max_bytes)
+            complete = True
+            stats = {}
+
+            if is_pdf or content_type == "application/pdf":
+                # PDFからテキストを抽出（必要なページまで）
+                content = b"".join(iter_body(response, max_bytes))
+                text, complete = extract_pdf_text(content, max_chars)
+                if not text:
+                    text = extract_text_from_pdf(content)
+                mode = "pdf"
             else:
-                # HTMLからテキストを抽出（body内のみ）
-                html_content = decode_content(content, response.headers)
-                extractor = TextExtractor(body_only=True)
-                extractor.feed(html_content)
+                # HTMLからテキストを抽出（body内のみ）。届いた分から順にパースする
+                decoder = StreamDecoder(response.headers)
+                extractor = make_text_extractor(
+                    body_only=True, main_content=mode == "main"
+                )
+                chunks = []
+                for chunk in iter_body(response, max_bytes):
+                    chunks.append(chunk)
+                    extractor.feed(decoder.decode(chunk))
+                extractor.feed(decoder.decode(b"", final=True))
+                extractor.close()
+                content = b"".join(chunks)
                 text = " ".join(extractor.text)
-                return text
+                stats = getattr(extractor, "report", {})
+                print_extract_report(url, stats)
+
+            text = normalize_text(text)
+            page = CachedPage(
+                url=url,
+                raw=content,
+                text=text,
+                headers=dict(response.headers.items()),
+                fetched_at=time.time(),
+                complete=complete,
+                extract_mode=mode,
+                stats=stats,
+                final_url=response.url if response.url != url else "",
+            )
+            cache_control = response.headers.get("Cache-Control", "")
+            if cache and text and "no-store" not in cache_control:
+                cache.put(page)
+            return page
 
     except urllib.error.HTTPError as e:
-        print(f"[fetch_text_sync] HTTP Error {e.code}: {e.reason}")
-        return ""
+        print(f"[fetch_page] HTTP Error {e.code}: {e.reason}")
+        return CachedPage(url=url, error_status=e.code)
     except urllib.error.URLError as e:
-        print(f"[fetch_text_sync] URL Error: {str(e.reason)}")
-        return ""
+        print(f"[fetch_page] URL Error: {str(e.reason)}")
     except Exception as e:
-        print(f"[fetch_text_sync] エラー: {e}")
-        return ""
+        print(f"[fetch_page] エラー: {e}")
+    return CachedPage(url=url)
+
+
+def reextract_html(page: CachedPage, mode: str, cache) -> CachedPage:
+    """
+    キャッシュ済みの HTML が別の抽出モード（本文のみ / 全文）で保存されていれば、
+    再取得せずに生データから抽出し直す。
+    """
+    if page.extract_mode in ("pdf", mode) or page.raw.startswith(b"%PDF"):
+        return page
+    extractor = make_text_extractor(body_only=True, main_content=mode == "main")
+    extractor.feed(decode_content(page.raw, page.headers))
+    extractor.close()
+    page.text = normalize_text(" ".join(extractor.text))
+    page.extract_mode = mode
+    page.stats = getattr(extractor, "report", {})
+    print_extract_report(page.url, page.stats)
+    if page.text:
+        cache.put(page)
+    return page
+
+
+def print_extract_report(url: str, stats: dict) -> None:
+    """本文抽出でどれだけ削れたかを表示する"""
+    if not stats.get("total_chars"):
+        return
+    print(
+        f"[fetch_page] main content: {stats['content_chars']} / {stats['total_chars']} chars "
+        f"(boilerplate {stats['boilerplate_ratio']:.0%}, links {stats['link_ratio']:.0%}) {url}"
+    )
+
+
+def extend_pdf_text(
+    page: CachedPage, max_chars: Optional[int], cache
+) -> CachedPage:
+    """
+    途中のページまでしか展開していない PDF のキャッシュを、
+    max_chars（None なら全体）に足りるまで生データから展開し直す。
+    """
+    if page.complete or (max_chars is not None and len(page.text) >= max_chars):
+        return page
+    text, page.complete = extract_pdf_text(page.raw, max_chars)
+    page.text = normalize_text(text)
+    cache.put(page)
+    return page
+
+
+def crawl(
+    url: str,
+    *,
+    max_depth: int = 1,
+    max_pages: int = 10,
+    path_prefix: bool = True,
+) -> Tuple[List[Tuple[str, int, CachedPage]], CrawlFrontier]:
+    """
+    url から幅優先でクロールする。同じ深さのページは AsyncFetcher で並列に取得し、
+    取得済みの生データからリンクを取り出してフロンティアへ追加する。
+
+    Parameters
+    ----------
+    url: str
+        起点の URL
+    max_depth: int, default 1
+        起点から辿るリンクの深さ
+    max_pages: int, default 10
+        取得するページ数の上限
+    path_prefix: bool, default True
+        起点と同じディレクトリ以下のみ辿る
+
+    Returns
+    -------
+    Tuple[List[Tuple[str, int, CachedPage]], CrawlFrontier]
+        取得順の (URL, 深さ, ページ) のリストと、残りの URL を持つフロンティア
+    """
+    frontier = CrawlFrontier(
+        [encode_url(url)],
+        max_depth=max_depth,
+        max_pages=max_pages,
+        path_prefix=path_prefix,
+    )
+    cache = get_page_cache()
+    fetcher = AsyncFetcher(
+        fetch_page, skip_limit=lambda u: cache.has_fresh(encode_url(u))
+    )
+    visited = []
+    while frontier:
+        batch = frontier.pop_level()
+        pages = fetcher.fetch_all_sync([u for u, _ in batch])
+        for (page_url, depth), page in zip(batch, pages):
+            page = page or CachedPage(url=page_url)
+            visited.append((page_url, depth, page))
+            if depth >= max_depth or not page.raw or page.extract_mode == "pdf":
+                continue
+            if depth == 0 and page.final_url:
+                # 起点がリダイレクトした（/docs → /docs/、www. 付きなど）場合は、その先も辿る
+                frontier.add_scope(page.final_url)
+            html_content = decode_content(page.raw, page.headers)
+            # 相対リンクはリダイレクト後の URL を基準に解決する
+            for link in extract_links_from_html(html_content, page.base_url):
+                frontier.push(link["url"], depth + 1)
+    return visited, frontier
+
+
+# ----------------------------------------------------------------------
+# レスポンス本文の事前チェック・逐次読み込み
+# ----------------------------------------------------------------------
+def check_payload(headers, max_bytes: int) -> str:
+    """
+    本文を読む前にヘッダーで取得対象かどうかを判定する。
+
+    Parameters
+    ----------
+    headers
+        レスポンスヘッダー
+    max_bytes: int
+        許容する本文の上限バイト数
+
+    Returns
+    -------
+    str
+        小文字化した Content-Type（ヘッダーが無い場合は空文字列）
+
+    Raises
+    ------
+    ValueError
+        テキスト化できない Content-Type、または Content-Length が上限超過の場合
+    """
+    content_type = headers.get("Content-Type", "").split(";")[0].strip().lower()
+    if content_type and not (
+        content_type.startswith("text/") or content_type in ACCEPTED_CONTENT_TYPES
+    ):
+        raise ValueError(f"unsupported Content-Type: {content_type}")
+
+    content_length = headers.get("Content-Length")
+    if content_length and content_length.isdigit() and int(content_length) > max_bytes:
+        raise ValueError(
+            f"Content-Length {content_length} exceeds limit of {max_bytes} bytes"
+        )
+    return content_type
+
+
+def iter_body(response, max_bytes: int, chunk_size: int = CHUNK_SIZE) -> Iterator[bytes]:
+    """
+    レスポンス本文を chunk_size ずつ読み込む。合計が max_bytes に達したら打ち切る。
+    """
+    total = 0
+    while True:
+        chunk = response.read(min(chunk_size, max_bytes - total))
+        if not chunk:
+            return
+        total += len(chunk)
+        yield chunk
+        if total >= max_bytes:
+            print(f"[fetch_text_sync] {max_bytes} バイトで読み込みを打ち切りました")
+            return
 
 
 # ----------------------------------------------------------------------
@@ -186,7 +485,8 @@ def encode_url(url: str) -> str:
     path = urllib.parse.quote(parsed.path, safe="/%-._~!$&'()*+,;=:@")
 
     # query は RFC3986 の safe characters を残しつつ encode
-    query = urllib.parse.quote_plus(parsed.query, safe="=&")
+    # （エンコード済みの %XX と + はそのまま残し、リンク先 URL を二重にエンコードしない）
+    query = urllib.parse.quote_plus(parsed.query, safe="=&%+")
 
     # 再構築して ASCII 文字列へ
     encoded = urllib.parse.urlunparse(
@@ -206,86 +506,64 @@ def encode_url(url: str) -> str:
 # 文字コード判定・デコード
 # ----------------------------------------------------------------------
 def decode_content(content: bytes, headers) -> str:
-    """バイナリデータを適切な文字コードでデコード"""
-    # 1. ヘッダーから charset を取得
-    charset = None
-    if hasattr(headers, "get_content_charset"):
-        charset = headers.get_content_charset()
-    if not charset:
-        ct = headers.get("Content-Type", "")
-        match = re.search(r"charset=([^\s;]+)", ct, re.IGNORECASE)
-        if match:
-            charset = match.group(1)
-
-    # 2. 取得できた charset でデコードを試行
-    if charset:
-        try:
-            return content.decode(charset, errors="replace")
-        except Exception:
-            pass
-
-    # 3. 一般的な日本語エンコーディングで順番に試行
-    for enc in ["utf-8", "utf-8-sig", "shift_jis", "euc-jp", "iso-2022-jp"]:
-        try:
-            return content.decode(enc, errors="replace")
-        except Exception:
-            continue
-
-    # 4. 最後のフォールバック
-    return content.decode("utf-8", errors="replace")
+    """
+    バイナリデータを適切な文字コードでデコード。
+    BOM → ヘッダー → <meta charset> → 統計的な判定の順で文字コードを決め、1 回だけデコードする。
+    """
+    return decode_bytes(content, headers)
 
 
 # ----------------------------------------------------------------------
-# HTML コンテンツからテキスト・リンクを抽出
+# 取得テキストを part 単位に切り出して整形
 # ----------------------------------------------------------------------
-class TextExtractor(HTMLParser):
-    def __init__(self, body_only=False):
-        super().__init__()
-        self.text = []
-        self.links = []
-        self.current_link = None
-        self.body_only = body_only
-        self.in_body = False
-        self.in_script = False
-        self.in_style = False
-
-    def handle_starttag(self, tag, attrs):
-        if tag == "body":
-            self.in_body = True
-        elif tag == "script":
-            self.in_script = True
-        elif tag == "style":
-            self.in_style = True
-        elif tag == "a" and (not self.body_only or self.in_body):
-            for attr, value in attrs:
-                if attr == "href":
-                    self.current_link = value
-                    break
-
-    def handle_endtag(self, tag):
-        if tag == "body":
-            self.in_body = False
-        elif tag == "script":
-            self.in_script = False
-        elif tag == "style":
-            self.in_style = False
-        elif tag == "a":
-            self.current_link = None
-
-    def handle_data(self, data):
-        # script, styleタグ内は無視
-        if self.in_script or self.in_style:
-            return
+def format_parts(
+    url: str,
+    page: CachedPage,
+    part: int,
+    to_part: Optional[int] = None,
+) -> str:
+    """
+    取得結果から part（to_part 指定時は part〜to_part）を切り出し、ツール出力形式に整形する。
+    part の境界はキャッシュ済みの索引を使う。
 
-        # body_onlyがTrueの場合、body内のみ抽出
-        if self.body_only and not self.in_body:
-            return
+    Parameters
+    ----------
+    url: str
+        取得元の URL（表示用）
+    page: CachedPage
+        fetch_page の結果。text が空なら取得失敗として扱う。
+    part: int
+        取得する最初のブロック番号（1 始まり）
+    to_part: int, optional
+        取得する最後のブロック番号。最大 MAX_PARTS_PER_CALL 個まで。
+    """
+    if not page.text:
+        return f"Error: Could not fetch content from {url}"
+
+    # part 番号は 1 から始まる想定
+    if part < 1:
+        return f"Error: part must be >= 1"
+    last = part if to_part is None else to_part
+    if last < part:
+        return f"Error: to_part must be >= part"
+    last = min(last, part + MAX_PARTS_PER_CALL - 1)
+
+    # 全体のパート数（PDF を途中までしか展開していない場合は「N+」）
+    bounds = page.ensure_chunks()
+    total = total_parts(bounds)
+    total_label = str(total) if page.complete else f"{total}+"
+
+    if part > total:
+        # 指定した part が存在しない
+        return (
+            f"Content from {url} (part {part} of {total_label}):\n\n"
+            f"[No more content; part {part} is out of range]"
+        )
+    last = min(last, total)
 
-        clean_data = data.strip()
-        if clean_data:
-            self.text.append(clean_data)
-            if self.current_link and clean_data:
-                self.links.append({"text": clean_data, "url": self.current_link})
+    label = f"part {part}" if last == part else f"parts {part}-{last}"
+    sliced_text = " ".join(part_text(page.text, bounds, n) for n in range(part, last + 1))
+    return f"Content from {url} ({label} of {total_label}):\n\n{sliced_text}"
 
 
 # ----------------------------------------------------------------------
@@ -305,51 +583,45 @@ class Tools:
         self,
         url: str,
         part: int = 1,
+        to_part: Optional[int] = None,
     ) -> str:
         """
         Fetch and return the text content of a webpage using Playwright.
         :param url: The URL to fetch.
         :param part: The block number to retrieve (starting from 1).
+        :param to_part: The last block number to retrieve (optional, up to 5 blocks per call).
         :return: Text content of the webpage
         """
-        part_size: int = 2000
         try:
-            # Playwrightでテキストコンテンツを取得
-            text = fetch_text_sync(url)
-
-            if not text:
-                return f"Error: Could not fetch content from {url}"
-
-            # 空白を正規化
-            text = re.sub(r"\s+", " ", text).strip()
-
-            # part 番号は 1 から始まる想定
-            if part < 1:
-                return f"Error: part must be >= 1"
-
-            # 全体のパート数を計算
-            total_parts = max(1, (len(text) + part_size - 1) // part_size)
-
-            start = (part - 1) * part_size
-            end = start + part_size
-
-            # 文字列長に合わせてインデックス補正
-            if start >= len(text):
-                # 指定した part が存在しない
-                return (
-                    f"Content from {url} (part {part} of {total_parts}):\n\n"
-                    f"[No more content; part {part} is out of range]"
-                )
-            if end > len(text):
-                end = len(text)
+            # part の範囲まで取得（PDF は必要なページまでしか展開しない）
+            last = max(part, to_part or part, 1)
+            page = fetch_page(url, max_chars=(last + 1) * PART_SIZE)
+            return format_parts(url, page, part, to_part)
+        except Exception as e:
+            return f"Error fetching webpage: {str(e)}"
 
-            sliced_text = text[start:end]
-            return (
-                f"Content from {url} (part {part} of {total_parts}):\n\n"
-                f"{sliced_text}"
+    # ------------------------------------------------------------------
+    #  複数ページの並列取得
+    # ------------------------------------------------------------------
+    def fetch_webpages(self, urls: list[str]) -> str:
+        """
+        Fetch several webpages in parallel and return part 1 of each.
+        :param urls: The URLs to fetch.
+        :return: Text content of each webpage, separated by dividers
+        """
+        try:
+            cache = get_page_cache()
+            fetcher = AsyncFetcher(
+                lambda u: fetch_page(u, max_chars=2 * PART_SIZE),
+                skip_limit=lambda u: cache.has_fresh(encode_url(u)),
+            )
+            pages = fetcher.fetch_all_sync(urls)
+            return "\n\n---\n\n".join(
+                format_parts(url, page or CachedPage(url=url), 1)
+                for url, page in zip(urls, pages)
             )
         except Exception as e:
-            return f"Error fetching webpage: {str(e)}"
+            return f"Error fetching webpages: {str(e)}"
 
     # ------------------------------------------------------------------
     #  すべてのリンク抽出
@@ -363,38 +635,29 @@ class Tools:
         try:
             encoded_url = encode_url(url)
 
-            req = urllib.request.Request(encoded_url, headers=self.headers)
-            with urllib.request.urlopen(req, timeout=10) as response:
-                content = response.read()
-                html_content = decode_content(content, response.headers)
-
-                extractor = TextExtractor()
-                extractor.feed(html_content)
-
+            with get_session().open(
+                encoded_url, headers=self.headers, timeout=10
+            ) as response:
+                check_payload(response.headers, MAX_RESPONSE_BYTES)
+                # 届いた分から順にリンクを取り出し、表示する分だけ保持する
+                decoder = StreamDecoder(response.headers)
+                extractor = LinkExtractor(response.url)
                 unique_links = []
-                seen_urls = set()
-                for link in extractor.links:
-                    href = link["url"]
-                    text = link["text"]
-
-                    if href.startswith("/"):
-                        href = urllib.parse.urljoin(encoded_url, href)
-                    elif not href.startswith(("http://", "https://")):
-                        continue
-
-                    if href not in seen_urls and text:
-                        unique_links.append({"text": text, "url": href})
-                        seen_urls.add(href)
+                for chunk in iter_body(response, MAX_RESPONSE_BYTES):
+                    links = extractor.feed(decoder.decode(chunk))
+                    unique_links.extend(links[: MAX_LINKS - len(unique_links)])
+                links = extractor.feed(decoder.decode(b"", final=True)) + extractor.close()
+                unique_links.extend(links[: MAX_LINKS - len(unique_links)])
 
                 if not unique_links:
                     return f"No links found on {url}"
 
                 result = f"Links found on {url}:\n\n"
-                for i, link in enumerate(unique_links[:20], 1):
+                for i, link in enumerate(unique_links, 1):
                     result += f"{i}. {link['text']}\n   {link['url']}\n\n"
 
-                if len(unique_links) > 20:
-                    result += f"... and {len(unique_links) - 20} more links"
+                if extractor.count > MAX_LINKS:
+                    result += f"... and {extractor.count - MAX_LINKS} more links"
 
                 return result
         except urllib.error.HTTPError as e:
@@ -404,99 +667,139 @@ class Tools:
         except Exception as e:
             return f"Error extracting links: {str(e)}"
 
+    # ------------------------------------------------------------------
+    #  サイト内クロール
+    # ------------------------------------------------------------------
+    def crawl_site(self, url: str, max_depth: int = 1, max_pages: int = 10) -> str:
+        """
+        Crawl a site breadth-first from a URL (same host, same directory) and
+        return the beginning of each page plus the links not visited yet.
+        :param url: The start URL (e.g. the top page of a documentation site).
+        :param max_depth: How many links deep to follow from the start page.
+        :param max_pages: Maximum number of pages to fetch.
+        :return: Excerpts of the crawled pages
+        """
+        try:
+            max_pages = max(1, min(max_pages, MAX_CRAWL_PAGES))
+            visited, frontier = crawl(url, max_depth=max_depth, max_pages=max_pages)
+            sections = []
+            for page_url, depth, page in visited:
+                if not page.text:
+                    sections.append(f"## {page_url} (depth {depth})\nError: Could not fetch content")
+                    continue
+                excerpt = part_text(page.text, page.ensure_chunks(), 1)[:CRAWL_EXCERPT_CHARS]
+                sections.append(
+                    f"## {page_title(page)} (depth {depth})\n{page_url}\n\n{excerpt}"
+                )
+            result = f"Crawled {len(visited)} page(s) from {url}:\n\n"
+            result += "\n\n---\n\n".join(sections)
+            pending = frontier.pending()
+            if pending:
+                result += f"\n\nNot visited ({len(pending)}):\n"
+                result += "\n".join(u for u, _ in pending[:MAX_LINKS])
+            return result
+        except Exception as e:
+            return f"Error crawling site: {str(e)}"
+
     # ------------------------------------------------------------------
     #  URL ステータス確認
     # ------------------------------------------------------------------
     def check_url_status(self, url: str) -> str:
         """
         Check if a URL is accessible and return status information.
+        Uses HEAD (or a 1-byte ranged GET) so the body is not downloaded.
         :param url: URL to check
         :return: Status information about the URL
         """
         try:
-            encoded_url = encode_url(url)
-
-            req = urllib.request.Request(encoded_url, headers=self.headers)
-            with urllib.request.urlopen(req, timeout=10) as response:
-                status_code = response.getcode()
-                content_length = len(response.read())
-                content_type = response.headers.get("Content-Type", "Unknown")
-                server = response.headers.get("Server", "Unknown")
-
-                status_info = f"URL Status Check for {url}:\n"
-                status_info += f"🌐 Status Code: {status_code}\n"
-                status_info += f"📏 Content Length: {content_length} bytes\n"
-                status_info += f"📄 Content Type: {content_type}\n"
-                status_info += f"🔧 Server: {server}\n"
-
-                if status_code == 200:
-                    status_info += "✅ URL is accessible"
-                else:
-                    status_info += f"⚠️ URL returned status code {status_code}"
-                return status_info
-        except urllib.error.HTTPError as e:
-            return f"❌ HTTP Error {e.code}: {e.reason}"
-        except urllib.error.URLError as e:
-            return f"❌ URL Error: {str(e.reason)}"
+            result = check_url(encode_url(url), headers=self.headers, timeout=10)
+            return format_status(result, url)
         except Exception as e:
             return f"❌ Error checking URL: {str(e)}"
 
+    def check_urls_status(self, urls: list[str]) -> str:
+        """
+        Check several URLs concurrently and return status information for each.
+        :param urls: URLs to check
+        :return: Status information about each URL
+        """
+        try:
+            results = check_urls(
+                [encode_url(u) for u in urls], headers=self.headers, timeout=10
+            )
+            return "\n\n".join(
+                format_status(result, url) for url, result in zip(urls, results)
+            )
+        except Exception as e:
+            return f"❌ Error checking URLs: {str(e)}"
+
     def web_search(self, query: str) -> str:
         """
         Perform a search on DuckDuckGo and return the results in HTML.
         :param query: Search query.
         :return: List of dictionaries with search results.
         """
-        return DDGS().text(query, max_results=10, backend="duckduckgo")
+        return search_text(query)
 
     # ------------------------------------------------------------------
     #  ページ内検索
     # ------------------------------------------------------------------
-    def find_in_page(self, pattern: str, url: str) -> str:
+    def find_in_page(
+        self,
+        pattern: str,
+        url: str,
+        patterns: Optional[list[str]] = None,
+        max_hits: int = 10,
+    ) -> str:
         """
-        Search for a pattern in a webpage and return matching lines with context.
+        Search for one or more patterns in a webpage and return matching lines with context.
         :param pattern: Search pattern (regular expression supported)
         :param url: URL of the webpage to search
+        :param patterns: Additional patterns searched in the same pass (optional)
+        :param max_hits: Maximum number of matches to show
         :return: Matching lines with surrounding context
         """
         try:
-            # Playwrightでテキストコンテンツを取得
-            text = fetch_text_sync(url)
+            # キャッシュ済みのテキスト（空白は正規化済み）を使う
+            page = fetch_page(url)
+            text = page.text
 
             if not text:
                 return f"Error: Could not fetch content from {url}"
 
-            # 空白を正規化
-            text = re.sub(r"\s+", " ", text).strip()
-
-            # パターンで検索（正規表現対応）
+            all_patterns = [pattern] + list(patterns or [])
+            label = " | ".join(f"'{p}'" for p in all_patterns)
+            index = get_word_index(page.url, page.fetched_at, text)
             try:
-                matches = list(re.finditer(pattern, text, re.IGNORECASE))
-            except re.error:
-                return f"Error: Invalid regular expression pattern '{pattern}'"
+                matches, total = find_matches(text, all_patterns, max_hits, index)
+            except re.error as e:
+                return f"Error: {e}"
 
             if not matches:
-                return f"Pattern '{pattern}' not found in {url}"
+                return f"Pattern {label} not found in {url}"
 
-            result = f"Found {len(matches)} match(es) for '{pattern}' in {url}:\n\n"
+            count = f"{total}" if total is not None else f"{len(matches)}+"
+            result = f"Found {count} match(es) for {label} in {url}:\n\n"
 
-            # 最大10件のマッチを表示
-            for i, match in enumerate(matches[:10], 1):
-                start = max(0, match.start() - 100)
-                end = min(len(text), match.end() + 100)
+            for i, match in enumerate(matches, 1):
+                start = max(0, match.start - 100)
+                end = min(len(text), match.end + 100)
                 context = text[start:end]
 
                 # マッチ部分を強調
                 highlighted = (
-                    context[: match.start() - start]
-                    + f">>>{match.group()}<<<"
-                    + context[match.end() - start :]
+                    context[: match.start - start]
+                    + f">>>{text[match.start:match.end]}<<<"
+                    + context[match.end - start :]
                 )
 
-                result += f"{i}. ...{highlighted}...\n\n"
+                tag = f"[{match.pattern}] " if len(all_patterns) > 1 else ""
+                result += f"{i}. {tag}...{highlighted}...\n\n"
 
-            if len(matches) > 10:
-                result += f"... and {len(matches) - 10} more match(es)"
+            if total is None:
+                result += f"... more matches exist (stopped after {max_hits})"
+            elif total > len(matches):
+                result += f"... and {total - len(matches)} more match(es)"
 
             return result
 
@@ -511,31 +814,66 @@ def web_search(query: str) -> str:
     :param query: Search query.
     :return: List of dictionaries with search results.
     """
-    return DDGS().text(query, max_results=10, backend="duckduckgo")
+    return Tools().web_search(query)
 
 
 @tool
-def find_in_page(pattern: str, url: str) -> str:
+def find_in_page(
+    pattern: str,
+    url: str,
+    patterns: Optional[list[str]] = None,
+    max_hits: int = 10,
+) -> str:
     """
-    Search for a pattern in a webpage and return matching lines with context.
+    Search for one or more patterns in a webpage and return matching lines with context.
     :param pattern: Search pattern (regular expression supported)
     :param url: URL of the webpage to search
+    :param patterns: Additional patterns searched in the same pass (optional)
+    :param max_hits: Maximum number of matches to show
     :return: Matching lines with surrounding context
     """
-    return Tools().find_in_page(pattern, url)
+    return Tools().find_in_page(pattern, url, patterns, max_hits)
 
 
 @tool
 def fetch_webpage(
     url: str,
     part: int = 1,
+    to_part: Optional[int] = None,
 ) -> str:
     """
     Fetch and return the text content of a webpage using Playwright.
     :param url: The URL to fetch.
     :param part: The block number to retrieve (starting from 1).
+    :param to_part: The last block number to retrieve (optional, up to 5 blocks per call).
     :return: Text content of the webpage
     """
-    return Tools().fetch_webpage(url, part)
+    return Tools().fetch_webpage(url, part, to_part)
+
+
+@tool
+def fetch_webpages(urls: list[str]) -> str:
+    """
+    Fetch several webpages in parallel and return part 1 of each.
+    Use this instead of repeated fetch_webpage calls when reading multiple search hits.
+    :param urls: The URLs to fetch.
+    :return: Text content of each webpage, separated by dividers
+    """
+    return Tools().fetch_webpages(urls)
+
+
+@tool
+def crawl_site(url: str, max_depth: int = 1, max_pages: int = 10) -> str:
+    """
+    Crawl a site breadth-first from a URL (same host, same directory) in one call and
+    return the beginning of each page plus the links not visited yet.
+    Use this to explore documentation sites instead of many fetch_webpage calls.
+    :param url: The start URL (e.g. the top page of a documentation site).
+    :param max_depth: How many links deep to follow from the start page.
+    :param max_pages: Maximum number of pages to fetch (up to 30).
+    :return: Excerpts of the crawled pages
+    """
+    return Tools().crawl_site(url, max_depth, max_pages)
+
 
-web_tools = [web_search, find_in_page, fetch_webpage]
\ No newline at end of file
+web_tools = [web_search, find_in_page, fetch_webpage, fetch_webpages, crawl_site]
\ No newline at end of file
@@ -0,0 +1,38 @@
+import asyncio
+import threading
+from typing import Awaitable, Callable, Dict, TypeVar
+
+T = TypeVar("T")
+
+
+def run_sync(factory: Callable[[], Awaitable[T]]) -> T:
+    """
+    コルーチンを同期的に実行する。
+
+    Streamlit や LangChain のツール内など、既にイベントループが動いている
+    スレッドから呼ばれた場合は別スレッドで実行する。
+
+    Parameters
+    ----------
+    factory : Callable[[], Awaitable[T]]
+        コルーチンを生成する関数
+    """
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(factory())
+
+    result: Dict[str, object] = {}
+
+    def runner() -> None:
+        try:
+            result["value"] = asyncio.run(factory())
+        except BaseException as e:
+            result["error"] = e
+
+    thread = threading.Thread(target=runner)
+    thread.start()
+    thread.join()
+    if "error" in result:
+        raise result["error"]  # type: ignore[misc]
+    return result["value"]  # type: ignore[return-value]
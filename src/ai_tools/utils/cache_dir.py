@@ -0,0 +1,10 @@
+import os
+from pathlib import Path
+
+
+def default_cache_dir() -> Path:
+    """キャッシュの保存先。環境変数 AI_TOOLS_CACHE_DIR で変更できる。"""
+    base = os.environ.get("AI_TOOLS_CACHE_DIR")
+    if base:
+        return Path(base)
+    return Path.home() / ".cache" / "ai_tools"